@@ -40,6 +40,12 @@ command_suite = (
             'meta-add',
             'meta_add'
         ),
+        (
+            'datalad_metalad.mergespool',
+            'MergeSpool',
+            'meta-merge-spool',
+            'meta_merge_spool'
+        ),
         (
             'datalad_metalad.conduct',
             'Conduct',
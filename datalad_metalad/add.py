@@ -11,17 +11,28 @@ Add metadata to a metadata store.
 MetadataRecord is usually provided by an extractor, but
 can also be created by other means.
 """
+import concurrent.futures
+import hashlib
 import json
 import logging
 import sys
+import threading
 import time
+from collections import (
+    OrderedDict,
+    deque,
+)
 from functools import reduce
-from itertools import chain
+from itertools import (
+    chain,
+    islice,
+)
 from os import curdir
 from pathlib import Path
 from typing import (
     Dict,
     Generator,
+    Iterable,
     List,
     Optional,
     Tuple,
@@ -44,6 +55,9 @@ from datalad.interface.base import (
 )
 from datalad.interface.results import get_status_dict
 from datalad.support.constraints import (
+    EnsureChoice,
+    EnsureFloat,
+    EnsureInt,
     EnsureNone,
     EnsureStr
 )
@@ -62,11 +76,30 @@ from dataladmetadatamodel.metadatapath import MetadataPath
 from dataladmetadatamodel.metadatarootrecord import MetadataRootRecord
 from dataladmetadatamodel.uuidset import UUIDSet
 from dataladmetadatamodel.versionlist import TreeVersionList
+from dataladmetadatamodel.mapper.gitmapper.gitbackend.subprocess import (
+    checked_execute,
+    git_command_line,
+    git_delete_ref,
+    git_update_ref,
+)
 from dataladmetadatamodel.mapper.gitmapper.objectreference import flush_object_references
-from dataladmetadatamodel.mapper.gitmapper.utils import locked_backend
+from dataladmetadatamodel.mapper.gitmapper.utils import (
+    lock_backend,
+    unlock_backend,
+)
 
+from . import jsoncodec
 from .exceptions import MetadataKeyException
 from .metadatatypes import JSONType
+from .metadatatypes.metadata import MetadataRecord
+from .outputreference import (
+    check_output_reference,
+    hash_output_reference,
+    is_output_reference,
+    remove_output_location,
+    store_output_reference,
+)
+from .spool import SpoolWriter
 from .utils import (
     check_dataset,
     read_json_objects,
@@ -81,13 +114,26 @@ lgr = logging.getLogger("datalad.metadata.add")
 
 max_cache_size = 10000
 max_cache_age = 5
+max_mrr_cache_size = 1000
+
+# Number of JSON lines that a parse worker checks at once
+parse_chunk_size = 1000
+
+# Errors that mark an input record as invalid
+record_errors = (MetadataKeyException, KeyError, TypeError, ValueError)
+
+# Formats of metadata input. Columnar formats require pyarrow
+input_formats = ("json", "parquet", "arrow")
+
+# Policies for extractor runs with an already stored configuration, i.e.
+# with the same extractor name, extractor version, and extraction parameter.
+add_policies = ("replace-latest", "skip-identical")
 
 
 @dataclass
 class AddParameter:
     result_path: Path
     destination_path: Path
-    allow_id_mismatch: bool
 
     dataset_id: UUID
     dataset_version: str
@@ -109,7 +155,9 @@ class AddParameter:
     extracted_metadata: dict
 
     tvl_us_cache: dict
-    mrr_cache: dict
+    mrr_cache: "MetadataRootRecordCache"
+
+    add_policy: str = "replace-latest"
 
 
 @build_doc
@@ -312,7 +360,75 @@ class Add(Interface):
             line that just consists of a newline to confirm the exit request.
             When this flag is given, the metadata file name should be set to 
             "-" (minus).""",
-            default=False))
+            default=False),
+        max_cache_size=Parameter(
+            args=("--max-cache-size",),
+            doc=f"""The number of records after which the added metadata is
+            written to the metadata store and released from memory. In batch
+            mode, this is the number of cached records that triggers writing
+            of the cached records to the metadata store. Records are written
+            by a background thread, while new records are read
+            (default: {max_cache_size}).""",
+            constraints=EnsureInt() | EnsureNone()),
+        max_cache_age=Parameter(
+            args=("--max-cache-age",),
+            doc=f"""In batch mode: the age in seconds of the oldest cached
+            record that triggers writing of the cached records to the
+            metadata store (default: {max_cache_age}).""",
+            constraints=EnsureFloat() | EnsureNone()),
+        durable_ack=Parameter(
+            args=("--durable-ack",),
+            action='store_true',
+            doc="""In batch mode: do not confirm records when they are cached.
+            Instead, confirm every record with its add-result after the
+            record has been written to the metadata store, and all object
+            references are flushed. Confirmations of durably added records
+            contain the key "durable" with the value true.""",
+            default=False),
+        add_policy=Parameter(
+            args=("--add-policy",),
+            doc="""Determine how an extractor run is handled, if the metadata
+            store already contains a run of the same extractor, with the same
+            extractor version and the same extraction parameters, for the
+            same dataset version or file. The stored run is always replaced,
+            if the policy is "replace-latest". If the policy is
+            "skip-identical", the new run is not written, and reported as
+            "notneeded", if its extracted metadata is identical to the
+            extracted metadata of the stored run (default: "replace-latest").
+            """,
+            constraints=EnsureChoice(*add_policies),
+            default="replace-latest"),
+        spool_dir=Parameter(
+            args=("--spool-dir",),
+            doc="""Do not write the metadata records to the metadata store,
+            but append them to a spool file in the given directory. Spooling
+            does not lock the metadata store, i.e. multiple meta-add
+            processes can spool records concurrently. Use
+            "datalad meta-merge-spool" to add spooled records to the metadata
+            store. In batch mode, every spooled record is confirmed with its
+            result.""",
+            constraints=EnsureStr() | EnsureNone()),
+        input_format=Parameter(
+            args=("--input-format",),
+            doc="""The format of the metadata input. If the format is
+            "parquet" or "arrow", METADATA must be the path of a Parquet file
+            or of an Arrow IPC file, in which every row contains one metadata
+            record, and the columns are named after the metadata keys.
+            Columnar input is checked and added in record batches. It
+            requires the python package "pyarrow", and is not supported in
+            batch mode or with --spool-dir (default: "json").""",
+            constraints=EnsureChoice(*input_formats),
+            default="json"),
+        parse_workers=Parameter(
+            args=("--parse-workers",),
+            metavar="PARSE_WORKERS",
+            doc="""If given together with --json-lines, metadata records are
+            parsed and checked in chunks by the given number of worker
+            processes, while the records of already checked chunks are
+            added to the metadata store. Records are added in input
+            order. Parallel parsing is not supported in batch mode or with
+            --spool-dir.""",
+            constraints=EnsureInt() | EnsureNone()))
 
     @staticmethod
     @datasetmethod(name="meta_add")
@@ -325,7 +441,14 @@ class Add(Interface):
             allow_unknown: bool = False,
             allow_id_mismatch: bool = False,
             json_lines: bool = False,
-            batch_mode: bool = False):
+            batch_mode: bool = False,
+            max_cache_size: Optional[int] = None,
+            max_cache_age: Optional[float] = None,
+            durable_ack: bool = False,
+            add_policy: str = "replace-latest",
+            spool_dir: Optional[str] = None,
+            input_format: str = "json",
+            parse_workers: Optional[int] = None):
 
         additional_values = additionalvalues or dict()
 
@@ -333,15 +456,94 @@ class Add(Interface):
         dataset = check_dataset(dataset or curdir, "add metadata")
         additional_values_object = get_json_object(additional_values)
 
+        if parse_workers is not None \
+                and (batch_mode is True or spool_dir is not None):
+            raise ValueError(
+                "--parse-workers is not supported in batch mode or with "
+                "--spool-dir")
+
+        if input_format != "json":
+            if batch_mode is True or spool_dir is not None:
+                raise ValueError(
+                    f"input format '{input_format}' is not supported in batch "
+                    f"mode or with --spool-dir")
+
+            from .columnar import read_columnar_metadata
+            yield from add_checked_batches(
+                read_columnar_metadata(
+                    metadata,
+                    input_format,
+                    additional_values_object,
+                    allow_override,
+                    allow_unknown,
+                    dataset.pathobj),
+                dataset,
+                allow_id_mismatch,
+                flush_interval=max_cache_size,
+                add_policy=add_policy)
+            return
+
+        if spool_dir is not None:
+            if batch_mode:
+                spool_results = spool_finite_set(
+                    _stdin_reader(),
+                    additional_values_object,
+                    dataset,
+                    allow_override,
+                    allow_unknown,
+                    spool_dir)
+            else:
+                input_records, input_lines = read_input_records(
+                    metadata,
+                    json_lines)
+                spool_results = spool_finite_set(
+                    input_records,
+                    additional_values_object,
+                    dataset,
+                    allow_override,
+                    allow_unknown,
+                    spool_dir,
+                    json_lines=input_lines)
+            if batch_mode is False:
+                yield from spool_results
+                return
+            write_batch_results(spool_results)
+            return
+
+        if parse_workers is not None:
+            if json_lines is False:
+                lgr.warning(
+                    "--parse-workers is only supported with --json-lines, "
+                    "parsing sequentially")
+            else:
+                yield from add_parameter_batches(
+                    parse_json_lines_parallel(
+                        metadata,
+                        additional_values_object,
+                        allow_override,
+                        allow_unknown,
+                        dataset.pathobj,
+                        parse_workers),
+                    dataset,
+                    allow_id_mismatch,
+                    flush_interval=max_cache_size,
+                    add_policy=add_policy)
+                return
+
         if batch_mode is False:
-            all_metadata_objects = read_json_objects(metadata, json_lines)
+            input_records, input_lines = read_input_records(
+                metadata,
+                json_lines)
             yield from add_finite_set(
-                all_metadata_objects,
+                input_records,
                 additional_values_object,
                 dataset,
                 allow_override,
                 allow_unknown,
-                allow_id_mismatch)
+                allow_id_mismatch,
+                flush_interval=max_cache_size,
+                add_policy=add_policy,
+                json_lines=input_lines)
             return
 
         if metadata != "-":
@@ -349,169 +551,1013 @@ class Add(Interface):
                 f"MetadataRecord parameter in batch mode is {metadata} instead "
                 f"of '-' (minus), ignoring it.")
 
-        all_metadata_objects = list()
-        caching_start_time = time.time()
-        result = (0, 0)
-        for metadata_object in _stdin_reader():
-
-            lgr.log(5, f"batch-mode: read: {repr(metadata_object)}")
+        batch_writer = BatchWriter(
+            additional_values_object=additional_values_object,
+            dataset=dataset,
+            allow_override=allow_override,
+            allow_unknown=allow_unknown,
+            allow_id_mismatch=allow_id_mismatch,
+            cache_limits=get_cache_limits(max_cache_size, max_cache_age),
+            durable_ack=durable_ack,
+            add_policy=add_policy)
 
-            all_metadata_objects.append(metadata_object)
-            sys.stdout.write(
-                '{"status": "ok", "action": "meta_add", "cached": true}\n')
-            sys.stdout.flush()
+        try:
+            for metadata_object in _stdin_reader():
+                lgr.log(5, f"batch-mode: read: {repr(metadata_object)}")
+                batch_writer.add(metadata_object)
+        finally:
+            succeeded, failed = batch_writer.close()
 
-            cache_age = time.time() - caching_start_time
-            if len(all_metadata_objects) >= max_cache_size or cache_age > max_cache_age:
+        write_batch_summary(succeeded, failed)
 
-                intermediate_result = flush_metadata_cache(
-                    metadata_objects=all_metadata_objects,
-                    additional_values_object=additional_values_object,
-                    dataset=dataset,
-                    allow_override=allow_override,
-                    allow_unknown=allow_unknown,
-                    allow_id_mismatch=allow_id_mismatch)
 
-                result = (
-                    result[0] + intermediate_result[0],
-                    result[1] + intermediate_result[1])
+def write_batch_summary(succeeded: int, failed: int):
+    result_json = {
+        "status": "ok" if failed == 0 else "error",
+        "succeeded": succeeded,
+        "failed": failed
+    }
 
-                all_metadata_objects = list()
-                caching_start_time = time.time()
+    lgr.log(5, f"meta-add batched mode exiting with: {json.dumps(result_json)}")
+    sys.stdout.write(json.dumps(result_json) + "\n")
+    sys.stdout.flush()
 
-        intermediate_result = flush_metadata_cache(
-            metadata_objects=all_metadata_objects,
-            additional_values_object=additional_values_object,
-            dataset=dataset,
-            allow_override=allow_override,
-            allow_unknown=allow_unknown,
-            allow_id_mismatch=allow_id_mismatch)
 
-        succeeded, failed = (
-            result[0] + intermediate_result[0],
-            result[1] + intermediate_result[1])
+def write_batch_results(results: Iterable[Dict]):
+    """ Confirm every result in batch mode and write a summary """
+    succeeded = 0
+    failed = 0
+    for result in results:
+        if result["status"] in ("ok", "notneeded"):
+            succeeded += 1
+        else:
+            failed += 1
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+    write_batch_summary(succeeded, failed)
+
+
+def spool_finite_set(metadata_objects: Iterable[JSONType],
+                     additional_values_object: JSONType,
+                     dataset: Dataset,
+                     allow_override: bool,
+                     allow_unknown: bool,
+                     spool_dir: str,
+                     spool_writer: Optional[SpoolWriter] = None,
+                     json_lines: bool = False
+                     ) -> Generator:
+    """ Append checked metadata records to a new spool file in spool_dir
+
+    The metadata store is neither read nor locked. The spool file is made
+    available for merging when all records are written. If `spool_writer`
+    is given, the records are appended to its spool file instead, and the
+    spool file is not completed. If `json_lines` is True, the records are
+    undecoded JSON lines, see `decode_input_records`.
+    """
+    if spool_writer is None:
+        with SpoolWriter(spool_dir) as spool_writer:
+            yield from spool_finite_set(
+                metadata_objects,
+                additional_values_object,
+                dataset,
+                allow_override,
+                allow_unknown,
+                spool_dir,
+                spool_writer,
+                json_lines)
+        return
 
-        result_json = {
-            "status": "ok" if failed == 0 else "error",
-            "succeeded": succeeded,
-            "failed": failed
+    for index, metadata_object, decode_error in decode_input_records(
+            metadata_objects,
+            json_lines):
+        try:
+            if decode_error is not None:
+                raise decode_error
+            metadata = process_parameters(
+                metadata=metadata_object,
+                additional_values=additional_values_object,
+                allow_override=allow_override,
+                allow_unknown=allow_unknown)
+            check_output_reference(metadata["extracted_metadata"])
+        except record_errors as e:
+            yield get_record_error_result(
+                dataset.pathobj,
+                index,
+                metadata_object,
+                e)
+            continue
+
+        spool_writer.write(metadata)
+        yield {
+            "status": "ok",
+            "action": "meta_add",
+            "type": metadata["type"],
+            "path": str(
+                dataset.pathobj
+                / Path(metadata.get("dataset_path", "."))
+                / Path(metadata.get("path", ""))),
+            "destination": str(spool_writer.path),
+            "spooled": True,
+            "message": f"spooled {metadata['type']} metadata to "
+                       f"{spool_writer.path}"
         }
 
-        lgr.log(5, f"meta-add batched mode exiting with: {json.dumps(result_json)}")
-        sys.stdout.write(json.dumps(result_json) + "\n")
-        sys.stdout.flush()
 
-
-def add_finite_set(metadata_objects: List[JSONType],
+def add_finite_set(metadata_objects: Iterable[JSONType],
                    additional_values_object: JSONType,
                    dataset: Dataset,
                    allow_override: bool,
                    allow_unknown: bool,
-                   allow_id_mismatch: bool
+                   allow_id_mismatch: bool,
+                   flush_interval: Optional[int] = None,
+                   add_policy: str = "replace-latest",
+                   json_lines: bool = False
                    ) -> Generator:
+    """ Add metadata records to the metadata store of a dataset
 
-    dataset_id = dataset.id
-    metadata_store = dataset.pathobj
+    Metadata records are consumed one by one from `metadata_objects`. After
+    every `flush_interval` records (default: max_cache_size), the modified
+    metadata is written to the metadata store and released from memory.
+    If `json_lines` is True, the records are undecoded JSON lines, see
+    `decode_input_records`.
 
-    tvl_us_cache = dict()
-    mrr_cache = dict()
+    The records are added in a transaction. Invalid records are reported as
+    errors and skipped. If any other error occurs, all records are removed
+    from the metadata store again.
+    """
+    with MetadataStoreWriter(dataset,
+                             allow_id_mismatch=allow_id_mismatch,
+                             flush_interval=flush_interval,
+                             add_policy=add_policy,
+                             transactional=True) as writer:
+
+        for index, metadata_object, decode_error in decode_input_records(
+                metadata_objects,
+                json_lines):
+            try:
+                if decode_error is not None:
+                    raise decode_error
+                metadata = process_parameters(
+                    metadata=metadata_object,
+                    additional_values=additional_values_object,
+                    allow_override=allow_override,
+                    allow_unknown=allow_unknown)
+                add_parameter = get_add_parameter(
+                    writer.metadata_store,
+                    metadata)
+            except record_errors as e:
+                yield get_record_error_result(
+                    writer.metadata_store,
+                    index,
+                    metadata_object,
+                    e)
+                continue
 
-    with locked_backend(metadata_store):
-        for metadata_object in metadata_objects:
-            metadata = process_parameters(
-                metadata=metadata_object,
-                additional_values=additional_values_object,
-                allow_override=allow_override,
-                allow_unknown=allow_unknown)
+            lgr.debug(
+                f"attempting to add metadata: '{jsoncodec.dumps(metadata)}' to "
+                f"metadata store {writer.metadata_store}")
+
+            yield from writer.add_parameter(add_parameter)
+    return
+
+
+def read_input_records(metadata: Union[str, JSONType],
+                       json_lines: bool
+                       ) -> Tuple[Iterable, bool]:
+    """ Read the input records of meta-add
+
+    JSON lines from a file or from stdin are returned undecoded, in order
+    to report undecodable lines as invalid records. The second element of
+    the returned tuple is True, if the records are undecoded JSON lines.
+    """
+    if json_lines is True and isinstance(metadata, str):
+        return _read_lines(metadata), True
+    return read_json_objects(metadata, json_lines), False
+
+
+def decode_input_records(records: Iterable,
+                         json_lines: bool
+                         ) -> Generator[
+                             Tuple[int, Optional[JSONType], Optional[Exception]],
+                             None,
+                             None]:
+    """ Enumerate input records and decode undecoded JSON lines
+
+    Yields the index of the record, the decoded record, and the decoding
+    error. If `json_lines` is True, empty lines are skipped, and the index
+    of a record is its line index, as in `parse_json_lines`. The record of a
+    line that is not valid JSON is None.
+    """
+    for index, record in enumerate(records):
+        if json_lines is False:
+            yield index, record, None
+        elif record.strip():
+            try:
+                yield index, jsoncodec.loads(record), None
+            except jsoncodec.JSONDecodeError as e:
+                yield index, None, e
+
+
+def get_record_error_result(dataset_path: Path,
+                            record_index: int,
+                            metadata_object: Optional[JSONType],
+                            exception: Exception
+                            ) -> Dict:
+    """ Create an error result for an invalid input record
+
+    The result contains the index of the record in the input, and the
+    decoded record itself, in order to allow to re-run the failed records
+    only. If the input is not valid JSON, the record is None.
+    """
+    return {
+        "status": "error",
+        "action": "meta_add",
+        "path": str(dataset_path),
+        "record_index": record_index,
+        "metadata": metadata_object,
+        "keys": getattr(exception, "keys", []),
+        "message": f"invalid metadata record {record_index}: {exception}"
+    }
+
+
+def get_batch_error_result(dataset_path: Path,
+                           first_index: int,
+                           record_count: int,
+                           exception: Exception
+                           ) -> Dict:
+    """ Create an error result for a batch of invalid input records
+
+    The result contains the index of the first record of the batch in the
+    input, and the number of records in the batch.
+    """
+    last_index = first_index + record_count - 1
+    return {
+        "status": "error",
+        "action": "meta_add",
+        "path": str(dataset_path),
+        "record_index": first_index,
+        "record_count": record_count,
+        "keys": getattr(exception, "keys", []),
+        "message":
+            f"invalid metadata records {first_index}-{last_index}: "
+            f"{exception}"
+    }
+
+
+def add_checked_batches(metadata_batches: Iterable[Union[List[JSONType], Dict]],
+                        dataset: Dataset,
+                        allow_id_mismatch: bool,
+                        flush_interval: Optional[int] = None,
+                        add_policy: str = "replace-latest"
+                        ) -> Generator:
+    """ Add batches of metadata records that were already checked
 
+    The records must have been checked and combined with their additional
+    values, e.g. by `process_parameters`. A batch may be replaced by an
+    error result, e.g. if the check of the batch failed. The error result
+    is reported, and does not abort the transaction.
+    """
+    metadata_store = dataset.pathobj
+    yield from add_parameter_batches(
+        (
+            [metadata_batch]
+            if isinstance(metadata_batch, dict)
+            else [
+                get_add_parameter(metadata_store, metadata)
+                for metadata in metadata_batch
+            ]
+            for metadata_batch in metadata_batches
+        ),
+        dataset,
+        allow_id_mismatch,
+        flush_interval=flush_interval,
+        add_policy=add_policy)
+
+
+def add_parameter_batches(parameter_batches: Iterable[List[Union[AddParameter, Dict]]],
+                          dataset: Dataset,
+                          allow_id_mismatch: bool,
+                          flush_interval: Optional[int] = None,
+                          add_policy: str = "replace-latest"
+                          ) -> Generator:
+    """ Add batches of add parameters to the metadata store of dataset
+
+    All batches are added in one transaction. Batches may contain error
+    results instead of add parameters, e.g. for invalid input records. The
+    error results are reported, and do not abort the transaction.
+    """
+    with MetadataStoreWriter(dataset,
+                             allow_id_mismatch=allow_id_mismatch,
+                             flush_interval=flush_interval,
+                             add_policy=add_policy,
+                             transactional=True) as writer:
+
+        for parameter_batch in parameter_batches:
             lgr.debug(
-                f"attempting to add metadata: '{json.dumps(metadata)}' to "
-                f"metadata store {metadata_store}")
-
-            un_versioned_path = \
-                "root_dataset_id" not in metadata \
-                and "root_dataset_version" not in metadata \
-                and "dataset_path" in metadata
-
-            add_parameter = AddParameter(
-                result_path=(
-                        metadata_store
-                        / Path(metadata.get("dataset_path", "."))
-                        / Path(metadata.get("path", ""))),
-                destination_path=metadata_store,
-                allow_id_mismatch=allow_id_mismatch,
-
-                dataset_id=UUID(metadata["dataset_id"]),
-                dataset_version=metadata["dataset_version"],
-                file_path=(
-                    MetadataPath(metadata["path"])
-                    if "path" in metadata
-                    else None),
-
-                root_dataset_id=(
-                    UUID(metadata["root_dataset_id"])
-                    if "root_dataset_id" in metadata and un_versioned_path is False
-                    else None),
-                root_dataset_version=metadata.get("root_dataset_version", None),
-                dataset_path=(
-                    MetadataPath(metadata["dataset_path"])
-                    if "dataset_path" in metadata and un_versioned_path is False
-                    else None),
-
-                unversioned_path=(
-                    MetadataPath(metadata["dataset_path"])
-                    if un_versioned_path is True
-                    else MetadataPath("")),
-
-                extractor_name=metadata["extractor_name"],
-                extractor_version=metadata["extractor_version"],
-                extraction_time=metadata["extraction_time"],
-                extraction_parameter=metadata["extraction_parameter"],
-                agent_name=metadata["agent_name"],
-                agent_email=metadata["agent_email"],
-
-                extracted_metadata=metadata["extracted_metadata"],
-
-                tvl_us_cache=tvl_us_cache,
-                mrr_cache=mrr_cache)
-
-            if not un_versioned_path:
-                error_result = check_dataset_ids(
+                f"adding batch of {len(parameter_batch)} metadata records to "
+                f"metadata store {writer.metadata_store}")
+            for add_parameter in parameter_batch:
+                if isinstance(add_parameter, dict):
+                    yield add_parameter
+                    continue
+                yield from writer.add_parameter(add_parameter)
+
+
+def parse_json_lines_parallel(path: str,
+                              additional_values_object: JSONType,
+                              allow_override: bool,
+                              allow_unknown: bool,
+                              metadata_store: Path,
+                              workers: int,
+                              chunk_size: Optional[int] = None
+                              ) -> Generator[List[Union[AddParameter, Dict]], None, None]:
+    """ Parse and check JSON lines in chunks in a process pool
+
+    The add parameters of every chunk are yielded in input order. The number
+    of chunks in flight is limited, in order to bound memory usage, if the
+    consumer of the add parameters is slower than the workers.
+    """
+    chunk_size = chunk_size or parse_chunk_size
+    pending = deque()
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        for chunk_index, chunk in enumerate(_read_line_chunks(path, chunk_size)):
+            pending.append(
+                executor.submit(
+                    parse_json_lines,
+                    chunk,
+                    chunk_index * chunk_size,
+                    additional_values_object,
+                    allow_override,
+                    allow_unknown,
+                    metadata_store))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def parse_json_lines(lines: List[str],
+                     first_index: int,
+                     additional_values_object: JSONType,
+                     allow_override: bool,
+                     allow_unknown: bool,
+                     metadata_store: Path
+                     ) -> List[Union[AddParameter, Dict]]:
+    """ Create add parameters, or error results for invalid lines """
+    result = []
+    for index, line in enumerate(lines, start=first_index):
+        if not line.strip():
+            continue
+        metadata_object = None
+        try:
+            metadata_object = jsoncodec.loads(line)
+            result.append(
+                get_add_parameter(
+                    metadata_store,
+                    process_parameters(
+                        metadata=metadata_object,
+                        additional_values=additional_values_object,
+                        allow_override=allow_override,
+                        allow_unknown=allow_unknown)))
+        except record_errors as e:
+            result.append(
+                get_record_error_result(
                     metadata_store,
-                    UUID(dataset_id),
-                    add_parameter)
-
-                if error_result:
-                    if not allow_id_mismatch:
-                        yield error_result
-                        continue
-                    lgr.warning(error_result["message"])
-
-            # If the key "path" is present in the metadata
-            # dictionary, we assume that the metadata-dictionary describes
-            # file-level metadata. Otherwise, we assume that the
-            # metadata-dictionary contains dataset-level metadata.
-            if add_parameter.file_path:
-                result = tuple(
-                    add_file_metadata(metadata_store, add_parameter))
+                    index,
+                    metadata_object,
+                    e))
+    return result
+
+
+def _read_lines(path: str) -> Generator[str, None, None]:
+    if path == "-":
+        yield from sys.stdin
+    else:
+        with open(path, "tr") as text_file:
+            yield from text_file
+
+
+def _read_line_chunks(path: str, chunk_size: int) -> Generator:
+    lines = _read_lines(path)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class MetadataStoreWriter:
+    """ Add metadata records to the metadata store of a dataset
+
+    This is the in-process interface of meta-add. Records are given as
+    `MetadataRecord`-objects, or as metadata dictionaries with the keys that
+    are described in meta-add. Neither is serialized.
+
+    Modified metadata is cached and written to the metadata store after
+    `flush_interval` records (default: max_cache_size), after the oldest
+    cached record is older than `max_age` seconds (if not None), when
+    `flush()` is called, and when the writer is closed. The metadata store is
+    locked from the first added record until the cached metadata is written.
+
+    If `transactional` is True, the metadata store stays locked until the
+    writer is closed, and all records that were added since the first add
+    form a transaction. Intermediate flushes only write the metadata below
+    the top-level nodes, i.e. below the tree version lists and UUID sets.
+    The top-level references of the metadata store are only updated, when
+    the writer is closed, i.e. readers never see a partial transaction. If
+    the transaction is discarded, e.g. due to an exception, no record of the
+    transaction is added to the store.
+
+    If the writer is used as context manager, and the context is left with
+    GeneratorExit, e.g. because a generator that yields the add-results was
+    closed early, the writer is closed normally, i.e. all records that were
+    added are kept.
+
+    Usage::
+
+        with MetadataStoreWriter(dataset) as writer:
+            for record in records:
+                for result in writer.add(record):
+                    ...
+    """
+    def __init__(self,
+                 dataset: Union[str, Path, Dataset],
+                 allow_id_mismatch: bool = False,
+                 flush_interval: Optional[int] = None,
+                 max_age: Optional[float] = None,
+                 add_policy: str = "replace-latest",
+                 transactional: bool = False):
+
+        self.dataset = check_dataset(
+            dataset if isinstance(dataset, Dataset) else str(dataset),
+            "add metadata")
+        self.dataset_id = self.dataset.id
+        self.metadata_store = self.dataset.pathobj
+        self.allow_id_mismatch = allow_id_mismatch
+        self.flush_interval = flush_interval or max_cache_size
+        self.max_age = max_age
+        self.add_policy = add_policy
+        self.transactional = transactional
+
+        self.tvl_us_cache = dict()
+        self.mrr_cache = MetadataRootRecordCache(self.metadata_store)
+        self.cached_records = 0
+        self.cache_start_time = None
+        self.locked = False
+        self.saved_references = None
+
+    def __enter__(self) -> "MetadataStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None or issubclass(exc_type, GeneratorExit):
+            # Records whose results were already reported are kept
+            self.close()
+        else:
+            # Do not write partial results
+            self.discard()
+
+    def add(self,
+            metadata_record: Union[MetadataRecord, Dict],
+            additional_values: Optional[Dict] = None,
+            allow_override: bool = False,
+            allow_unknown: bool = False
+            ) -> List[Dict]:
+        """ Add a metadata record and return the datalad result records """
+
+        if isinstance(metadata_record, MetadataRecord):
+            if additional_values:
+                raise ValueError(
+                    "additional values are not supported for MetadataRecord "
+                    "objects, use aggregation_info instead")
+            add_parameter = get_add_parameter_from_record(
+                self.metadata_store,
+                metadata_record)
+        else:
+            add_parameter = get_add_parameter(
+                self.metadata_store,
+                process_parameters(
+                    metadata=metadata_record,
+                    additional_values=additional_values or {},
+                    allow_override=allow_override,
+                    allow_unknown=allow_unknown))
+
+        return list(self.add_parameter(add_parameter))
+
+    def add_parameter(self, add_parameter: AddParameter) -> Generator:
+
+        if self.cached_records > 0 and self._is_due():
+            self.flush()
+
+        if not self.locked:
+            lock_backend(self.metadata_store)
+            self.locked = True
+            if self.transactional:
+                self.saved_references = read_store_references(
+                    self.metadata_store)
+
+        if self.cached_records == 0:
+            self.cache_start_time = time.time()
+        self.cached_records += 1
+
+        add_parameter.tvl_us_cache = self.tvl_us_cache
+        add_parameter.mrr_cache = self.mrr_cache
+        add_parameter.add_policy = self.add_policy
+
+        if add_parameter.unversioned_path == MetadataPath(""):
+            error_result = check_dataset_ids(
+                self.metadata_store,
+                UUID(self.dataset_id),
+                add_parameter)
+
+            if error_result:
+                if not self.allow_id_mismatch:
+                    yield error_result
+                    return
+                lgr.warning(error_result["message"])
+
+        # If the key "path" is present in the metadata
+        # dictionary, we assume that the metadata-dictionary describes
+        # file-level metadata. Otherwise, we assume that the
+        # metadata-dictionary contains dataset-level metadata.
+        if add_parameter.file_path:
+            result = tuple(
+                add_file_metadata(self.metadata_store, add_parameter))
+        else:
+            result = tuple(
+                add_dataset_metadata(self.metadata_store, add_parameter))
+
+        if len(result) > 1:
+            lgr.error(f"ignoring result with length > 1: {repr(result)}")
+            return
+
+        if len(result) == 1:
+            yield get_status_dict(**result[0])
+
+    def _is_due(self) -> bool:
+        return (
+            self.cached_records >= self.flush_interval
+            or (
+                self.max_age is not None
+                and time.time() - self.cache_start_time >= self.max_age))
+
+    def flush(self):
+        """ Write cached metadata to the metadata store
+
+        If the writer is not transactional, the metadata store is unlocked.
+        Otherwise, the top-level nodes are kept in the cache, and the
+        top-level references of the metadata store are not modified.
+        """
+        if self.locked:
+            if self.transactional:
+                stage_caches(
+                    self.metadata_store,
+                    self.tvl_us_cache,
+                    self.mrr_cache)
+                self.cached_records = 0
             else:
-                result = tuple(
-                    add_dataset_metadata(metadata_store, add_parameter))
+                write_out_caches(
+                    self.metadata_store,
+                    self.tvl_us_cache,
+                    self.mrr_cache)
+                self._unlock()
+
+    def discard(self):
+        """ Drop cached metadata without writing it and unlock the store
+
+        If the writer is transactional, the references of the metadata store
+        are restored, i.e. objects that were written since the transaction
+        started, are no longer referenced.
+        """
+        self.tvl_us_cache.clear()
+        self.mrr_cache.clear()
+        if self.locked:
+            if self.saved_references is not None:
+                restore_store_references(
+                    self.metadata_store,
+                    self.saved_references)
+            self._unlock()
+
+    def close(self):
+        """ Write cached metadata, commit a transaction, and unlock the store
+        """
+        if self.locked:
+            try:
+                write_out_caches(
+                    self.metadata_store,
+                    self.tvl_us_cache,
+                    self.mrr_cache)
+            except BaseException:
+                self.discard()
+                raise
+            self._unlock()
+
+    def _unlock(self):
+        self.cached_records = 0
+        self.locked = False
+        self.saved_references = None
+        unlock_backend(self.metadata_store)
+
+
+def read_store_references(metadata_store: Path) -> Dict[str, str]:
+    """ Read the top-level references of a metadata store """
+    cmd_line = git_command_line(
+        str(metadata_store),
+        "for-each-ref",
+        ["--format=%(refname) %(objectname)", "refs/datalad/"])
+    return dict(
+        line.split(" ")
+        for line in checked_execute(cmd_line)[0]
+        if line)
+
+
+def restore_store_references(metadata_store: Path,
+                             saved_references: Dict[str, str]):
+    """ Reset the top-level references of a metadata store to saved values
+
+    Objects that were written after the references were saved are not
+    removed, but they are no longer reachable from the metadata store.
+    """
+    lgr.info(f"rolling back metadata store {metadata_store}")
+    current_references = read_store_references(metadata_store)
+    for name, location in current_references.items():
+        if name not in saved_references:
+            git_delete_ref(str(metadata_store), name)
+        elif location != saved_references[name]:
+            git_update_ref(str(metadata_store), name, saved_references[name])
+
+
+def get_add_parameter(metadata_store: Path,
+                      metadata: Dict
+                      ) -> AddParameter:
+    """ Create add parameters from a checked metadata dictionary """
+
+    check_output_reference(metadata["extracted_metadata"])
+
+    un_versioned_path = \
+        "root_dataset_id" not in metadata \
+        and "root_dataset_version" not in metadata \
+        and "dataset_path" in metadata
+
+    return AddParameter(
+        result_path=(
+                metadata_store
+                / Path(metadata.get("dataset_path", "."))
+                / Path(metadata.get("path", ""))),
+        destination_path=metadata_store,
+
+        dataset_id=_as_uuid(metadata["dataset_id"]),
+        dataset_version=metadata["dataset_version"],
+        file_path=(
+            MetadataPath(metadata["path"])
+            if "path" in metadata
+            else None),
+
+        root_dataset_id=(
+            _as_uuid(metadata["root_dataset_id"])
+            if "root_dataset_id" in metadata and un_versioned_path is False
+            else None),
+        root_dataset_version=metadata.get("root_dataset_version", None),
+        dataset_path=(
+            MetadataPath(metadata["dataset_path"])
+            if "dataset_path" in metadata and un_versioned_path is False
+            else None),
+
+        unversioned_path=(
+            MetadataPath(metadata["dataset_path"])
+            if un_versioned_path is True
+            else MetadataPath("")),
+
+        extractor_name=metadata["extractor_name"],
+        extractor_version=metadata["extractor_version"],
+        extraction_time=metadata["extraction_time"],
+        extraction_parameter=metadata["extraction_parameter"],
+        agent_name=metadata["agent_name"],
+        agent_email=metadata["agent_email"],
+
+        extracted_metadata=metadata["extracted_metadata"],
+
+        tvl_us_cache=dict(),
+        mrr_cache=None)
+
+
+def get_add_parameter_from_record(metadata_store: Path,
+                                  metadata_record: MetadataRecord
+                                  ) -> AddParameter:
+
+    check_output_reference(metadata_record.extracted_metadata)
+
+    aggregation_info = metadata_record.aggregation_info
+    dataset_path = (
+        MetadataPath(aggregation_info.dataset_path)
+        if aggregation_info is not None
+        else None)
+    file_path = (
+        MetadataPath(metadata_record.path)
+        if metadata_record.type == "file"
+        else None)
+
+    return AddParameter(
+        result_path=(
+            metadata_store
+            / Path(str(dataset_path or "."))
+            / Path(str(file_path or ""))),
+        destination_path=metadata_store,
+
+        dataset_id=metadata_record.dataset_id,
+        dataset_version=metadata_record.dataset_version,
+        file_path=file_path,
+
+        root_dataset_id=(
+            _as_uuid(aggregation_info.root_dataset_id)
+            if aggregation_info is not None
+            else None),
+        root_dataset_version=(
+            aggregation_info.root_dataset_version
+            if aggregation_info is not None
+            else None),
+        dataset_path=dataset_path,
+        unversioned_path=MetadataPath(""),
+
+        extractor_name=metadata_record.extractor_name,
+        extractor_version=metadata_record.extractor_version,
+        extraction_time=metadata_record.extraction_time,
+        extraction_parameter=metadata_record.extraction_parameter,
+        agent_name=metadata_record.agent_name,
+        agent_email=metadata_record.agent_email,
+
+        extracted_metadata=metadata_record.extracted_metadata,
+
+        tvl_us_cache=dict(),
+        mrr_cache=None)
+
+
+def _as_uuid(value: Union[str, UUID]) -> UUID:
+    return value if isinstance(value, UUID) else UUID(value)
+
+
+def write_out_caches(metadata_store: Path,
+                     tvl_us_cache: dict,
+                     mrr_cache: "MetadataRootRecordCache"):
+    """ Write the cached top nodes to the metadata store and clear the caches
+
+    Clearing the caches releases all cached metadata objects. They are read
+    from the metadata store again, when they are accessed the next time.
+    """
+    for tree_version_list, uuid_set in tvl_us_cache.values():
+        tree_version_list.write_out(str(metadata_store))
+        uuid_set.write_out(str(metadata_store))
 
-            if len(result) > 1:
-                lgr.error(f"ignoring result with length > 1: {repr(result)}")
-                continue
+    flush_object_references(metadata_store)
 
-            if len(result) == 1:
-                yield get_status_dict(**result[0])
+    tvl_us_cache.clear()
+    mrr_cache.clear()
 
-        for tree_version_list, uuid_set in tvl_us_cache.values():
-            tree_version_list.write_out(str(metadata_store))
-            uuid_set.write_out(str(metadata_store))
 
-        flush_object_references(metadata_store)
+def stage_caches(metadata_store: Path,
+                 tvl_us_cache: dict,
+                 mrr_cache: "MetadataRootRecordCache"):
+    """ Write the cached metadata below the top nodes and purge it
 
-    return
+    The cached top nodes, i.e. tree version lists and UUID sets, are neither
+    written nor removed from the cache. The top-level references of the
+    metadata store are therefore not modified. The objects below the top
+    nodes are written, purged from memory, and read in again when they are
+    accessed the next time. They are added to the object references of the
+    metadata store, in order to protect them from garbage collection.
+    """
+    realm = str(metadata_store)
+    for top_nodes in tvl_us_cache.values():
+        for top_node in top_nodes:
+            for sub_object in list(top_node.modifiable_sub_objects):
+                sub_object.write_out(realm)
+                sub_object.purge()
+
+    flush_object_references(metadata_store)
+    mrr_cache.clear()
+
+
+def get_cache_limits(size: Optional[int],
+                     age: Optional[float]
+                     ) -> Tuple[int, float]:
+    return (
+        max_cache_size if size is None else size,
+        max_cache_age if age is None else age)
+
+
+class BatchWriter:
+    """ Write batch mode records to the metadata store in the background
+
+    Records are collected in a cache. If the cache size or the age of the
+    oldest cached record reaches its limit, the cached records are handed to
+    a writer thread, and a new cache is started (double buffering). Adding
+    records only blocks if the new cache is full while the writer thread is
+    still writing the previous records.
+
+    If `durable_ack` is False, every record is confirmed as "cached" when it
+    is added. Otherwise, the add-results are reported after the records were
+    written and the object references were flushed.
+    """
+    def __init__(self,
+                 additional_values_object: JSONType,
+                 dataset: Dataset,
+                 allow_override: bool,
+                 allow_unknown: bool,
+                 allow_id_mismatch: bool,
+                 cache_limits: Tuple[int, float],
+                 durable_ack: bool = False,
+                 add_policy: str = "replace-latest"):
+
+        self.additional_values_object = additional_values_object
+        self.dataset = dataset
+        self.allow_override = allow_override
+        self.allow_unknown = allow_unknown
+        self.allow_id_mismatch = allow_id_mismatch
+        self.max_cache_size, self.max_cache_age = cache_limits
+        self.durable_ack = durable_ack
+        self.add_policy = add_policy
+
+        self.condition = threading.Condition()
+        self.cache = list()
+        self.cache_start_time = None
+        self.writing = False
+        self.closing = False
+        self.error = None
+        self.result = (0, 0)
+
+        self.output_lock = threading.Lock()
+        self.thread = threading.Thread(
+            target=self._write_loop,
+            name="meta-add-batch-writer",
+            daemon=True)
+        self.thread.start()
+
+    def add(self, metadata_object: JSONType):
+        with self.condition:
+            while len(self.cache) >= self.max_cache_size \
+                    and self.writing \
+                    and self.error is None:
+                self.condition.wait()
+            self._check_error()
+            if not self.cache:
+                self.cache_start_time = time.time()
+            self.cache.append(metadata_object)
+            self.condition.notify_all()
+
+        if not self.durable_ack:
+            self._write_output(
+                '{"status": "ok", "action": "meta_add", "cached": true}\n')
+
+    def close(self) -> Tuple[int, int]:
+        """ Write all remaining records and stop the writer thread
+
+        :return: a tuple containing the number of successfully added records
+                 and the number of failed records
+        """
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+        self._check_error()
+        return self.result
+
+    def _check_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _write_output(self, line: str):
+        with self.output_lock:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+    def _is_due(self) -> bool:
+        return (
+            len(self.cache) >= self.max_cache_size
+            or time.time() - self.cache_start_time >= self.max_cache_age)
+
+    def _write_loop(self):
+        while True:
+            with self.condition:
+                while not self.closing \
+                        and not (self.cache and self._is_due()):
+                    self.condition.wait(
+                        timeout=(
+                            self.max_cache_age
+                            - (time.time() - self.cache_start_time)
+                            if self.cache
+                            else None))
+                if self.closing and not self.cache:
+                    return
+                metadata_objects, self.cache = self.cache, list()
+                self.writing = True
+                self.condition.notify_all()
+
+            try:
+                result = self._write(metadata_objects)
+            except Exception as e:
+                with self.condition:
+                    self.error = e
+                    self.writing = False
+                    self.condition.notify_all()
+                return
+
+            with self.condition:
+                self.result = (
+                    self.result[0] + result[0],
+                    self.result[1] + result[1])
+                self.writing = False
+                self.condition.notify_all()
+
+    def _write(self, metadata_objects: List[JSONType]) -> Tuple[int, int]:
+        if not self.durable_ack:
+            return flush_metadata_cache(
+                metadata_objects=metadata_objects,
+                additional_values_object=self.additional_values_object,
+                dataset=self.dataset,
+                allow_override=self.allow_override,
+                allow_unknown=self.allow_unknown,
+                allow_id_mismatch=self.allow_id_mismatch,
+                add_policy=self.add_policy)
+
+        # add_finite_set flushes the object references after the last result
+        # was yielded. Results are therefore collected, and only reported
+        # after the generator is exhausted.
+        results = list(
+            add_finite_set(
+                metadata_objects,
+                self.additional_values_object,
+                self.dataset,
+                self.allow_override,
+                self.allow_unknown,
+                self.allow_id_mismatch,
+                add_policy=self.add_policy))
+
+        succeeded = 0
+        for result in results:
+            if result["status"] in ("ok", "notneeded"):
+                succeeded += 1
+            self._write_output(
+                json.dumps({
+                    **{
+                        key: value
+                        for key, value in result.items()
+                        if key != "logger"
+                    },
+                    "durable": True}) + "\n")
+        return succeeded, len(results) - succeeded
+
+
+class MetadataRootRecordCache:
+    """ A bounded LRU-cache for metadata root records and their elements
+
+    The cache maps keys to tuples of a metadata root record, its
+    dataset-level metadata, and its file tree. If the number of cached
+    entries exceeds `max_size` (default: max_mrr_cache_size), the least
+    recently used entry is evicted. The dataset-level metadata and the file
+    tree of an evicted entry are written back to the metadata store and
+    purged from memory. The metadata root record itself stays in the tree
+    version list, it is marked as modified, in order to store the new
+    references of its elements when the top nodes are written out.
+    """
+    def __init__(self,
+                 metadata_store: Path,
+                 max_size: Optional[int] = None):
+        self.realm = str(metadata_store)
+        self.max_size = max_size or max_mrr_cache_size
+        self.entries = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def __getitem__(self, key) -> Tuple[MetadataRootRecord, Metadata, FileTree]:
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def __setitem__(self,
+                    key,
+                    entry: Tuple[MetadataRootRecord, Metadata, FileTree]):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            _, evicted_entry = self.entries.popitem(last=False)
+            self._write_back(evicted_entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def _write_back(self, entry: Tuple[MetadataRootRecord, Metadata, FileTree]):
+        mrr, metadata, file_tree = entry
+        lgr.debug(f"writing back evicted metadata root record {mrr}")
+        for element in (metadata, file_tree):
+            element.write_out(self.realm)
+            element.purge()
+        mrr.touch()
 
 
 def flush_metadata_cache(metadata_objects: List[JSONType],
@@ -519,12 +1565,14 @@ def flush_metadata_cache(metadata_objects: List[JSONType],
                          dataset: Dataset,
                          allow_override: bool,
                          allow_unknown: bool,
-                         allow_id_mismatch: bool) -> Tuple[int, int]:
+                         allow_id_mismatch: bool,
+                         add_policy: str = "replace-latest"
+                         ) -> Tuple[int, int]:
 
     return reduce(
         lambda result, record:
             (result[0] + 1, result[1])
-            if record["status"] == "ok"
+            if record["status"] in ("ok", "notneeded")
             else (result[0], result[1] + 1),
         add_finite_set(
             metadata_objects,
@@ -532,14 +1580,15 @@ def flush_metadata_cache(metadata_objects: List[JSONType],
             dataset,
             allow_override,
             allow_unknown,
-            allow_id_mismatch),
+            allow_id_mismatch,
+            add_policy=add_policy),
         (0, 0)
     )
 
 
 def get_json_object(string_or_object: Union[str, JSONType]) -> JSONType:
     if isinstance(string_or_object, str):
-        return json.loads(string_or_object)
+        return jsoncodec.loads(string_or_object)
     return cast(JSONType, string_or_object)
 
 
@@ -828,7 +1877,9 @@ def add_file_metadata(metadata_store: Path, ap: AddParameter):
         file_level_metadata = Metadata()
         file_tree.add_metadata(ap.file_path, file_level_metadata)
 
-    add_metadata_content(file_level_metadata, ap)
+    if not add_metadata_content(file_level_metadata, ap):
+        yield get_skipped_result("file", ap)
+        return
 
     yield {
         "status": "ok",
@@ -846,7 +1897,9 @@ def add_dataset_metadata(metadata_store: Path, ap: AddParameter):
     _, _, _, metadata, file_tree = \
         get_tvl_uuid_mrr_metadata_file_tree(metadata_store, ap)
 
-    add_metadata_content(metadata, ap)
+    if not add_metadata_content(metadata, ap):
+        yield get_skipped_result("dataset", ap)
+        return
 
     yield {
         "status": "ok",
@@ -859,16 +1912,99 @@ def add_dataset_metadata(metadata_store: Path, ap: AddParameter):
     return
 
 
-def add_metadata_content(metadata: Metadata, ap: AddParameter):
+def get_skipped_result(result_type: str, ap: AddParameter) -> dict:
+    return {
+        "status": "notneeded",
+        "action": "meta_add",
+        "type": result_type,
+        "path": str(ap.result_path),
+        "destination": str(ap.destination_path),
+        "message": (
+            f"identical {result_type} metadata of extractor "
+            f"{ap.extractor_name} already in {ap.destination_path}")
+    }
+
+
+def add_metadata_content(metadata: Metadata, ap: AddParameter) -> bool:
+    """ Add an extractor run to metadata, according to the add policy
+
+    :return: True if the extractor run was added, False if the add policy
+             is "skip-identical" and an identical run is already stored
+    """
+    configuration = ExtractorConfiguration(
+        ap.extractor_version,
+        ap.extraction_parameter)
+
+    if ap.add_policy == "skip-identical" \
+            and is_stored_extractor_run(
+                metadata,
+                ap.extractor_name,
+                configuration,
+                ap.extracted_metadata,
+                ap.destination_path):
+        lgr.debug(
+            f"skipping identical run of {ap.extractor_name} for "
+            f"{ap.result_path}")
+        if is_output_reference(ap.extracted_metadata):
+            remove_output_location(ap.extracted_metadata)
+        return False
+
+    extracted_metadata = ap.extracted_metadata
+    if is_output_reference(extracted_metadata):
+        # Stream FILE- or DIRECTORY-output into the metadata store and
+        # store the object reference instead of the output content.
+        extracted_metadata = store_output_reference(
+            ap.destination_path,
+            extracted_metadata)
+
     metadata.add_extractor_run(
         ap.extraction_time,
         ap.extractor_name,
         ap.agent_name,
         ap.agent_email,
-        ExtractorConfiguration(
-            ap.extractor_version,
-            ap.extraction_parameter),
-        ap.extracted_metadata)
+        configuration,
+        extracted_metadata)
+    return True
+
+
+def get_metadata_digest(extracted_metadata: JSONType) -> str:
+    return hashlib.sha1(
+        json.dumps(
+            extracted_metadata,
+            sort_keys=True,
+            separators=(",", ":")).encode()).hexdigest()
+
+
+def is_stored_extractor_run(metadata: Metadata,
+                            extractor_name: str,
+                            configuration: ExtractorConfiguration,
+                            extracted_metadata: JSONType,
+                            metadata_store: Path
+                            ) -> bool:
+    """ Check whether an identical extractor run is stored in metadata
+
+    Extractor runs are stored per extractor name and configuration, i.e.
+    extractor version and extraction parameter. An extractor run is
+    identical to a stored run, if the digests of their extracted metadata
+    are equal. Unstored output references are compared by the hash of
+    their output, which is not written to the metadata store.
+    """
+    if extractor_name not in metadata.extractors:
+        return False
+
+    instance_set = metadata.extractor_runs_for_extractor(extractor_name)
+    if configuration not in instance_set.configurations:
+        return False
+
+    stored_instance = instance_set.get_instance_for_configuration(
+        configuration)
+    if is_output_reference(extracted_metadata):
+        extracted_metadata = hash_output_reference(
+            metadata_store,
+            extracted_metadata)
+    return (
+        get_metadata_digest(stored_instance.metadata_content)
+        == get_metadata_digest(extracted_metadata))
 
 
 def _stdin_reader() -> Generator:
@@ -876,8 +2012,8 @@ def _stdin_reader() -> Generator:
         if line == "\n":
             return
         try:
-            yield json.loads(line)
-        except json.JSONDecodeError:
+            yield jsoncodec.loads(line)
+        except jsoncodec.JSONDecodeError:
             sys.stdout.write(
                 json.dumps({
                     "status": "error",
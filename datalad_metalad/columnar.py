@@ -0,0 +1,365 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""
+Read metadata records from Parquet files and Arrow IPC files.
+
+Every row of the input contains one metadata record. The column names are
+the keys of a metadata record, e.g. "type", "extractor_name",
+"dataset_id", etc. Null values in optional columns, e.g. "path", are
+treated as missing keys. The columns "extraction_parameter" and
+"extracted_metadata" may be struct-, map-, or list-columns, or string
+columns that contain JSON-serialized values. Map values, also if they are
+nested in structs or lists, are converted to dictionaries.
+
+The input is processed in record batches. The keys of all records in a batch
+are checked column-wise, i.e. with the same rules as `process_parameters`,
+but without inspecting the records individually. A batch that fails the
+check is reported as an error result, and the following batches are still
+processed.
+
+This module requires the optional dependency "pyarrow".
+"""
+import json
+import logging
+from functools import reduce
+from itertools import chain
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+from uuid import UUID
+
+from .add import (
+    Add,
+    get_batch_error_result,
+    record_errors,
+)
+from .exceptions import MetadataKeyException
+from .metadatatypes import JSONType
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+lgr = logging.getLogger("datalad.metadata.columnar")
+
+columnar_formats = ("parquet", "arrow")
+
+default_batch_size = 10000
+
+json_columns = ("extraction_parameter", "extracted_metadata")
+uuid_columns = ("dataset_id", "root_dataset_id")
+
+
+def read_record_batches(path: str,
+                        input_format: str,
+                        batch_size: Optional[int] = None
+                        ) -> Iterable["pyarrow.RecordBatch"]:
+    """ Read record batches from a Parquet file or an Arrow IPC file """
+    if pyarrow is None:
+        raise RuntimeError(
+            f"reading {input_format} input requires the python "
+            f"package 'pyarrow', please install it")
+
+    if input_format == "parquet":
+        yield from pyarrow.parquet.ParquetFile(path).iter_batches(
+            batch_size=batch_size or default_batch_size)
+        return
+
+    if input_format == "arrow":
+        with pyarrow.memory_map(path) as source:
+            try:
+                reader = pyarrow.ipc.open_file(source)
+                batches = (
+                    reader.get_batch(index)
+                    for index in range(reader.num_record_batches))
+            except pyarrow.ArrowInvalid:
+                # Not in IPC file format, try IPC stream format
+                source.seek(0)
+                batches = pyarrow.ipc.open_stream(source)
+            yield from batches
+        return
+
+    raise ValueError(f"unknown columnar input format: {input_format}")
+
+
+def check_record_batch(batch: "pyarrow.RecordBatch",
+                       additional_values: Dict,
+                       allow_override: bool,
+                       allow_unknown: bool):
+    """ Check the keys of all metadata records in a record batch
+
+    This raises MetadataKeyException in the same situations in which
+    `process_parameters` would raise it for at least one record in the
+    batch.
+    """
+    columns = set(batch.schema.names)
+
+    overridden_keys = [
+        key
+        for key in additional_values
+        if key in columns]
+
+    if overridden_keys:
+        if allow_override is False:
+            raise MetadataKeyException(
+                "Keys overridden by additional values",
+                overridden_keys)
+        lgr.info(
+            "keys overridden in additional values: "
+            + ", ".join(overridden_keys))
+
+    # Columns that are overridden by additional values are not checked
+    columns -= set(additional_values)
+    keys = columns | set(additional_values)
+
+    missing_keys = [
+        key
+        for key in Add.required_keys
+        if key not in keys or _null_count(batch, columns, key) > 0]
+
+    if missing_keys:
+        raise MetadataKeyException(
+            "Missing keys",
+            missing_keys)
+
+    # Check completeness of non-mandatory keys. In every record either all
+    # of them, or none of them has to be present.
+    null_masks = {
+        key: _is_null(batch, columns, additional_values, key)
+        for key in Add.required_additional_keys}
+    any_present = reduce(
+        pyarrow.compute.or_,
+        map(pyarrow.compute.invert, null_masks.values()))
+
+    non_mandatory_missing_keys = [
+        key
+        for key, null_mask in null_masks.items()
+        if pyarrow.compute.any(
+            pyarrow.compute.and_(null_mask, any_present)).as_py()]
+
+    if non_mandatory_missing_keys:
+        raise MetadataKeyException(
+            "Non mandatory keys missing",
+            non_mandatory_missing_keys)
+
+    unknown_keys = [
+        key
+        for key in sorted(keys)
+        if key not in chain(
+            Add.required_keys,
+            Add.required_additional_keys,
+            Add.optional_keys)]
+
+    if unknown_keys:
+        if not allow_unknown:
+            raise MetadataKeyException("Unknown keys", unknown_keys)
+        lgr.warning("Unknown keys in metadata: " + ", ".join(unknown_keys))
+
+    # Check dataset/file consistence
+    if "type" in additional_values:
+        types = pyarrow.array([additional_values["type"]] * batch.num_rows)
+    else:
+        types = batch.column("type")
+
+    unknown_types = [
+        value
+        for value in pyarrow.compute.unique(types).to_pylist()
+        if value not in ("file", "dataset")]
+    if unknown_types:
+        raise MetadataKeyException(f"Unknown type {unknown_types[0]}")
+
+    is_file = pyarrow.compute.equal(types, "file")
+    if "path" in additional_values:
+        paths = pyarrow.array([additional_values["path"]] * batch.num_rows)
+    elif "path" in columns:
+        paths = batch.column("path")
+    else:
+        paths = pyarrow.nulls(batch.num_rows, pyarrow.string())
+
+    if pyarrow.compute.any(
+            pyarrow.compute.and_(
+                is_file,
+                pyarrow.compute.is_null(paths))).as_py():
+        raise MetadataKeyException(
+            "Missing path-property in file-type metadata")
+
+    if pyarrow.compute.any(
+            pyarrow.compute.and_kleene(
+                pyarrow.compute.invert(is_file),
+                pyarrow.compute.not_equal(paths, "."))).as_py():
+        raise MetadataKeyException(
+            "Non-'.' path-property in dataset-type metadata")
+
+
+def get_metadata_records(batch: "pyarrow.RecordBatch",
+                         additional_values: Dict
+                         ) -> List[JSONType]:
+    """ Convert a checked record batch into metadata dictionaries """
+
+    optional_keys = set(chain(
+        Add.optional_keys,
+        Add.required_additional_keys))
+
+    names = [
+        name
+        for name in batch.schema.names
+        if name not in additional_values]
+
+    column_values = []
+    for name in names:
+        column = batch.column(name)
+        values = column.to_pylist()
+        if name in json_columns and _is_string_type(column.type):
+            values = [
+                json.loads(value) if value is not None else None
+                for value in values]
+        elif name in json_columns and _contains_map_type(column.type):
+            values = [
+                _convert_maps(value, column.type)
+                for value in values]
+        elif name in uuid_columns and _is_uuid_type(column.type):
+            values = [
+                str(UUID(bytes=value)) if value is not None else None
+                for value in values]
+        column_values.append(values)
+
+    return [
+        {
+            **{
+                name: value
+                for name, value in zip(names, row)
+                if value is not None or name not in optional_keys
+            },
+            **additional_values
+        }
+        for row in zip(*column_values)
+    ]
+
+
+def read_columnar_metadata(path: str,
+                           input_format: str,
+                           additional_values: Dict,
+                           allow_override: bool,
+                           allow_unknown: bool,
+                           dataset_path: Path,
+                           batch_size: Optional[int] = None
+                           ) -> Iterable[Union[List[JSONType], Dict]]:
+    """ Read checked metadata records in batches from a columnar file
+
+    A batch that fails the check, or that cannot be converted, is replaced
+    by an error result that contains the row offset of the batch.
+    """
+    row_offset = 0
+    for batch in read_record_batches(path, input_format, batch_size):
+        if batch.num_rows == 0:
+            continue
+        try:
+            check_record_batch(
+                batch,
+                additional_values,
+                allow_override,
+                allow_unknown)
+            metadata_batch = get_metadata_records(batch, additional_values)
+        except record_errors as e:
+            metadata_batch = get_batch_error_result(
+                dataset_path,
+                row_offset,
+                batch.num_rows,
+                e)
+        row_offset += batch.num_rows
+        yield metadata_batch
+
+
+def _null_count(batch: "pyarrow.RecordBatch",
+                columns: set,
+                key: str) -> int:
+    return batch.column(key).null_count if key in columns else 0
+
+
+def _is_null(batch: "pyarrow.RecordBatch",
+             columns: set,
+             additional_values: Dict,
+             key: str) -> "pyarrow.Array":
+    if key in additional_values or key not in columns:
+        return pyarrow.array(
+            [key not in additional_values] * batch.num_rows)
+    return pyarrow.compute.is_null(batch.column(key))
+
+
+def _is_string_type(data_type: "pyarrow.DataType") -> bool:
+    return (
+        pyarrow.types.is_string(data_type)
+        or pyarrow.types.is_large_string(data_type))
+
+
+def _is_list_type(data_type: "pyarrow.DataType") -> bool:
+    return (
+        pyarrow.types.is_list(data_type)
+        or pyarrow.types.is_large_list(data_type)
+        or pyarrow.types.is_fixed_size_list(data_type))
+
+
+def _get_value_types(data_type: "pyarrow.DataType"
+                     ) -> List["pyarrow.DataType"]:
+    if pyarrow.types.is_map(data_type):
+        return [data_type.item_type]
+    if pyarrow.types.is_struct(data_type):
+        return [
+            data_type.field(index).type
+            for index in range(data_type.num_fields)]
+    if _is_list_type(data_type):
+        return [data_type.value_type]
+    return []
+
+
+def _contains_map_type(data_type: "pyarrow.DataType") -> bool:
+    return (
+        pyarrow.types.is_map(data_type)
+        or any(map(_contains_map_type, _get_value_types(data_type))))
+
+
+def _convert_maps(value: JSONType,
+                  data_type: "pyarrow.DataType"
+                  ) -> JSONType:
+    """ Convert map values, i.e. lists of key-value pairs, to dictionaries
+
+    `value` is a python value of an array of type `data_type`, as returned
+    by `Array.to_pylist()`.
+    """
+    if value is None:
+        return None
+    if pyarrow.types.is_map(data_type):
+        return {
+            key: _convert_maps(item, data_type.item_type)
+            for key, item in value}
+    if pyarrow.types.is_struct(data_type):
+        return {
+            field.name: _convert_maps(value[field.name], field.type)
+            for field in map(data_type.field, range(data_type.num_fields))}
+    if _is_list_type(data_type):
+        return [
+            _convert_maps(item, data_type.value_type)
+            for item in value]
+    return value
+
+
+def _is_uuid_type(data_type: "pyarrow.DataType") -> bool:
+    return (
+        pyarrow.types.is_fixed_size_binary(data_type)
+        and data_type.byte_width == 16)
@@ -52,6 +52,11 @@ from .pipeline.consumer.base import Consumer
 from .pipeline.processor.base import Processor
 from .pipeline.provider.base import Provider
 from .metadatatypes import JSONType
+from .resourceusage import (
+    ResourceStatistics,
+    resource_usage_key,
+)
+from .spool import close_shared_spool_writers
 from .utils import read_json_object
 
 
@@ -157,6 +162,14 @@ class Conduct(Interface):
                    (default: "process").""",
             constraints=EnsureChoice("process", "thread", "sequential"),
             default="process"),
+        statistics=Parameter(
+            args=("--statistics",),
+            doc="""Report the aggregated resource usage of all metadata
+                   extractions, i.e. wall time, CPU time, peak RSS increase,
+                   and bytes read, per extractor and per file type in a
+                   final result of type "statistics".""",
+            action="store_true",
+            default=False),
         pipeline_help=Parameter(
             args=("--pipeline-help",),
             doc="Show documentation for the elements in the pipeline and exit.",
@@ -188,7 +201,8 @@ class Conduct(Interface):
             arguments: List[str],
             max_workers: Optional[int] = None,
             processing_mode: str = "process",
-            pipeline_help: bool = False):
+            pipeline_help: bool = False,
+            statistics: bool = False):
 
         element_arguments = arguments
         conduct_configuration = read_json_object(configuration)
@@ -260,25 +274,74 @@ class Conduct(Interface):
             })
 
         if processing_mode == "sequential":
-            yield from process_sequential(
+            executor = None
+            results = process_sequential(
                 provider_instance,
                 conduct_configuration["processors"],
                 evaluated_constructor_args,
                 consumer_instance)
-            return
-        elif processing_mode == "thread":
-            executor = concurrent.futures.ThreadPoolExecutor(max_workers)
-        elif processing_mode == "process":
-            executor = concurrent.futures.ProcessPoolExecutor(max_workers)
         else:
-            raise ValueError(f"unsupported processing mode: {processing_mode}")
+            if processing_mode == "thread":
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+            elif processing_mode == "process":
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers)
+            else:
+                raise ValueError(
+                    f"unsupported processing mode: {processing_mode}")
+
+            results = process_parallel(
+                executor,
+                provider_instance,
+                conduct_configuration["processors"],
+                evaluated_constructor_args,
+                consumer_instance)
 
-        yield from process_parallel(
-            executor,
-            provider_instance,
-            conduct_configuration["processors"],
-            evaluated_constructor_args,
-            consumer_instance)
+        resource_statistics = ResourceStatistics()
+        try:
+            for result in results:
+                add_resource_statistics(resource_statistics, result)
+                yield result
+        finally:
+            if executor is not None:
+                # Worker processes complete their shared spool files, when
+                # they exit.
+                executor.shutdown()
+            close_shared_spool_writers()
+            if consumer_instance:
+                consumer_instance.finish()
+
+        if not resource_statistics.is_empty():
+            lgr.debug(
+                f"resource usage statistics: {resource_statistics.to_json()}")
+            if statistics is True:
+                yield dict(
+                    action="meta_conduct",
+                    status="ok",
+                    type="statistics",
+                    logger=lgr,
+                    statistics=resource_statistics.to_json())
+
+
+def add_resource_statistics(resource_statistics: ResourceStatistics,
+                            result: dict):
+    """ Add the resource usage of metadata results to the statistics """
+
+    pipeline_data = result.get("pipeline_data", None)
+    if not isinstance(pipeline_data, dict):
+        return
+
+    for metadata_result in pipeline_data["result"].get("metadata", []):
+        usage = metadata_result.get(resource_usage_key, None)
+        if usage is None:
+            continue
+        metadata_record = metadata_result.get("metadata_record", None) or {}
+        resource_statistics.add(
+            metadata_record.get("extractor_name", "<unknown>"),
+            (
+                metadata_result.get("path", None)
+                if metadata_record.get("type", None) == "file"
+                else None),
+            usage)
 
 
 def process_parallel(executor,
@@ -288,91 +351,24 @@ def process_parallel(executor,
                      consumer_instance: Consumer | None = None
                      ) -> Iterable:
 
-    running = set()
-
-    # This thread iterates over the provider result,
-    # starts a new processor instance to process the result,
-    # and feeds the result of every pipeline into the consumer.
-    for pipeline_data in provider_instance.next_object():
-
-        # Handle the "provider-only" case
-        if not processor_specs:
-            path = pipeline_data.get_result("path")
-            yield dict(
-                action="meta_conduct",
-                status="ok",
-                path=str(path),
-                logger=lgr,
-                pipeline_data=pipeline_data.to_json())
-            continue
+    # Maps running processor futures to the provider result they process
+    running = dict()
 
-        lgr.debug(f"Starting new instance of {processor_specs[0]} on {pipeline_data}")
+    def start_processor(index: int,
+                        pipeline_data: PipelineData,
+                        provider_result: PipelineData):
         processor = create_processor_instance(
-            processor_specs[0],
+            processor_specs[index],
             evaluated_constructor_args)
-        running.add(
+        running[
             executor.submit(
                 processor.execute,
-                -1,
-                pipeline_data))
-
-        # During provider result fetching, check for already finished processors
-        done, running = concurrent.futures.wait(
-            running,
-            return_when=concurrent.futures.FIRST_COMPLETED,
-            timeout=0)
-
-        for future in done:
-            try:
-
-                source_index, pipeline_data = future.result()
-                this_index = source_index + 1
-                next_index = this_index + 1
-
-                lgr.debug(
-                    f"Processor[{source_index}] returned {pipeline_data} "
-                    f"[provider not yet exhausted]")
-                if next_index >= len(processor_specs):
-                    if consumer_instance:
-                        pipeline_data = consumer_instance.consume(pipeline_data)
-
-                    path = pipeline_data.get_result("path")
-                    if path is not None:
-                        yield dict(
-                            action="meta_conduct",
-                            status="ok",
-                            path=str(path),
-                            logger=lgr,
-                            pipeline_data=pipeline_data.to_json())
-                else:
-                    lgr.debug(
-                        f"Starting processor[{next_index}]"
-                        f"[provider not yet exhausted]")
-                    processor = create_processor_instance(
-                        processor_specs[next_index],
-                        evaluated_constructor_args)
-                    running.add(
-                        executor.submit(
-                            processor.execute,
-                            this_index,
-                            pipeline_data))
-
-            except Exception as e:
-                lgr.error(f"Exception {e} in processor {future}")
-                yield dict(
-                    action="meta_conduct",
-                    status="error",
-                    logger=lgr,
-                    message=traceback.format_exc())
-
-    # Provider exhausted, process the running pipelines
-    while running:
-        lgr.debug(f"Waiting for next completing from {running}")
-        done, running = concurrent.futures.wait(
-            running,
-            return_when=concurrent.futures.FIRST_COMPLETED)
+                index - 1,
+                pipeline_data)] = provider_result
 
+    def finish_processors(done: set[concurrent.futures.Future]) -> Iterable:
         for future in done:
+            provider_result = running.pop(future)
             try:
 
                 source_index, pipeline_data = future.result()
@@ -383,6 +379,7 @@ def process_parallel(executor,
                     f"Processor[{source_index}] returned {pipeline_data}")
 
                 if next_index >= len(processor_specs):
+                    provider_instance.release(provider_result)
                     if consumer_instance:
                         pipeline_data = consumer_instance.consume(pipeline_data)
                     lgr.debug(
@@ -401,23 +398,57 @@ def process_parallel(executor,
                     lgr.debug(
                         f"Handing pipeline data {pipeline_data} to"
                         f"processor[{next_index}]")
-                    processor = create_processor_instance(
-                        spec=processor_specs[next_index],
-                        evaluated_constructor_args=evaluated_constructor_args
-                    )
-                    running.add(
-                        executor.submit(
-                            processor.execute,
-                            this_index,
-                            pipeline_data))
+                    start_processor(next_index, pipeline_data, provider_result)
 
             except Exception as e:
+                provider_instance.release(provider_result)
                 lgr.error(f"Exception {e} in processor {future}")
                 yield dict(
                     action="meta_conduct",
                     status="error",
                     logger=lgr,
                     message=traceback.format_exc())
+
+    # This thread iterates over the provider result,
+    # starts a new processor instance to process the result,
+    # and feeds the result of every pipeline into the consumer.
+    for pipeline_data in provider_instance.next_object():
+
+        # Handle the "provider-only" case
+        if not processor_specs:
+            provider_instance.release(pipeline_data)
+            path = pipeline_data.get_result("path")
+            yield dict(
+                action="meta_conduct",
+                status="ok",
+                path=str(path),
+                logger=lgr,
+                pipeline_data=pipeline_data.to_json())
+            continue
+
+        lgr.debug(f"Starting new instance of {processor_specs[0]} on {pipeline_data}")
+        start_processor(0, pipeline_data, pipeline_data)
+
+        # During provider result fetching, check for already finished
+        # processors. If the provider is saturated, wait for running
+        # processors to finish, until the provider can provide more results.
+        while running:
+            saturated = provider_instance.is_saturated()
+            done, _ = concurrent.futures.wait(
+                running,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+                timeout=None if saturated else 0)
+            yield from finish_processors(done)
+            if not saturated:
+                break
+
+    # Provider exhausted, process the running pipelines
+    while running:
+        lgr.debug(f"Waiting for next completing from {running}")
+        done, _ = concurrent.futures.wait(
+            running,
+            return_when=concurrent.futures.FIRST_COMPLETED)
+        yield from finish_processors(done)
     return
 
 
@@ -429,11 +460,14 @@ def process_sequential(provider_instance: Provider,
 
     for pipeline_data in provider_instance.next_object():
         lgr.debug(f"Provider yielded: {pipeline_data}")
-        yield from process_downstream(
-            pipeline_data=pipeline_data,
-            processor_specs=processor_specs,
-            evaluated_constructor_args=evaluated_constructor_args,
-            consumer_instance=consumer_instance)
+        try:
+            yield from process_downstream(
+                pipeline_data=pipeline_data,
+                processor_specs=processor_specs,
+                evaluated_constructor_args=evaluated_constructor_args,
+                consumer_instance=consumer_instance)
+        finally:
+            provider_instance.release(pipeline_data)
 
 
 def process_downstream(pipeline_data: PipelineData,
@@ -14,13 +14,31 @@ Dump metadata of a dataset
 __docformat__ = 'restructuredtext'
 
 
-import json
+import concurrent.futures
+import enum
+import hashlib
 import logging
+import queue
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from functools import (
+    lru_cache,
+    partial,
+)
 from pathlib import Path
 from typing import (
     cast,
     Any,
+    Callable,
+    FrozenSet,
     Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
     Union,
 )
 from uuid import UUID
@@ -32,12 +50,25 @@ from datalad.interface.base import (
     eval_results,
 )
 from datalad.support.constraints import (
+    EnsureInt,
     EnsureNone,
     EnsureStr,
 )
 from datalad.support.param import Parameter
 from datalad.ui import ui
-from dataladmetadatamodel.datasettree import datalad_root_record_name
+from dataladmetadatamodel.datasettree import (
+    DatasetTree,
+    datalad_root_record_name,
+)
+from dataladmetadatamodel.mapper import get_mapper
+from dataladmetadatamodel.mapper.gitmapper.gitbackend.subprocess import (
+    checked_execute,
+    git_command_line,
+    git_load_str,
+)
+from dataladmetadatamodel.mapper.gitmapper.metadatamapper import (
+    MetadataGitMapper,
+)
 from dataladmetadatamodel.mapper.reference import Reference
 from dataladmetadatamodel.mappableobject import ensure_mapped
 from dataladmetadatamodel.metadata import (
@@ -48,24 +79,89 @@ from dataladmetadatamodel.metadatapath import MetadataPath
 from dataladmetadatamodel.metadatarootrecord import MetadataRootRecord
 from dataladmetadatamodel.mtreenode import MTreeNode
 from dataladmetadatamodel.uuidset import UUIDSet
-from dataladmetadatamodel.versionlist import TreeVersionList
+from dataladmetadatamodel.versionlist import (
+    TreeVersionList,
+    VersionList,
+)
 
+from . import jsoncodec
 from .pathutils.metadataurlparser import (
     MetadataURLParser,
     TreeMetadataURL,
     UUIDMetadataURL,
 )
 
+from .dumpindex import (
+    DumpIndex,
+    IndexedMetadata,
+    is_literal_path,
+)
 from .metadatautils import get_metadata_objects
 from .metadatatypes import JSONType
-from .pathutils.mtreesearch import MTreeSearch
+from .pathutils.mtreesearch import (
+    MTreeSearch,
+    PatternType,
+)
 
 
 default_mapper_family = "git"
 
+# The number of results that a dump job can produce before it waits for
+# the results to be consumed.
+job_buffer_size = 1000
+
+# The name of stdout in --output-file, and the buffer size of output files
+stdout_name = "-"
+output_buffer_size = 1024 * 1024
+
 lgr = logging.getLogger('datalad.metadata.dump')
 
 
+def get_output_record(result: dict) -> dict:
+    """ Get the record that represents a dump result in the output
+
+    This is the metadata record, or, for results of a diff, an object
+    that contains the state and the metadata record.
+    """
+    if "state" in result:
+        return {"state": result["state"], "metadata": result["metadata"]}
+    return result["metadata"]
+
+
+def write_records(results: Iterable[dict],
+                  output_file: str
+                  ) -> int:
+    """ Write the metadata records of dump results as JSON lines
+
+    The records are written to a buffered file, without processing the
+    results in datalad's result machinery. If `output_file` is "-", the
+    records are written to stdout.
+
+    :return: the number of written records
+    """
+    if output_file == stdout_name:
+        output_stream = sys.stdout
+        close = output_stream.flush
+    else:
+        output_stream = open(
+            output_file,
+            "wt",
+            encoding="utf-8",
+            buffering=output_buffer_size)
+        close = output_stream.close
+
+    record_count = 0
+    dumps = jsoncodec.dumps
+    try:
+        for result in results:
+            output_stream.write(dumps(get_output_record(result)))
+            output_stream.write("\n")
+            record_count += 1
+    finally:
+        close()
+    return record_count
+
+
 def _dataset_report_matcher(node: Any) -> bool:
     return isinstance(node, MetadataRootRecord)
 
@@ -100,10 +196,11 @@ def _create_result_record(mapper: str,
     }
 
 
-def _get_common_properties(root_dataset_identifier: UUID,
+def _get_common_properties(root_dataset_identifier: Union[UUID, str],
                            root_dataset_version: str,
                            prefix_path: MetadataPath,
-                           metadata_root_record: MetadataRootRecord,
+                           dataset_identifier: Union[UUID, str],
+                           dataset_version: str,
                            dataset_path: MetadataPath) -> dict:
 
     if prefix_path != MetadataPath(""):
@@ -119,31 +216,213 @@ def _get_common_properties(root_dataset_identifier: UUID,
 
     return {
         **root_info,
-        "dataset_id": str(metadata_root_record.dataset_identifier),
-        "dataset_version": metadata_root_record.dataset_version
+        "dataset_id": str(dataset_identifier),
+        "dataset_version": dataset_version
     }
 
 
+instance_property_getters = {
+    "extraction_time": lambda name, instance: instance.time_stamp,
+    "agent_name": lambda name, instance: instance.author_name,
+    "agent_email": lambda name, instance: instance.author_email,
+    "extractor_name": lambda name, instance: name,
+    "extractor_version": lambda name, instance: instance.configuration.version,
+    "extraction_parameter": lambda name, instance: instance.configuration.parameter,
+    "extracted_metadata": lambda name, instance: instance.metadata_content
+}
+
+
+@dataclass(frozen=True)
+class RecordFilter:
+    """ Select the extractor runs and the fields that are dumped
+
+    Extractor names and extraction times are checked before any property of
+    an extractor run is read. Instance properties that are not selected by
+    `fields`, e.g. "extracted_metadata", are never copied into a result.
+    """
+    extractor_names: Optional[FrozenSet[str]] = None
+    fields: Optional[Tuple[str, ...]] = None
+    since: Optional[float] = None
+    until: Optional[float] = None
+
+    def accepts_extractor(self, extractor_name: str) -> bool:
+        return (
+            self.extractor_names is None
+            or extractor_name in self.extractor_names)
+
+    def accepts_any_extractor(self, extractor_names: Iterable[str]) -> bool:
+        return any(map(self.accepts_extractor, extractor_names))
+
+    def accepts_instance(self, instance: MetadataInstance) -> bool:
+        return self.accepts_time_stamp(instance.time_stamp)
+
+    def accepts_time_stamp(self, time_stamp: float) -> bool:
+        if self.since is not None and time_stamp < self.since:
+            return False
+        if self.until is not None and time_stamp > self.until:
+            return False
+        return True
+
+    @property
+    def selects_runs(self) -> bool:
+        return (
+            self.extractor_names is not None
+            or self.since is not None
+            or self.until is not None)
+
+    def selects_field(self, field: str) -> bool:
+        return self.fields is None or field in self.fields
+
+    def project(self, metadata_record: dict) -> dict:
+        if self.fields is None:
+            return metadata_record
+        return {
+            field: metadata_record[field]
+            for field in self.fields
+            if field in metadata_record}
+
+
+no_filter = RecordFilter()
+
+
+def _parse_time(time_value: Optional[Union[str, float]]) -> Optional[float]:
+    if time_value is None or isinstance(time_value, (int, float)):
+        return time_value
+    try:
+        return float(time_value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(time_value).timestamp()
+    except ValueError:
+        raise ValueError(
+            f"invalid time: '{time_value}', expected a POSIX timestamp or "
+            f"an ISO 8601 date")
+
+
+def create_record_filter(extractor: Optional[Union[str, List[str]]] = None,
+                         fields: Optional[Union[str, List[str]]] = None,
+                         since: Optional[Union[str, float]] = None,
+                         until: Optional[Union[str, float]] = None
+                         ) -> RecordFilter:
+    """ Create a record filter from meta-dump parameters
+
+    `extractor` is a name or a list of names, `fields` is a comma-separated
+    string or a list of field names, and `since` and `until` are POSIX
+    timestamps or ISO 8601 dates.
+    """
+    if isinstance(extractor, str):
+        extractor = [extractor]
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",")]
+    return RecordFilter(
+        frozenset(extractor) if extractor else None,
+        tuple(field for field in fields if field) if fields else None,
+        _parse_time(since),
+        _parse_time(until))
+
+
+@dataclass(frozen=True)
+class VersionSelection:
+    """ Select the versions that are dumped from a version list
+
+    If `latest` is True, only the newest version of every prefix path is
+    selected. If `versions` is not None, only the contained versions are
+    selected.
+    """
+    latest: bool = False
+    versions: Optional[FrozenSet[str]] = None
+
+
+all_versions = VersionSelection()
+
+
+def resolve_version_range(metadata_store: Union[Path, str],
+                          version_range: str
+                          ) -> FrozenSet[str]:
+    """ Get the commits of a git revision range, e.g. "v1.0..main" """
+    if not isinstance(metadata_store, Path):
+        raise ValueError(
+            f"cannot resolve version range '{version_range}' in remote "
+            f"metadata store {metadata_store}")
+    cmd_line = git_command_line(
+        str(metadata_store),
+        "rev-list",
+        [version_range, "--"])
+    try:
+        return frozenset(checked_execute(cmd_line)[0])
+    except RuntimeError as runtime_error:
+        raise ValueError(
+            f"invalid version range '{version_range}': "
+            f"{runtime_error.stderr.strip()}")
+
+
+def _get_time_stamp(time_stamp: str) -> float:
+    try:
+        return float(time_stamp)
+    except ValueError:
+        return float("-inf")
+
+
+def select_versions(version_list: VersionList,
+                    version: Optional[str],
+                    version_selection: VersionSelection = all_versions
+                    ) -> List[Tuple[str, MetadataPath]]:
+    """ Get the version and prefix path of all selected version records
+
+    Only the entries of the version list are read, the dataset trees or
+    metadata root records of the versions are not mapped.
+    """
+    selected = [
+        (version_, prefix_path, time_stamp)
+        for version_, (time_stamp, prefix_path, _)
+        in version_list.versioned_elements
+        if (version is None or version_ == version)
+        and (version_selection.versions is None
+             or version_ in version_selection.versions)]
+
+    if version_selection.latest:
+        latest = dict()
+        for entry in selected:
+            stored_entry = latest.get(entry[1])
+            if stored_entry is None \
+                    or _get_time_stamp(entry[2]) > _get_time_stamp(stored_entry[2]):
+                latest[entry[1]] = entry
+        selected = [entry for entry in selected if latest[entry[1]] is entry]
+
+    return [(version_, prefix_path) for version_, prefix_path, _ in selected]
+
+
 def _get_instance_properties(extractor_name: str,
-                             instance: MetadataInstance) -> dict:
+                             instance: MetadataInstance,
+                             record_filter: RecordFilter = no_filter
+                             ) -> dict:
     return {
-        "extraction_time": instance.time_stamp,
-        "agent_name": instance.author_name,
-        "agent_email": instance.author_email,
-        "extractor_name": extractor_name,
-        "extractor_version": instance.configuration.version,
-        "extraction_parameter": instance.configuration.parameter,
-        "extracted_metadata": instance.metadata_content
+        field: get_property(extractor_name, instance)
+        for field, get_property in instance_property_getters.items()
+        if record_filter.selects_field(field)
     }
 
 
+def _get_extractor_runs(metadata: Metadata,
+                        record_filter: RecordFilter
+                        ) -> Generator[Tuple[str, MetadataInstance], None, None]:
+    for extractor_name, extractor_runs in metadata.extractor_runs:
+        if not record_filter.accepts_extractor(extractor_name):
+            continue
+        for instance in extractor_runs:
+            if record_filter.accepts_instance(instance):
+                yield extractor_name, instance
+
+
 def show_dataset_metadata(mapper: str,
                           metadata_store: Path,
                           root_dataset_identifier: UUID,
                           root_dataset_version: str,
                           prefix_path: MetadataPath,
                           dataset_path: MetadataPath,
-                          metadata_root_record: MetadataRootRecord
+                          metadata_root_record: MetadataRootRecord,
+                          record_filter: RecordFilter = no_filter
                           ) -> Generator[dict, None, None]:
 
     if metadata_root_record is None:
@@ -162,28 +441,31 @@ def show_dataset_metadata(mapper: str,
             root_dataset_identifier,
             root_dataset_version,
             prefix_path,
-            metadata_root_record,
+            metadata_root_record.dataset_identifier,
+            metadata_root_record.dataset_version,
             dataset_path)
 
         dataset_level_metadata = cast(Metadata, dataset_level_metadata)
 
-        for extractor_name, extractor_runs in dataset_level_metadata.extractor_runs:
-            for instance in extractor_runs:
+        for extractor_name, instance in _get_extractor_runs(
+                dataset_level_metadata,
+                record_filter):
 
-                instance_properties = _get_instance_properties(
-                    extractor_name,
-                    instance)
+            instance_properties = _get_instance_properties(
+                extractor_name,
+                instance,
+                record_filter)
 
-                yield _create_result_record(
-                    mapper=mapper,
-                    metadata_store=metadata_store,
-                    metadata_record={
-                        "type": "dataset",
-                        **common_properties,
-                        **instance_properties
-                    },
-                    element_path=dataset_path,
-                    report_type="dataset")
+            yield _create_result_record(
+                mapper=mapper,
+                metadata_store=metadata_store,
+                metadata_record=record_filter.project({
+                    "type": "dataset",
+                    **common_properties,
+                    **instance_properties
+                }),
+                element_path=dataset_path,
+                report_type="dataset")
 
 
 def show_file_tree_metadata(mapper: str,
@@ -193,8 +475,10 @@ def show_file_tree_metadata(mapper: str,
                             prefix_path: MetadataPath,
                             dataset_path: MetadataPath,
                             metadata_root_record: MetadataRootRecord,
-                            search_pattern: MetadataPath,
-                            recursive: bool
+                            search_pattern: Union[MetadataPath, str],
+                            recursive: bool,
+                            pattern_type: PatternType = PatternType.glob,
+                            record_filter: RecordFilter = no_filter
                             ) -> Generator[dict, None, None]:
 
     if metadata_root_record is None:
@@ -216,7 +500,8 @@ def show_file_tree_metadata(mapper: str,
                 tree_search = MTreeSearch(file_tree.mtree)
                 result_count = 0
                 for path, metadata, _ in tree_search.search_pattern(pattern=search_pattern,
-                                                                    recursive=recursive):
+                                                                    recursive=recursive,
+                                                                    pattern_type=pattern_type):
                     result_count += 1
 
                     # Ignore empty datasets and ignore paths that do not
@@ -230,28 +515,31 @@ def show_file_tree_metadata(mapper: str,
                         root_dataset_identifier,
                         root_dataset_version,
                         prefix_path,
-                        metadata_root_record,
+                        metadata_root_record.dataset_identifier,
+                        metadata_root_record.dataset_version,
                         dataset_path)
 
                     with ensure_mapped(metadata):
-                        for extractor_name, extractor_runs in metadata.extractor_runs:
-                            for instance in extractor_runs:
-
-                                instance_properties = _get_instance_properties(
-                                    extractor_name,
-                                    instance)
-
-                                yield _create_result_record(
-                                    mapper=mapper,
-                                    metadata_store=metadata_store,
-                                    metadata_record={
-                                        "type": "file",
-                                        "path": str(path),
-                                        **common_properties,
-                                        **instance_properties
-                                    },
-                                    element_path=dataset_path / path,
-                                    report_type="dataset")
+                        for extractor_name, instance in _get_extractor_runs(
+                                metadata,
+                                record_filter):
+
+                            instance_properties = _get_instance_properties(
+                                extractor_name,
+                                instance,
+                                record_filter)
+
+                            yield _create_result_record(
+                                mapper=mapper,
+                                metadata_store=metadata_store,
+                                metadata_record=record_filter.project({
+                                    "type": "file",
+                                    "path": str(path),
+                                    **common_properties,
+                                    **instance_properties
+                                }),
+                                element_path=dataset_path / path,
+                                report_type="dataset")
 
                 if result_count == 0:
                     lgr.warning(
@@ -261,101 +549,609 @@ def show_file_tree_metadata(mapper: str,
                         f"{mapper}:{metadata_store})")
 
 
+class StatisticsMode(enum.Enum):
+    count = "count"
+    stats = "stats"
+
+
+class GitObjectReader:
+    """ Read objects of a local metadata store with a single git process
+
+    Objects of remote metadata stores are read with one git process per
+    object.
+    """
+    def __init__(self, realm: str):
+        self.realm = realm
+        self.process = None
+
+    def __enter__(self) -> "GitObjectReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.stdout.close()
+            self.process.wait()
+            self.process = None
+
+    def read(self, location: str) -> bytes:
+        if Reference.is_remote(self.realm):
+            return git_load_str(self.realm, location).encode()
+
+        if self.process is None:
+            self.process = subprocess.Popen(
+                git_command_line(self.realm, "cat-file", ["--batch"]),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE)
+
+        self.process.stdin.write(location.encode() + b"\n")
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            raise RuntimeError(
+                f"could not read object {location} from {self.realm}: "
+                f"{b' '.join(header).decode()}")
+        content = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1)
+        return content
+
+
+def _get_blob_location(content: str) -> str:
+    encoded_content = content.encode()
+    return hashlib.sha1(
+        b"blob %d\0" % len(encoded_content) + encoded_content).hexdigest()
+
+
+@lru_cache()
+def _get_empty_metadata_location() -> str:
+    return _get_blob_location(
+        Reference(
+            "Metadata",
+            _get_blob_location(Metadata().to_json())).to_json_str())
+
+
+class StoredMetadataReader:
+    """ Read stored metadata-nodes without mapping them
+
+    This relies on the storage format of MetadataGitMapper, i.e. a
+    metadata-node is stored as a blob with a reference to the blob that
+    contains the serialized metadata object. Statistics access the stored
+    metadata-nodes only through this class, which rejects other mappers.
+    """
+    def __init__(self, mapper_family: str, realm: str):
+        mapper = get_mapper("Metadata", mapper_family)
+        if not isinstance(mapper, MetadataGitMapper):
+            raise ValueError(
+                f"cannot read stored metadata of mapper family "
+                f"'{mapper_family}'")
+        self.object_reader = GitObjectReader(realm)
+
+    def __enter__(self) -> "StoredMetadataReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.object_reader.close()
+
+    @staticmethod
+    def is_empty(metadata: Metadata) -> bool:
+        """ Check whether a metadata-node is empty without reading it
+
+        Adding file-level metadata to a new dataset version creates an empty
+        dataset-level metadata-node. Because stored objects are content
+        addressed, all empty metadata-nodes are stored at the same location.
+        """
+        return (
+            metadata.reference is not None
+            and metadata.reference.location == _get_empty_metadata_location())
+
+    def read(self, metadata: Metadata) -> bytes:
+        """ Read the serialized metadata object of a metadata-node """
+        location = metadata.reference.location
+        reference = Reference.from_json_str(
+            self.object_reader.read(location).decode())
+        if reference.class_name != "Metadata":
+            raise RuntimeError(
+                f"unexpected object at {location} in "
+                f"{self.object_reader.realm}: {reference}")
+        return self.object_reader.read(reference.location)
+
+
+def _count_metadata_node(statistics: dict,
+                         node_type: str,
+                         metadata: Metadata,
+                         statistics_mode: StatisticsMode,
+                         record_filter: RecordFilter,
+                         metadata_reader: StoredMetadataReader):
+    """ Add a metadata-node to statistics
+
+    In "count"-mode the node is not read. In "stats"-mode the stored
+    metadata object is read and decoded, but no MetadataInstance objects
+    or result records are created from it.
+    """
+    if statistics_mode == StatisticsMode.count:
+        if not metadata_reader.is_empty(metadata):
+            statistics[node_type] += 1
+        return
+
+    metadata_object = metadata_reader.read(metadata)
+
+    extractor_runs = {
+        extractor_name: sum(
+            1
+            for instance in instance_set["instance_set"].values()
+            if record_filter.accepts_time_stamp(instance["time_stamp"]))
+        for extractor_name, instance_set
+        in jsoncodec.loads(metadata_object)["instance_sets"].items()
+        if record_filter.accepts_extractor(extractor_name)
+    }
+    if not any(extractor_runs.values()):
+        return
+
+    statistics[node_type] += 1
+    statistics["records"] += sum(extractor_runs.values())
+    statistics["metadata_bytes"] += len(metadata_object)
+    for extractor_name, run_count in extractor_runs.items():
+        if run_count:
+            statistics["extractor_runs"][extractor_name] = \
+                statistics["extractor_runs"].get(extractor_name, 0) + run_count
+
+
+def show_metadata_statistics(mapper: str,
+                             metadata_store: Path,
+                             root_dataset_identifier: UUID,
+                             root_dataset_version: str,
+                             prefix_path: MetadataPath,
+                             dataset_path: MetadataPath,
+                             metadata_root_record: MetadataRootRecord,
+                             search_pattern: Union[MetadataPath, str],
+                             recursive: bool,
+                             pattern_type: PatternType = PatternType.glob,
+                             record_filter: RecordFilter = no_filter,
+                             statistics_mode: StatisticsMode = StatisticsMode.count
+                             ) -> Generator[dict, None, None]:
+    """ Report statistics of the metadata that a dump would report
+
+    The file tree is traversed with the same pattern as in a dump, but
+    metadata-nodes are not mapped. A single result is reported for the
+    dataset, its "metadata" contains the number of datasets with
+    dataset-level metadata, i.e. 0 or 1, and the number of files with
+    metadata. In "stats"-mode, it also contains the number of records that
+    a dump would report, i.e. the number of extractor runs, the number of
+    extractor runs per extractor, and the total size of the stored
+    metadata objects.
+    """
+    if metadata_root_record is None:
+        return
+
+    with ensure_mapped(metadata_root_record):
+
+        statistics = {
+            "datasets_with_metadata": 0,
+            "files_with_metadata": 0}
+        if statistics_mode == StatisticsMode.stats:
+            statistics.update({
+                "records": 0,
+                "metadata_bytes": 0,
+                "extractor_runs": dict()})
+
+        with StoredMetadataReader(mapper, str(metadata_store)) \
+                as metadata_reader:
+            count_metadata_node = partial(
+                _count_metadata_node,
+                statistics,
+                statistics_mode=statistics_mode,
+                record_filter=record_filter,
+                metadata_reader=metadata_reader)
+
+            dataset_level_metadata = metadata_root_record.dataset_level_metadata
+            if dataset_level_metadata is not None:
+                count_metadata_node(
+                    "datasets_with_metadata",
+                    dataset_level_metadata)
+
+            file_tree = metadata_root_record.file_tree
+            with ensure_mapped(file_tree):
+                if file_tree is not None:
+                    tree_search = MTreeSearch(file_tree.mtree)
+                    for _, metadata, _ in tree_search.search_pattern(
+                            pattern=search_pattern,
+                            recursive=recursive,
+                            pattern_type=pattern_type,
+                            map_leaves=False):
+                        if isinstance(metadata, Metadata):
+                            count_metadata_node(
+                                "files_with_metadata",
+                                metadata)
+
+        result = _create_result_record(
+            mapper=mapper,
+            metadata_store=metadata_store,
+            metadata_record={
+                **_get_common_properties(
+                    root_dataset_identifier,
+                    root_dataset_version,
+                    prefix_path,
+                    metadata_root_record.dataset_identifier,
+                    metadata_root_record.dataset_version,
+                    dataset_path),
+                **statistics
+            },
+            element_path=dataset_path,
+            report_type="dataset")
+        result["statistics"] = "dataset"
+        yield result
+
+
+def add_statistics_total(mapper: str,
+                         metadata_store: Path,
+                         results: Iterable[dict]
+                         ) -> Generator[dict, None, None]:
+    """ Yield statistics results and a result with their sums """
+    total = {"datasets": 0}
+    for result in results:
+        yield result
+        total["datasets"] += 1
+        for name, value in result["metadata"].items():
+            if name == "extractor_runs":
+                extractor_runs = total.setdefault(name, dict())
+                for extractor_name, run_count in value.items():
+                    extractor_runs[extractor_name] = \
+                        extractor_runs.get(extractor_name, 0) + run_count
+            elif name in (
+                    "datasets_with_metadata",
+                    "files_with_metadata",
+                    "records",
+                    "metadata_bytes"):
+                total[name] = total.get(name, 0) + value
+
+    result = _create_result_record(
+        mapper=mapper,
+        metadata_store=metadata_store,
+        metadata_record=total,
+        element_path=MetadataPath(""),
+        report_type="dataset")
+    result["statistics"] = "total"
+    yield result
+
+
 def dump_from_dataset_tree(mapper: str,
                            metadata_store: Path,
                            tree_version_list: TreeVersionList,
                            metadata_url: TreeMetadataURL,
-                           recursive: bool) -> Generator[dict, None, None]:
+                           recursive: bool,
+                           record_filter: RecordFilter = no_filter,
+                           version_selection: VersionSelection = all_versions,
+                           jobs: Optional[int] = None,
+                           ordered: bool = True,
+                           statistics_mode: Optional[StatisticsMode] = None
+                           ) -> Generator[dict, None, None]:
     """ Dump dataset tree elements that are referenced in path """
 
     # Normalize path representation
     if not metadata_url or metadata_url.dataset_path is None:
         metadata_url = TreeMetadataURL(MetadataPath(""), MetadataPath(""))
 
-    # Get specified version, if none is specified, take all versions.
-    requested_versions = ([metadata_url.version]
-                          if metadata_url.version is not None
-                          else list(tree_version_list.versions()))
+    # Get the specified version, if none is specified, take all selected
+    # versions.
+    requested_versions = select_versions(
+        tree_version_list,
+        metadata_url.version,
+        version_selection)
 
-    for version in requested_versions:
+    if not requested_versions and metadata_url.version is not None:
+        lgr.error(
+            f"could not locate metadata for version {metadata_url.version} "
+            f"in metadata_store {mapper}:{metadata_store}")
+        return
 
-        try:
-            # Fetch dataset tree for the specified version
-            vpd_iterable = tree_version_list.get_dataset_trees(version)
-        except KeyError:
-            lgr.error(
-                f"could not locate metadata for version {version} in "
-                f"metadata_store {mapper}:{metadata_store}")
+    yield from run_dump_jobs(
+        [
+            partial(
+                dump_dataset_tree,
+                mapper,
+                metadata_store,
+                tree_version_list,
+                version,
+                prefix_path,
+                metadata_url,
+                recursive,
+                record_filter,
+                statistics_mode)
+            for version, prefix_path in requested_versions
+        ],
+        jobs,
+        ordered)
+
+
+def dump_dataset_tree(mapper: str,
+                      metadata_store: Path,
+                      tree_version_list: TreeVersionList,
+                      version: str,
+                      prefix_path: MetadataPath,
+                      metadata_url: TreeMetadataURL,
+                      recursive: bool,
+                      record_filter: RecordFilter = no_filter,
+                      statistics_mode: Optional[StatisticsMode] = None
+                      ) -> Generator[dict, None, None]:
+    """ Dump the elements of a single dataset tree that match metadata_url
+
+    The dataset tree is purged after it was dumped.
+    """
+    _, _, dataset_tree = tree_version_list.get_dataset_tree(
+        version,
+        prefix_path)
+
+    try:
+        yield from _dump_dataset_tree(
+            mapper,
+            metadata_store,
+            version,
+            prefix_path,
+            dataset_tree,
+            metadata_url,
+            recursive,
+            record_filter,
+            statistics_mode)
+    finally:
+        dataset_tree.purge()
+
+
+def _get_root_dataset_properties(metadata_store: Path,
+                                 version: str,
+                                 dataset_tree: DatasetTree
+                                 ) -> Tuple[Union[UUID, str], str]:
+
+    root_mrr = dataset_tree.get_metadata_root_record(MetadataPath(""))
+
+    if root_mrr is None:
+        lgr.debug(
+            f"no root dataset record found for version "
+            f"{version} in metadata store "
+            f"{metadata_store}, cannot determine root dataset id")
+        return "<unknown>", version
+
+    with ensure_mapped(root_mrr):
+        return root_mrr.dataset_identifier, root_mrr.dataset_version
+
+
+def _dump_dataset_tree(mapper: str,
+                       metadata_store: Path,
+                       version: str,
+                       prefix_path: MetadataPath,
+                       dataset_tree: DatasetTree,
+                       metadata_url: TreeMetadataURL,
+                       recursive: bool,
+                       record_filter: RecordFilter,
+                       statistics_mode: Optional[StatisticsMode] = None
+                       ) -> Generator[dict, None, None]:
+
+    root_dataset_identifier, root_dataset_version = \
+        _get_root_dataset_properties(metadata_store, version, dataset_tree)
+
+    # Create a tree search object to search for the specified datasets
+    tree_search = MTreeSearch(dataset_tree.mtree)
+    search_results = tree_search.search_pattern(
+        pattern=metadata_url.dataset_path,
+        recursive=recursive,
+        item_indicator=datalad_root_record_name)
+
+    result_count = 0
+    for path, node, _ in search_results:
+        result_count += 1
+
+        mrr = cast(
+            MetadataRootRecord,
+            node.get_child(datalad_root_record_name))
+
+        if mrr is None:
+            # The metadata root record might be None, if no dataset
+            # was registered in the dataset tree at this level.
             continue
 
-        for _, prefix_path, dataset_tree in vpd_iterable:
-            root_mrr = dataset_tree.get_metadata_root_record(MetadataPath(""))
+        if statistics_mode is not None:
+            yield from show_metadata_statistics(
+                mapper,
+                metadata_store,
+                root_dataset_identifier,
+                root_dataset_version,
+                prefix_path,
+                path,
+                mrr,
+                metadata_url.local_path,
+                recursive,
+                metadata_url.pattern_type,
+                record_filter,
+                statistics_mode)
+            continue
 
-            if root_mrr is None:
-                lgr.debug(
-                    f"no root dataset record found for version "
-                    f"{version} in metadata store "
-                    f"{metadata_store}, cannot determine root dataset id")
-                root_dataset_version = version
-                root_dataset_identifier = "<unknown>"
-            else:
-                with ensure_mapped(root_mrr):
-                    root_dataset_version = root_mrr.dataset_version
-                    root_dataset_identifier = root_mrr.dataset_identifier
-
-            # Create a tree search object to search for the specified datasets
-            tree_search = MTreeSearch(dataset_tree.mtree)
-            search_results = tree_search.search_pattern(
-                pattern=metadata_url.dataset_path,
-                recursive=recursive,
-                item_indicator=datalad_root_record_name)
-
-            result_count = 0
-            for path, node, _ in search_results:
-                result_count += 1
-
-                mrr = cast(
-                    MetadataRootRecord,
-                    node.get_child(datalad_root_record_name))
-
-                if mrr is None:
-                    # The metadata root record might be None, if no dataset
-                    # was registered in the dataset tree at this level.
-                    continue
-
-                yield from show_dataset_metadata(
-                    mapper,
-                    metadata_store,
-                    root_dataset_identifier,
-                    root_dataset_version,
-                    prefix_path,
-                    path,
-                    mrr)
+        yield from show_dataset_metadata(
+            mapper,
+            metadata_store,
+            root_dataset_identifier,
+            root_dataset_version,
+            prefix_path,
+            path,
+            mrr,
+            record_filter)
+
+        yield from show_file_tree_metadata(
+            mapper,
+            metadata_store,
+            root_dataset_identifier,
+            root_dataset_version,
+            prefix_path,
+            path,
+            mrr,
+            metadata_url.local_path,
+            recursive,
+            metadata_url.pattern_type,
+            record_filter)
+
+    if result_count == 0:
+        lgr.error(
+            f"search pattern '{str(metadata_url.dataset_path)}' does not "
+            f"match any dataset in dataset-tree of dataset "
+            f"{root_dataset_identifier}@{root_dataset_version} (stored on "
+            f"{mapper}:{metadata_store})")
 
-                yield from show_file_tree_metadata(
-                    mapper,
-                    metadata_store,
-                    root_dataset_identifier,
-                    root_dataset_version,
-                    prefix_path,
-                    path,
-                    mrr,
-                    metadata_url.local_path,
-                    recursive)
 
-            if result_count == 0:
+def show_indexed_metadata(mapper: str,
+                          metadata_store: Path,
+                          realm: str,
+                          common_properties: dict,
+                          dataset_path: MetadataPath,
+                          indexed_metadata: IndexedMetadata,
+                          record_filter: RecordFilter = no_filter
+                          ) -> Generator[dict, None, None]:
+
+    # The index knows the extractors of a metadata-node, do not map nodes
+    # that contain no selected extractor.
+    if not record_filter.accepts_any_extractor(
+            indexed_metadata.extractor_names):
+        return
+
+    metadata = Metadata(
+        realm=realm,
+        reference=Reference("Metadata", indexed_metadata.location))
+
+    if indexed_metadata.path is None:
+        type_properties = {"type": "dataset"}
+        element_path = dataset_path
+    else:
+        type_properties = {"type": "file", "path": str(indexed_metadata.path)}
+        element_path = dataset_path / indexed_metadata.path
+
+    with ensure_mapped(metadata):
+        for extractor_name, instance in _get_extractor_runs(
+                metadata,
+                record_filter):
+            if extractor_name not in indexed_metadata.extractor_names:
+                continue
+
+            instance_properties = _get_instance_properties(
+                extractor_name,
+                instance,
+                record_filter)
+
+            yield _create_result_record(
+                mapper=mapper,
+                metadata_store=metadata_store,
+                metadata_record=record_filter.project({
+                    **type_properties,
+                    **common_properties,
+                    **instance_properties
+                }),
+                element_path=element_path,
+                report_type="dataset")
+
+
+def dump_from_index(mapper: str,
+                    metadata_store: Path,
+                    tree_version_list: TreeVersionList,
+                    metadata_url: TreeMetadataURL,
+                    recursive: bool,
+                    record_filter: RecordFilter = no_filter,
+                    version_selection: VersionSelection = all_versions
+                    ) -> Generator[dict, None, None]:
+    """ Dump dataset tree elements that are selected by literal paths
+
+    The elements are looked up in the dump index of the metadata store. The
+    index is updated, if the metadata store was modified since the index was
+    last updated.
+    """
+    with DumpIndex.open(metadata_store) as dump_index:
+        if dump_index.update(tree_version_list):
+            lgr.debug(f"updated dump index {dump_index.index_path}")
+
+        trees = dump_index.get_trees(metadata_url.version)
+        if version_selection != all_versions:
+            selected_versions = set(select_versions(
+                tree_version_list,
+                metadata_url.version,
+                version_selection))
+            trees = [
+                tree
+                for tree in trees
+                if (tree.version, tree.prefix_path) in selected_versions]
+
+        if not trees:
+            lgr.error(
+                f"could not locate metadata for version {metadata_url.version} "
+                f"in metadata_store {mapper}:{metadata_store}")
+            return
+
+        for tree in trees:
+            datasets = dump_index.get_datasets(
+                tree,
+                metadata_url.dataset_path,
+                recursive)
+
+            if not datasets:
                 lgr.error(
-                    f"search pattern '{str(metadata_url.dataset_path)}' does not "
-                    f"match any dataset in dataset-tree of dataset "
-                    f"{root_dataset_identifier}@{root_dataset_version} (stored on "
-                    f"{mapper}:{metadata_store})")
+                    f"search pattern '{str(metadata_url.dataset_path)}' does "
+                    f"not match any dataset in dataset-tree of dataset "
+                    f"{tree.root_dataset_id}@{tree.root_dataset_version} "
+                    f"(stored on {mapper}:{metadata_store})")
+                continue
+
+            for dataset in datasets:
+                common_properties = _get_common_properties(
+                    tree.root_dataset_id,
+                    tree.root_dataset_version,
+                    tree.prefix_path,
+                    dataset.dataset_id,
+                    dataset.dataset_version,
+                    dataset.dataset_path)
+
+                for indexed_metadata in dump_index.get_metadata(
+                        tree,
+                        dataset,
+                        metadata_url.local_path,
+                        recursive):
+
+                    yield from show_indexed_metadata(
+                        mapper,
+                        metadata_store,
+                        tree_version_list.realm,
+                        common_properties,
+                        dataset.dataset_path,
+                        indexed_metadata,
+                        record_filter)
+
+
+def can_use_index(metadata_store: Union[Path, str],
+                  metadata_url: Union[TreeMetadataURL, UUIDMetadataURL]
+                  ) -> bool:
+    """ Check whether a query can be answered from the dump index
+
+    The dump index can answer queries on local metadata stores that
+    contain a tree-URL with literal dataset path and local path.
+    """
+    return (
+        isinstance(metadata_store, Path)
+        and isinstance(metadata_url, TreeMetadataURL)
+        and metadata_url.pattern_type == PatternType.glob
+        and is_literal_path(metadata_url.dataset_path)
+        and is_literal_path(metadata_url.local_path))
 
 
 def dump_from_uuid_set(mapper: str,
                        metadata_store: Path,
                        uuid_set: UUIDSet,
                        path: UUIDMetadataURL,
-                       recursive: bool) -> Generator[dict, None, None]:
+                       recursive: bool,
+                       record_filter: RecordFilter = no_filter,
+                       version_selection: VersionSelection = all_versions,
+                       jobs: Optional[int] = None,
+                       ordered: bool = True,
+                       statistics_mode: Optional[StatisticsMode] = None
+                       ) -> Generator[dict, None, None]:
 
     """ Dump UUID-identified dataset elements that are referenced in path """
 
@@ -367,26 +1163,78 @@ def dump_from_uuid_set(mapper: str,
             f"metadata_store {mapper}:{metadata_store}")
         return
 
-    # Get specified version, if none is specified, take all versions.
-    requested_dataset_version = ([path.version]
-                                 if path.version is not None
-                                 else list(version_list.versions()))
+    # Get the specified version, if none is specified, take all selected
+    # versions.
+    requested_versions = select_versions(
+        version_list,
+        path.version,
+        version_selection)
+
+    yield from run_dump_jobs(
+        [
+            partial(
+                dump_dataset_version,
+                mapper,
+                metadata_store,
+                version_list,
+                dataset_version,
+                prefix_path,
+                path,
+                recursive,
+                record_filter,
+                statistics_mode)
+            for dataset_version, prefix_path in requested_versions
+        ],
+        jobs,
+        ordered)
+
+
+def dump_dataset_version(mapper: str,
+                         metadata_store: Path,
+                         version_list: VersionList,
+                         dataset_version: str,
+                         prefix_path: MetadataPath,
+                         path: UUIDMetadataURL,
+                         recursive: bool,
+                         record_filter: RecordFilter = no_filter,
+                         statistics_mode: Optional[StatisticsMode] = None
+                         ) -> Generator[dict, None, None]:
+    """ Dump the elements of a single version of a UUID-identified dataset
+
+    The metadata root record of the version is purged after it was dumped.
+    """
+    try:
+        _, dataset_path, metadata_root_record = \
+            version_list.get_versioned_element(dataset_version, prefix_path)
+    except KeyError:
+        lgr.error(
+            f"could not locate metadata for version {dataset_version} for "
+            f"dataset with UUID {path.uuid} in metadata_store "
+            f"{mapper}:{metadata_store}")
+        return
 
-    for dataset_version, prefix_path in version_list.versions_and_prefix_paths():
-        if dataset_version not in requested_dataset_version:
-            continue
-        try:
-            _, dataset_path, metadata_root_record = \
-                version_list.get_versioned_element(dataset_version, prefix_path)
-        except KeyError:
-            lgr.error(
-                f"could not locate metadata for version {dataset_version} for "
-                f"dataset with UUID {path.uuid} in metadata_store "
-                f"{mapper}:{metadata_store}")
-            continue
+    metadata_root_record = cast(MetadataRootRecord, metadata_root_record)
 
-        metadata_root_record = cast(MetadataRootRecord, metadata_root_record)
+    if statistics_mode is not None:
+        try:
+            yield from show_metadata_statistics(
+                mapper,
+                metadata_store,
+                path.uuid,
+                dataset_version,
+                prefix_path,
+                dataset_path,
+                metadata_root_record,
+                path.local_path,
+                recursive,
+                path.pattern_type,
+                record_filter,
+                statistics_mode)
+        finally:
+            metadata_root_record.purge()
+        return
 
+    try:
         # Show dataset-level metadata
         yield from show_dataset_metadata(
             mapper,
@@ -395,7 +1243,8 @@ def dump_from_uuid_set(mapper: str,
             dataset_version,
             prefix_path,
             dataset_path,
-            metadata_root_record)
+            metadata_root_record,
+            record_filter)
 
         # Show file-level metadata
         yield from show_file_tree_metadata(
@@ -407,9 +1256,384 @@ def dump_from_uuid_set(mapper: str,
             dataset_path,
             metadata_root_record,
             path.local_path,
-            recursive)
+            recursive,
+            path.pattern_type,
+            record_filter)
+    finally:
+        metadata_root_record.purge()
+
+
+class _JobFailure:
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+_job_done = object()
+
+
+def run_dump_jobs(jobs: List[Callable[[], Iterable[dict]]],
+                  worker_count: Optional[int] = None,
+                  ordered: bool = True,
+                  buffer_size: int = job_buffer_size
+                  ) -> Generator[dict, None, None]:
+    """ Run dump jobs and yield their results
+
+    If `worker_count` is larger than one, the jobs are executed in a
+    thread pool. Dumping is dominated by reading objects from git
+    subprocesses, which does not hold the GIL. Every job has to operate
+    on its own mappable objects, e.g. on a single dataset tree of a
+    mapped tree version list.
+
+    If `ordered` is True, the results of a job are yielded after the
+    results of all previous jobs, i.e. in the same order as in sequential
+    execution. Otherwise, results are yielded as soon as they are
+    available. In both modes, workers block if `buffer_size` results of
+    their job, or, if unordered, of all jobs, are waiting to be consumed.
+    """
+    if not worker_count or worker_count <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield from job()
+        return
+
+    stopped = threading.Event()
+
+    def put(output_queue: queue.Queue, element: Any) -> bool:
+        while not stopped.is_set():
+            try:
+                output_queue.put(element, timeout=.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run_job(job: Callable[[], Iterable[dict]], output_queue: queue.Queue):
+        try:
+            for result in job():
+                if not put(output_queue, result):
+                    return
+        except BaseException as exception:
+            put(output_queue, _JobFailure(exception))
+        put(output_queue, _job_done)
+
+    def get_results(output_queue: queue.Queue, job_count: int):
+        while job_count > 0:
+            element = output_queue.get()
+            if element is _job_done:
+                job_count -= 1
+            elif isinstance(element, _JobFailure):
+                raise element.exception
+            else:
+                yield element
+
+    if ordered:
+        output_queues = [queue.Queue(buffer_size) for _ in jobs]
+    else:
+        output_queues = [queue.Queue(buffer_size)] * len(jobs)
+
+    executor = concurrent.futures.ThreadPoolExecutor(worker_count)
+    futures = [
+        executor.submit(run_job, job, output_queue)
+        for job, output_queue in zip(jobs, output_queues)]
+    try:
+        if ordered:
+            for output_queue in output_queues:
+                yield from get_results(output_queue, 1)
+        else:
+            yield from get_results(output_queues[0], len(jobs))
+    finally:
+        # Stop running jobs and do not start pending jobs, if the consumer
+        # stopped early, or if a job failed.
+        stopped.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def resolve_version(metadata_store: Union[Path, str],
+                    version_list: VersionList,
+                    version: str
+                    ) -> str:
+    """ Resolve a version name, e.g. "HEAD~1", to a version in version_list
+
+    Raises ValueError if the version cannot be resolved, or if the resolved
+    commit has no entry in the version list.
+    """
+    versions = set(version_list.versions())
+    if version in versions:
+        return version
+    if isinstance(metadata_store, Path):
+        cmd_line = git_command_line(
+            str(metadata_store),
+            "rev-parse",
+            ["--verify", "--quiet", version + "^{commit}"])
+        try:
+            resolved_version = checked_execute(cmd_line)[0][0]
+        except RuntimeError:
+            pass
+        else:
+            if resolved_version in versions:
+                return resolved_version
+            raise ValueError(
+                f"no metadata for version '{version}' "
+                f"({resolved_version}) in metadata store {metadata_store}")
+    raise ValueError(f"unknown version: '{version}'")
+
+
+def _is_same_object(object_a: Optional[Any], object_b: Optional[Any]) -> bool:
+    # Stored objects are content-addressed, i.e. two objects with the same
+    # location have identical content, including all sub-objects.
+    return (
+        object_a is not None
+        and object_b is not None
+        and object_a.reference is not None
+        and object_b.reference is not None
+        and not object_a.reference.is_none_reference()
+        and object_a.reference.location == object_b.reference.location)
+
+
+def diff_mtrees(node_a: Optional[MTreeNode],
+                node_b: Optional[MTreeNode],
+                path: MetadataPath = MetadataPath("")
+                ) -> Generator[Tuple[MetadataPath, Any, Any], None, None]:
+    """ Yield the leaves that differ between two trees
+
+    Yields a 3-tuple of the path of the leaf, the leaf in node_a, and the
+    leaf in node_b. A leaf that exists only in one tree is None in the
+    other tree. Subtrees and leaves that are stored in the same location
+    are identical and are skipped without mapping them. Yielded leaves are
+    not mapped.
+    """
+    if _is_same_object(node_a, node_b):
+        return
+
+    with ensure_mapped(node_a), ensure_mapped(node_b):
+        children_a = node_a.child_nodes if node_a is not None else dict()
+        children_b = node_b.child_nodes if node_b is not None else dict()
+        for name in sorted(set(children_a) | set(children_b)):
+            child_a = children_a.get(name)
+            child_b = children_b.get(name)
+            if _is_same_object(child_a, child_b):
+                continue
+
+            # A directory might have replaced a leaf or vice versa
+            tree_a, leaf_a = (
+                (child_a, None)
+                if isinstance(child_a, MTreeNode)
+                else (None, child_a))
+            tree_b, leaf_b = (
+                (child_b, None)
+                if isinstance(child_b, MTreeNode)
+                else (None, child_b))
+
+            if leaf_a is not None or leaf_b is not None:
+                yield path / name, leaf_a, leaf_b
+            if tree_a is not None or tree_b is not None:
+                yield from diff_mtrees(tree_a, tree_b, path / name)
+
+
+def _get_instances(metadata: Optional[Metadata]) -> dict:
+    if metadata is None:
+        return dict()
+    return {
+        (extractor_name, instance.configuration): instance
+        for extractor_name, instance_set in metadata.extractor_runs
+        for instance in instance_set
+    }
+
 
-    return
+def show_metadata_diff(mapper: str,
+                       metadata_store: Path,
+                       element_path: MetadataPath,
+                       metadata_a: Optional[Metadata],
+                       metadata_b: Optional[Metadata],
+                       properties_a: dict,
+                       properties_b: dict,
+                       record_filter: RecordFilter = no_filter
+                       ) -> Generator[dict, None, None]:
+    """ Report the extractor runs that differ between two metadata-nodes
+
+    Runs are identified by extractor name and extractor configuration. Runs
+    that exist only in metadata_b are "added", runs that exist only in
+    metadata_a are "deleted", and runs whose content differs are
+    "modified". Deleted runs are reported with the properties of version
+    A, all other runs with the properties of version B.
+    """
+    if _is_same_object(metadata_a, metadata_b):
+        return
+
+    with ensure_mapped(metadata_a), ensure_mapped(metadata_b):
+        instances_a = _get_instances(metadata_a)
+        instances_b = _get_instances(metadata_b)
+
+    for key in sorted(
+            set(instances_a) | set(instances_b),
+            key=lambda key: (key[0], key[1].to_json_str())):
+
+        instance_a = instances_a.get(key)
+        instance_b = instances_b.get(key)
+        if instance_b is None:
+            state, instance, properties = "deleted", instance_a, properties_a
+        elif instance_a is None:
+            state, instance, properties = "added", instance_b, properties_b
+        elif instance_a != instance_b:
+            state, instance, properties = "modified", instance_b, properties_b
+        else:
+            continue
+
+        extractor_name = key[0]
+        if not record_filter.accepts_extractor(extractor_name) \
+                or not record_filter.accepts_instance(instance):
+            continue
+
+        result = _create_result_record(
+            mapper=mapper,
+            metadata_store=metadata_store,
+            metadata_record=record_filter.project({
+                **properties,
+                **_get_instance_properties(
+                    extractor_name,
+                    instance,
+                    record_filter)
+            }),
+            element_path=element_path,
+            report_type="dataset")
+        result["state"] = state
+        yield result
+
+
+def show_dataset_diff(mapper: str,
+                      metadata_store: Path,
+                      root_properties_a: Tuple[Union[UUID, str], str],
+                      root_properties_b: Tuple[Union[UUID, str], str],
+                      prefix_path: MetadataPath,
+                      dataset_path: MetadataPath,
+                      mrr_a: Optional[MetadataRootRecord],
+                      mrr_b: Optional[MetadataRootRecord],
+                      record_filter: RecordFilter = no_filter
+                      ) -> Generator[dict, None, None]:
+    """ Report the metadata that differs between two metadata root records
+    """
+    if _is_same_object(mrr_a, mrr_b):
+        return
+
+    with ensure_mapped(mrr_a), ensure_mapped(mrr_b):
+
+        common_properties = [
+            _get_common_properties(
+                *root_properties,
+                prefix_path,
+                mrr.dataset_identifier,
+                mrr.dataset_version,
+                dataset_path) if mrr is not None else None
+            for root_properties, mrr in (
+                (root_properties_a, mrr_a),
+                (root_properties_b, mrr_b))]
+
+        yield from show_metadata_diff(
+            mapper,
+            metadata_store,
+            dataset_path,
+            mrr_a.dataset_level_metadata if mrr_a is not None else None,
+            mrr_b.dataset_level_metadata if mrr_b is not None else None,
+            {"type": "dataset", **(common_properties[0] or {})},
+            {"type": "dataset", **(common_properties[1] or {})},
+            record_filter)
+
+        file_trees = [
+            mrr.file_tree if mrr is not None else None
+            for mrr in (mrr_a, mrr_b)]
+
+        for path, metadata_a, metadata_b in diff_mtrees(
+                *[
+                    file_tree.mtree if file_tree is not None else None
+                    for file_tree in file_trees]):
+
+            yield from show_metadata_diff(
+                mapper,
+                metadata_store,
+                dataset_path / path,
+                metadata_a,
+                metadata_b,
+                {
+                    "type": "file",
+                    "path": str(path),
+                    **(common_properties[0] or {})},
+                {
+                    "type": "file",
+                    "path": str(path),
+                    **(common_properties[1] or {})},
+                record_filter)
+
+
+def dump_diff(mapper: str,
+              metadata_store: Path,
+              tree_version_list: TreeVersionList,
+              version_range: str,
+              record_filter: RecordFilter = no_filter
+              ) -> Generator[dict, None, None]:
+    """ Report the metadata that differs between two versions
+
+    `version_range` has the form "A..B". Dataset trees of A and B with the
+    same prefix path are compared. Identical subtrees, datasets, and
+    metadata-nodes are detected by their storage location, and are not
+    mapped.
+    """
+    versions = version_range.split("..")
+    if len(versions) != 2 or not all(versions):
+        raise ValueError(
+            f"invalid diff range: '{version_range}', expected 'A..B'")
+
+    version_a, version_b = [
+        resolve_version(metadata_store, tree_version_list, version)
+        for version in versions]
+
+    prefix_paths = [
+        {
+            prefix_path
+            for version, prefix_path in select_versions(
+                tree_version_list,
+                version)}
+        for version in (version_a, version_b)]
+
+    for prefix_path in sorted(prefix_paths[0] | prefix_paths[1]):
+        dataset_trees = [
+            tree_version_list.get_dataset_tree(version, prefix_path)[2]
+            if prefix_path in version_prefix_paths
+            else None
+            for version, version_prefix_paths in zip(
+                (version_a, version_b),
+                prefix_paths)]
+
+        if _is_same_object(*[
+                dataset_tree.mtree if dataset_tree is not None else None
+                for dataset_tree in dataset_trees]):
+            continue
+
+        root_properties = [
+            _get_root_dataset_properties(metadata_store, version, dataset_tree)
+            if dataset_tree is not None
+            else None
+            for version, dataset_tree in zip(
+                (version_a, version_b),
+                dataset_trees)]
+
+        for path, mrr_a, mrr_b in diff_mtrees(*[
+                dataset_tree.mtree if dataset_tree is not None else None
+                for dataset_tree in dataset_trees]):
+
+            if path.parts[-1] != datalad_root_record_name:
+                continue
+
+            yield from show_dataset_diff(
+                mapper,
+                metadata_store,
+                root_properties[0],
+                root_properties[1],
+                prefix_path,
+                MetadataPath(*path.parts[:-1]),
+                mrr_a,
+                mrr_b,
+                record_filter)
 
 
 @build_doc
@@ -430,6 +1654,14 @@ class Dump(Interface):
         UUID:   "uuid:" UUID-DIGITS ["@" VERSION-DIGITS] [":" [LOCAL_PATH]]
 
     (The tree-format is the default format and does not require a prefix).
+
+    DATASET_PATH and LOCAL_PATH may contain shell-style wildcards. A path
+    component "**" matches any number of path components, e.g. the pattern
+    ":derivatives/**/*.json" matches all files that end with ".json" at any
+    depth below "derivatives". If LOCAL_PATH is prefixed with "re:", its
+    path components are regular expressions that have to match complete
+    file or directory names, e.g. ":re:derivatives/**/sub-[0-9]+\\.json".
+    Only directories that can contain a match are searched.
     """
 
     # Use a custom renderer to emit a self-contained metadata record. The
@@ -467,7 +1699,49 @@ class Dump(Interface):
             text="Show metadata for all files ending in `.json` in all "
                  "datasets by not specifying a dataset at all. This will "
                  "start dumping at the top-level dataset.",
-            code_cmd="datalad meta-dump :*.json -r")
+            code_cmd="datalad meta-dump :*.json -r"),
+        dict(
+            text="Show metadata for all files ending in `.json` at any "
+                 "depth below the directory `derivatives` of the top-level "
+                 "dataset",
+            code_cmd="datalad meta-dump ':derivatives/**/*.json'"),
+        dict(
+            text="Show metadata for all files whose names match a regular "
+                 "expression in the directory `derivatives`",
+            code_cmd="datalad meta-dump ':re:derivatives/sub-[0-9]+\\.json'"),
+        dict(
+            text="Show the dataset versions and extraction times of all "
+                 "metadata records that were created by the extractor "
+                 "`metalad_core` since March 1st, 2022",
+            code_cmd="datalad meta-dump -r --extractor metalad_core "
+                     "--since 2022-03-01 "
+                     "--fields dataset_version,extraction_time"),
+        dict(
+            text="Dump the metadata of all datasets that are known to the "
+                 "newest version of the top-level dataset",
+            code_cmd="datalad meta-dump -r --latest"),
+        dict(
+            text="Dump the metadata of all versions of the top-level "
+                 "dataset that were committed after the tag `v1.0`",
+            code_cmd="datalad meta-dump -r --versions v1.0..HEAD"),
+        dict(
+            text="Dump the metadata of all versions of the top-level "
+                 "dataset with four threads",
+            code_cmd="datalad meta-dump -r -J 4"),
+        dict(
+            text="Write the metadata records of all datasets known to the "
+                 "queried dataset to a file, one JSON record per line",
+            code_cmd="datalad meta-dump -r --output-file metadata.jsonl"),
+        dict(
+            text="Show the metadata records that were added, deleted, or "
+                 "modified between the previous version and the current "
+                 "version of the queried dataset",
+            code_cmd="datalad meta-dump --diff HEAD~1..HEAD"),
+        dict(
+            text="Show the number of dataset-level and file-level metadata "
+                 "records, and the number of extractor runs per extractor, "
+                 "of all datasets known to the queried dataset",
+            code_cmd="datalad meta-dump -r --stats")
     ]
 
     _params_ = dict(
@@ -491,7 +1765,142 @@ class Dump(Interface):
                    option does not cause any recursion into potential
                    sub-datasets on the filesystem. It merely determines what
                    metadata is being reported from the given/discovered
-                   reference dataset."""))
+                   reference dataset."""),
+        use_index=Parameter(
+            args=("--use-index",),
+            action="store_true",
+            doc="""If set, look up metadata in a persistent index of the
+                   metadata store, instead of traversing the stored trees.
+                   The index is created, or updated, if the metadata store
+                   was modified since the last update. The index is only
+                   used for tree-paths without wildcards on local metadata
+                   stores, other queries traverse the stored trees. It
+                   cannot be combined with --count or --stats."""),
+        extractor=Parameter(
+            args=("--extractor",),
+            action="append",
+            metavar="EXTRACTOR_NAME",
+            doc="""Only dump metadata that was created by the extractor with
+                   the given name. This option can be given multiple times to
+                   dump metadata of multiple extractors.""",
+            constraints=EnsureStr() | EnsureNone()),
+        fields=Parameter(
+            args=("--fields",),
+            metavar="FIELDS",
+            doc="""A comma-separated list of the fields that should be
+                   included in dumped metadata records, e.g.
+                   "dataset_version,extractor_name". Fields that are not
+                   listed are not read. Unknown fields are ignored.""",
+            constraints=EnsureStr() | EnsureNone()),
+        since=Parameter(
+            args=("--since",),
+            metavar="TIME",
+            doc="""Only dump metadata that was extracted at, or after, the
+                   given time. TIME is a POSIX timestamp or an ISO 8601
+                   date, e.g. "2022-03-01" or "2022-03-01T12:00:00".""",
+            constraints=EnsureStr() | EnsureNone()),
+        until=Parameter(
+            args=("--until",),
+            metavar="TIME",
+            doc="""Only dump metadata that was extracted at, or before, the
+                   given time. TIME has the same format as in --since.""",
+            constraints=EnsureStr() | EnsureNone()),
+        latest=Parameter(
+            args=("--latest",),
+            action="store_true",
+            doc="""If set, only dump metadata of the newest version of a
+                   dataset, i.e. the version that was added last. If the
+                   metadata store contains datasets at different prefix
+                   paths, the newest version of each prefix path is
+                   dumped."""),
+        versions=Parameter(
+            args=("--versions",),
+            metavar="VERSION_RANGE",
+            doc="""Only dump metadata of versions that are contained in the
+                   given git revision range, e.g. "v1.0..main". The range
+                   is resolved in the git repository of the metadata
+                   store. If --latest is given as well, the newest version
+                   in the range is dumped.""",
+            constraints=EnsureStr() | EnsureNone()),
+        jobs=Parameter(
+            args=("-J", "--jobs"),
+            metavar="NJOBS",
+            doc="""The number of threads that dump versions concurrently.
+                   Every version, i.e. every dataset tree, or every version
+                   of a UUID-identified dataset, is dumped by a single
+                   thread. Results are reported in the same order as in a
+                   sequential dump, unless --unordered is given. Queries
+                   that are answered from the index are not parallelized
+                   (default: 1).""",
+            constraints=EnsureInt() | EnsureNone()),
+        unordered=Parameter(
+            args=("--unordered",),
+            action="store_true",
+            doc="""If set together with --jobs, report the results of all
+                   versions as soon as they are available, instead of
+                   reporting the results of one version after the
+                   results of the previous version."""),
+        output_file=Parameter(
+            args=("--output-file",),
+            metavar="FILE",
+            doc="""Write the dumped metadata records to the given file, one
+                   JSON record per line, instead of reporting a result for
+                   every record. If FILE is "-", the records are written to
+                   stdout. A single result that contains the number of
+                   written records is reported after all records were
+                   written.""",
+            constraints=EnsureStr() | EnsureNone()),
+        raw_jsonl=Parameter(
+            args=("--raw-jsonl",),
+            action="store_true",
+            doc="""Write the dumped metadata records to stdout, one JSON
+                   record per line, instead of reporting a result for every
+                   record. This is the same as "--output-file -" and is
+                   ignored if --output-file is given. Use this for fast
+                   dumps of many records, e.g. as input for
+                   "datalad meta-add --json-lines"."""),
+        diff=Parameter(
+            args=("--diff",),
+            metavar="A..B",
+            doc="""Report only metadata that differs between the versions A
+                   and B of the queried dataset, instead of dumping
+                   metadata. A and B are versions in the metadata store,
+                   or git revisions that resolve to versions, e.g.
+                   "HEAD~1..HEAD". It is an error if A or B has no
+                   metadata in the metadata store. Every reported record contains the key
+                   "state" with one of the values "added", "deleted", or
+                   "modified". Deleted records are reported as they are
+                   stored in version A, added and modified records as they
+                   are stored in version B. Unchanged parts of the stored
+                   trees are skipped without reading them. The options
+                   --extractor, --fields, --since, and --until select the
+                   reported records. A DATASET_FILE_PATH_PATTERN is not
+                   supported.""",
+            constraints=EnsureStr() | EnsureNone()),
+        count=Parameter(
+            args=("--count",),
+            action="store_true",
+            doc="""Report the number of datasets with dataset-level
+                   metadata, and the number of files with metadata, that
+                   would be dumped, instead of dumping them. A result is
+                   reported for every dumped dataset version, and a final
+                   result with the sums of all versions. The stored
+                   metadata is not read, therefore the number of records
+                   is not reported, because a dataset or file can have
+                   records of multiple extractor runs. Use --stats to
+                   count records. --extractor, --since, --until, and
+                   --use-index are not supported with --count."""),
+        stats=Parameter(
+            args=("--stats",),
+            action="store_true",
+            doc="""Like --count, but also report the number of records that
+                   would be dumped, i.e. the number of extractor runs, the
+                   number of extractor runs per extractor, and the size of
+                   the stored metadata in bytes. The stored metadata is
+                   read, but no metadata records are created from it. The
+                   options --extractor, --since, and --until select the
+                   counted extractor runs. --use-index is not supported
+                   with --stats."""))
 
     @staticmethod
     @datasetmethod(name='meta_dump')
@@ -499,7 +1908,21 @@ class Dump(Interface):
     def __call__(
             dataset=None,
             path="",
-            recursive=False):
+            recursive=False,
+            use_index=False,
+            extractor=None,
+            fields=None,
+            since=None,
+            until=None,
+            latest=False,
+            versions=None,
+            jobs=None,
+            unordered=False,
+            output_file=None,
+            raw_jsonl=False,
+            diff=None,
+            count=False,
+            stats=False):
 
         metadata_store_path, tree_version_list, uuid_set = get_metadata_objects(
             dataset,
@@ -508,22 +1931,108 @@ class Dump(Interface):
         parser = MetadataURLParser(path)
         metadata_url = parser.parse()
 
-        if isinstance(metadata_url, TreeMetadataURL):
-            yield from dump_from_dataset_tree(
+        record_filter = create_record_filter(extractor, fields, since, until)
+        version_selection = VersionSelection(
+            latest,
+            resolve_version_range(metadata_store_path, versions)
+            if versions is not None
+            else None)
+
+        statistics_mode = (
+            StatisticsMode.stats
+            if stats
+            else StatisticsMode.count
+            if count
+            else None)
+        if statistics_mode is StatisticsMode.count \
+                and record_filter.selects_runs:
+            raise ValueError(
+                "--count cannot be combined with --extractor, --since, or "
+                "--until, use --stats instead")
+        if statistics_mode is not None and use_index:
+            raise ValueError(
+                "--use-index cannot be combined with --count or --stats")
+
+        if diff is not None:
+            if statistics_mode is not None:
+                raise ValueError(
+                    "--diff cannot be combined with --count or --stats")
+            if path:
+                raise ValueError(
+                    "--diff cannot be combined with a "
+                    "DATASET_FILE_PATH_PATTERN")
+            results = dump_diff(
+                default_mapper_family,
+                metadata_store_path,
+                tree_version_list,
+                diff,
+                record_filter)
+
+        elif use_index \
+                and can_use_index(metadata_store_path, metadata_url):
+            results = dump_from_index(
                 default_mapper_family,
                 metadata_store_path,
                 tree_version_list,
                 metadata_url,
-                recursive)
+                recursive,
+                record_filter,
+                version_selection)
+
+        elif isinstance(metadata_url, TreeMetadataURL):
+            results = dump_from_dataset_tree(
+                default_mapper_family,
+                metadata_store_path,
+                tree_version_list,
+                metadata_url,
+                recursive,
+                record_filter,
+                version_selection,
+                jobs,
+                not unordered,
+                statistics_mode)
 
         elif isinstance(metadata_url, UUIDMetadataURL):
-            yield from dump_from_uuid_set(
+            results = dump_from_uuid_set(
                 default_mapper_family,
                 metadata_store_path,
                 uuid_set,
                 metadata_url,
-                recursive)
+                recursive,
+                record_filter,
+                version_selection,
+                jobs,
+                not unordered,
+                statistics_mode)
+
+        else:
+            return
 
+        if statistics_mode is not None:
+            results = add_statistics_total(
+                default_mapper_family,
+                metadata_store_path,
+                results)
+
+        if output_file is None and raw_jsonl is False:
+            yield from results
+            return
+
+        output_file = output_file or stdout_name
+        record_count = write_records(results, output_file)
+        yield {
+            "status": "ok",
+            "action": "meta_dump",
+            "backend": default_mapper_family,
+            "metadata_source": metadata_store_path,
+            "type": "file",
+            "path": (
+                Path(output_file).absolute()
+                if output_file != stdout_name
+                else metadata_store_path),
+            "output_file": output_file,
+            "record_count": record_count
+        }
         return
 
     @staticmethod
@@ -533,4 +2042,13 @@ class Dump(Interface):
             # logging complained about this already
             return
 
-        ui.message(json.dumps(res["metadata"]))
+        if "record_count" in res:
+            # Summary of records that were written by write_records, do not
+            # interleave it with records that were written to stdout.
+            if res["output_file"] != stdout_name:
+                ui.message(
+                    f"wrote {res['record_count']} metadata records to "
+                    f"{res['output_file']}")
+            return
+
+        ui.message(jsoncodec.dumps(get_output_record(res)))
@@ -0,0 +1,456 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""
+Persistent secondary index for metadata lookups in "meta-dump".
+
+The index is an SQLite database in the git directory of a local metadata
+store. It maps the coordinates of a metadata record, i.e. root dataset
+version, prefix path, dataset path, file path, and extractor name, to the
+git object reference of the `Metadata`-node that contains the record. That
+allows to answer point queries and prefix queries without mapping
+`TreeVersionList`, `DatasetTree`, and `FileTree`-nodes.
+
+The index records the location of the tree version list that it was built
+from. If the tree version list changed, e.g. after "meta-add" or
+"meta-aggregate", the index is updated incrementally, i.e. only datasets
+whose metadata root record location changed are re-indexed. Because
+locations identify the content of a metadata root record, the records of a
+metadata root record that is already indexed in another dataset tree, e.g. in
+another version, are copied from that dataset tree.
+"""
+import logging
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from dataladmetadatamodel.datasettree import DatasetTree
+from dataladmetadatamodel.mappableobject import ensure_mapped
+from dataladmetadatamodel.mapper.gitmapper.gitbackend.subprocess import (
+    checked_execute,
+    git_command_line,
+)
+from dataladmetadatamodel.metadata import Metadata
+from dataladmetadatamodel.metadatapath import MetadataPath
+from dataladmetadatamodel.versionlist import TreeVersionList
+
+
+lgr = logging.getLogger("datalad.metadata.dumpindex")
+
+index_file_name = "metalad-dump-index.sqlite"
+
+schema = """
+CREATE TABLE IF NOT EXISTS properties (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS trees (
+    tree_id INTEGER PRIMARY KEY,
+    version TEXT NOT NULL,
+    prefix_path TEXT NOT NULL,
+    location TEXT NOT NULL,
+    root_dataset_id TEXT NOT NULL,
+    root_dataset_version TEXT NOT NULL,
+    UNIQUE (version, prefix_path)
+);
+CREATE TABLE IF NOT EXISTS datasets (
+    tree_id INTEGER NOT NULL,
+    dataset_path TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    dataset_version TEXT NOT NULL,
+    location TEXT NOT NULL,
+    PRIMARY KEY (tree_id, dataset_path)
+);
+CREATE TABLE IF NOT EXISTS records (
+    tree_id INTEGER NOT NULL,
+    dataset_path TEXT NOT NULL,
+    path TEXT,
+    extractor_name TEXT NOT NULL,
+    location TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_by_path
+    ON records (tree_id, dataset_path, path);
+CREATE INDEX IF NOT EXISTS datasets_by_id
+    ON datasets (dataset_id, dataset_version);
+CREATE INDEX IF NOT EXISTS datasets_by_location
+    ON datasets (location);
+"""
+
+
+@dataclass(frozen=True)
+class IndexedTree:
+    tree_id: int
+    version: str
+    prefix_path: MetadataPath
+    root_dataset_id: str
+    root_dataset_version: str
+
+
+@dataclass(frozen=True)
+class IndexedDataset:
+    dataset_path: MetadataPath
+    dataset_id: str
+    dataset_version: str
+
+
+@dataclass(frozen=True)
+class IndexedMetadata:
+    """ A metadata-node and the names of the extractors stored in it
+
+    `path` is None for dataset-level metadata.
+    """
+    path: Optional[MetadataPath]
+    location: str
+    extractor_names: Tuple[str, ...]
+
+
+def get_index_path(metadata_store: Path) -> Path:
+    """ Get the path of the index file of a local metadata store """
+    cmd_line = git_command_line(
+        str(metadata_store),
+        "rev-parse",
+        ["--absolute-git-dir"])
+    return Path(checked_execute(cmd_line)[0][0]) / index_file_name
+
+
+def get_object_name(metadata_store: str, location: str) -> str:
+    """ Resolve a location, e.g. a git reference, to a git object name """
+    cmd_line = git_command_line(
+        metadata_store,
+        "rev-parse",
+        ["--verify", location])
+    return checked_execute(cmd_line)[0][0]
+
+
+def _prefix_range(prefix: str) -> Tuple[str, str]:
+    # All strings that start with "prefix/" are in [prefix/, prefix0),
+    # because "0" is the character that follows "/".
+    return prefix + "/", prefix + "0"
+
+
+def _path_str(path: MetadataPath) -> str:
+    return str(path) if path != MetadataPath("") else ""
+
+
+class DumpIndex:
+    def __init__(self, index_path: Path):
+        self.index_path = index_path
+        self.connection = sqlite3.connect(str(index_path), timeout=60)
+        self.connection.executescript(schema)
+
+    @classmethod
+    def open(cls, metadata_store: Path) -> "DumpIndex":
+        return cls(get_index_path(metadata_store))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> "DumpIndex":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_property(self, name: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT value FROM properties WHERE name = ?",
+            (name,)).fetchone()
+        return row[0] if row else None
+
+    def update(self, tree_version_list: TreeVersionList) -> bool:
+        """ Update the index to the state of the tree version list
+
+        :return: True if the index was modified, False if it was current
+        """
+        tree_version_list_location = get_object_name(
+            tree_version_list.realm,
+            tree_version_list.reference.location)
+        if self._get_property("tree_version_list") \
+                == tree_version_list_location:
+            return False
+
+        stored_trees = {
+            (version, prefix_path): (tree_id, location)
+            for tree_id, version, prefix_path, location
+            in self.connection.execute(
+                "SELECT tree_id, version, prefix_path, location FROM trees")}
+
+        current_trees = {
+            (version, _path_str(prefix_path)): dataset_tree
+            for version, (_, prefix_path, dataset_tree)
+            in tree_version_list.versioned_elements}
+
+        with self.connection:
+            for key, (tree_id, _) in stored_trees.items():
+                if key not in current_trees:
+                    self._remove_tree(tree_id)
+
+            for (version, prefix_path), dataset_tree in current_trees.items():
+                stored_tree = stored_trees.get((version, prefix_path))
+                location = dataset_tree.mtree.reference.location
+                if stored_tree is None:
+                    lgr.debug(
+                        f"indexing dataset tree {version}:{prefix_path} "
+                        f"at {location}")
+                    self._add_tree(version, prefix_path, dataset_tree)
+                elif stored_tree[1] != location:
+                    lgr.debug(
+                        f"updating dataset tree {version}:{prefix_path} "
+                        f"at {location}")
+                    self._update_tree(stored_tree[0], version, dataset_tree)
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO properties VALUES (?, ?)",
+                ("tree_version_list", tree_version_list_location))
+        return True
+
+    def _remove_tree(self, tree_id: int):
+        for table in ("records", "datasets", "trees"):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE tree_id = ?",
+                (tree_id,))
+
+    def _remove_dataset(self, tree_id: int, dataset_path: str):
+        for table in ("records", "datasets"):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE tree_id = ? AND dataset_path = ?",
+                (tree_id, dataset_path))
+
+    def _add_tree(self,
+                  version: str,
+                  prefix_path: str,
+                  dataset_tree: DatasetTree):
+
+        tree_id = self.connection.execute(
+            "INSERT INTO trees (version, prefix_path, location, "
+            "root_dataset_id, root_dataset_version) "
+            "VALUES (?, ?, '', '', '')",
+            (version, prefix_path)).lastrowid
+        self._update_tree(tree_id, version, dataset_tree)
+
+    def _update_tree(self,
+                     tree_id: int,
+                     version: str,
+                     dataset_tree: DatasetTree):
+        """ Update an indexed tree to the state of a dataset tree
+
+        Only datasets whose metadata root record location changed are
+        re-indexed.
+        """
+        with ensure_mapped(dataset_tree):
+            root_mrr = dataset_tree.get_metadata_root_record(MetadataPath(""))
+            if root_mrr is None:
+                root_dataset_id, root_dataset_version = "<unknown>", version
+            else:
+                with ensure_mapped(root_mrr):
+                    root_dataset_id = str(root_mrr.dataset_identifier)
+                    root_dataset_version = root_mrr.dataset_version
+
+            self.connection.execute(
+                "UPDATE trees SET location = ?, root_dataset_id = ?, "
+                "root_dataset_version = ? WHERE tree_id = ?",
+                (
+                    dataset_tree.mtree.reference.location,
+                    root_dataset_id,
+                    root_dataset_version,
+                    tree_id))
+
+            stored_datasets = dict(self.connection.execute(
+                "SELECT dataset_path, location FROM datasets "
+                "WHERE tree_id = ?",
+                (tree_id,)))
+
+            current_datasets = {
+                _path_str(dataset_path): mrr
+                for dataset_path, mrr in dataset_tree.dataset_paths}
+
+            removed_paths = stored_datasets.keys() - current_datasets.keys()
+            for dataset_path in removed_paths:
+                self._remove_dataset(tree_id, dataset_path)
+
+            for dataset_path, mrr in current_datasets.items():
+                location = mrr.reference.location
+                if stored_datasets.get(dataset_path) == location:
+                    continue
+                self._remove_dataset(tree_id, dataset_path)
+                if not self._copy_dataset(tree_id, dataset_path, location):
+                    with ensure_mapped(mrr):
+                        self._add_dataset(tree_id, dataset_path, mrr)
+
+    def _copy_dataset(self,
+                      tree_id: int,
+                      dataset_path: str,
+                      location: str) -> bool:
+        """ Copy the entries of an already indexed metadata root record
+
+        :return: True if a metadata root record with the given location was
+            indexed and its entries were copied, False otherwise
+        """
+        source = self.connection.execute(
+            "SELECT tree_id, dataset_path FROM datasets WHERE location = ? "
+            "LIMIT 1",
+            (location,)).fetchone()
+        if source is None:
+            return False
+
+        self.connection.execute(
+            "INSERT INTO datasets SELECT ?, ?, dataset_id, dataset_version, "
+            "location FROM datasets WHERE tree_id = ? AND dataset_path = ?",
+            (tree_id, dataset_path, *source))
+        self.connection.execute(
+            "INSERT INTO records SELECT ?, ?, path, extractor_name, location "
+            "FROM records WHERE tree_id = ? AND dataset_path = ? "
+            "ORDER BY rowid",
+            (tree_id, dataset_path, *source))
+        return True
+
+    def _add_dataset(self, tree_id: int, dataset_path: str, mrr):
+        self.connection.execute(
+            "INSERT INTO datasets VALUES (?, ?, ?, ?, ?)",
+            (
+                tree_id,
+                dataset_path,
+                str(mrr.dataset_identifier),
+                mrr.dataset_version,
+                mrr.reference.location))
+
+        metadata_nodes = []
+        if mrr.dataset_level_metadata is not None:
+            metadata_nodes.append((None, mrr.dataset_level_metadata))
+
+        file_tree = mrr.file_tree
+        if file_tree is not None:
+            with ensure_mapped(file_tree):
+                metadata_nodes.extend(
+                    (str(path), metadata)
+                    for path, metadata in file_tree.get_paths_recursive()
+                    if isinstance(metadata, Metadata))
+
+        for path, metadata in metadata_nodes:
+            with ensure_mapped(metadata):
+                self.connection.executemany(
+                    "INSERT INTO records VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            tree_id,
+                            dataset_path,
+                            path,
+                            extractor_name,
+                            metadata.reference.location)
+                        for extractor_name in metadata.extractors])
+
+    def get_trees(self, version: Optional[str] = None) -> List[IndexedTree]:
+        if version is None:
+            rows = self.connection.execute(
+                "SELECT tree_id, version, prefix_path, root_dataset_id, "
+                "root_dataset_version FROM trees ORDER BY tree_id")
+        else:
+            rows = self.connection.execute(
+                "SELECT tree_id, version, prefix_path, root_dataset_id, "
+                "root_dataset_version FROM trees WHERE version = ? "
+                "ORDER BY tree_id",
+                (version,))
+        return [
+            IndexedTree(
+                tree_id,
+                version,
+                MetadataPath(prefix_path),
+                root_dataset_id,
+                root_dataset_version)
+            for tree_id, version, prefix_path, root_dataset_id,
+            root_dataset_version in rows]
+
+    def get_datasets(self,
+                     tree: IndexedTree,
+                     dataset_path: MetadataPath,
+                     recursive: bool
+                     ) -> List[IndexedDataset]:
+        """ Get the datasets that a literal dataset path selects
+
+        This follows the semantics of a dataset tree search: the dataset at
+        `dataset_path` is selected, and all datasets on the way to it. If
+        `recursive` is True, all datasets below `dataset_path` are selected
+        as well.
+        """
+        parts = dataset_path.parts
+        paths = ["/".join(parts[:length]) for length in range(len(parts) + 1)]
+        condition = "dataset_path IN ({})".format(",".join("?" * len(paths)))
+        parameters = [tree.tree_id, *paths]
+        if recursive:
+            if paths[-1]:
+                condition += " OR (dataset_path >= ? AND dataset_path < ?)"
+                parameters.extend(_prefix_range(paths[-1]))
+            else:
+                condition = "1"
+                parameters = [tree.tree_id]
+
+        return [
+            IndexedDataset(MetadataPath(path), dataset_id, dataset_version)
+            for path, dataset_id, dataset_version in self.connection.execute(
+                "SELECT dataset_path, dataset_id, dataset_version "
+                f"FROM datasets WHERE tree_id = ? AND ({condition}) "
+                "ORDER BY dataset_path",
+                parameters)]
+
+    def get_metadata(self,
+                     tree: IndexedTree,
+                     dataset: IndexedDataset,
+                     local_path: MetadataPath,
+                     recursive: bool
+                     ) -> Iterable[IndexedMetadata]:
+        """ Get the metadata-nodes that a literal local path selects
+
+        Dataset-level metadata is always returned first. File-level metadata
+        is returned for the file at `local_path`, or, if `recursive` is True,
+        for all files at or below `local_path`.
+        """
+        local_path = _path_str(local_path)
+        condition = "path IS NULL"
+        parameters = [tree.tree_id, _path_str(dataset.dataset_path)]
+        if recursive:
+            if local_path:
+                condition += (
+                    " OR path = ? OR (path >= ? AND path < ?)")
+                parameters.extend([local_path, *_prefix_range(local_path)])
+            else:
+                condition = "1"
+        elif local_path:
+            condition += " OR path = ?"
+            parameters.append(local_path)
+
+        rows = self.connection.execute(
+            "SELECT path, location, extractor_name FROM records "
+            f"WHERE tree_id = ? AND dataset_path = ? AND ({condition}) "
+            "ORDER BY path IS NOT NULL, path, rowid",
+            parameters)
+
+        # Group the extractor names of every metadata-node
+        entries: Dict[Tuple[Optional[str], str], List[str]] = dict()
+        for path, location, extractor_name in rows:
+            entries.setdefault((path, location), []).append(extractor_name)
+
+        for (path, location), extractor_names in entries.items():
+            yield IndexedMetadata(
+                MetadataPath(path) if path is not None else None,
+                location,
+                tuple(extractor_names))
+
+
+def is_literal_path(path: Optional[MetadataPath]) -> bool:
+    """ Check whether a path pattern contains no shell-style wildcards """
+    return path is None or not any(
+        character in part
+        for part in path.parts
+        for character in "*?[")
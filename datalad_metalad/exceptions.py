@@ -13,6 +13,11 @@ class MetadataKeyException(RuntimeError):
         self.message = message
         self.keys = keys or []
 
+    def __reduce__(self):
+        # Preserve the keys if the exception is pickled, e.g. in order to
+        # transfer it from a worker process.
+        return self.__class__, (self.message, self.keys)
+
     def to_str(self):
         return (
             "MetadataKeyException("
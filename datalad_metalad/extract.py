@@ -10,7 +10,6 @@
 Run a dataset-level metadata extractor on a dataset
 or run a file-level metadata extractor on a file
 """
-import json
 import logging
 import sys
 import time
@@ -30,6 +29,7 @@ from typing import (
 )
 from uuid import UUID
 
+import dataclasses
 from dataclasses import dataclass
 
 from datalad.distribution.dataset import Dataset
@@ -54,6 +54,10 @@ from datalad.support.param import Parameter
 
 from dataladmetadatamodel.metadatapath import MetadataPath
 
+from . import (
+    exclude_from_metadata,
+    jsoncodec,
+)
 from .exceptions import ExtractorNotFoundError
 from .extractors.base import (
     BaseMetadataExtractor,
@@ -64,6 +68,11 @@ from .extractors.base import (
     MetadataExtractor,
     MetadataExtractorBase,
 )
+from .outputreference import (
+    create_output_location,
+    remove_output_location,
+)
+from .resourceusage import account_resources
 from .utils import (
     args_to_dict,
     check_dataset,
@@ -131,6 +140,10 @@ class Extract(Interface):
     The command can also take legacy datalad-metalad extractors and
     will execute them in either "content" or "dataset" mode, depending
     on the whether file-level- or dataset-level extraction is requested.
+
+    If "--all-files" is given, a file-level extraction is performed on all
+    files of the dataset. Legacy extractors are then executed only once
+    for the whole dataset.
     """
 
     result_renderer = "tailored"
@@ -206,6 +219,18 @@ class Extract(Interface):
         force_dataset_level=Parameter(
             args=("--force-dataset-level",),
             action="store_true"),
+        all_files=Parameter(
+            args=("--all-files",),
+            action="store_true",
+            doc="""Run the given file-level extractor on all files of the
+            dataset. No path is given, i.e. the first positional argument
+            after the extractor name is the key of the first extractor
+            argument. Legacy extractors are
+            invoked once for the whole dataset, and their per-file results
+            are reported as individual file-level metadata records. The
+            resource usage of this single invocation is reported with the
+            first result. Other file-level extractors are invoked for each
+            file."""),
         extractorargs=Parameter(
             args=("extractorargs",),
             metavar="EXTRACTOR_ARGUMENTS",
@@ -233,19 +258,27 @@ class Extract(Interface):
             context: Optional[Union[str, Dict[str, str]]] = None,
             get_context: bool = False,
             force_dataset_level: bool = False,
+            all_files: bool = False,
             extractorargs: Optional[List[str]] = None):
 
         # Get basic arguments
         extractor_name = extractorname
-        extractor_args = ([path] + extractorargs
-                          if force_dataset_level
+        if all_files is True and force_dataset_level is True:
+            raise ValueError(
+                "--all-files and --force-dataset-level are mutually "
+                "exclusive")
+        # With --force-dataset-level or --all-files no path is given, i.e.
+        # the first positional argument is the first extractor argument.
+        no_path = force_dataset_level or all_files
+        extractor_args = ([path] + (extractorargs or [])
+                          if no_path and path is not None
                           else extractorargs)
-        path = None if force_dataset_level else path
+        path = None if no_path else path
         context = (
             {}
             if context is None
             else (
-                json.loads(context)
+                jsoncodec.loads(context)
                 if isinstance(context, str)
                 else context))
 
@@ -319,6 +352,11 @@ class Extract(Interface):
         # If path is not given, we assume that a dataset-level extraction is
         # requested and the extractor class is a subclass of
         # DatasetMetadataExtractor (or a legacy extractor class).
+        if all_files:
+            extraction_arguments.extractor_type = 'file'
+            yield from do_all_files_extraction(ep=extraction_arguments)
+            return
+
         if path:
             extraction_arguments.extractor_type = 'file'
             # Check whether the path points to a sub_dataset.
@@ -349,7 +387,7 @@ class Extract(Interface):
                 else {}
             )
 
-            ui.message(json.dumps({
+            ui.message(jsoncodec.dumps({
                 **metadata_record,
                 **path,
                 **dataset_path,
@@ -358,7 +396,7 @@ class Extract(Interface):
 
         context = res.get("context")
         if context is not None:
-            ui.message(json.dumps(context))
+            ui.message(jsoncodec.dumps(context))
 
 
 def do_extraction(ep: ExtractionArguments):
@@ -379,7 +417,8 @@ def do_extraction(ep: ExtractionArguments):
             ep.source_dataset.path / ep.file_tree_path
             if extractor_type == 'file' else ep.source_dataset.path)
 
-        yield from legacy_extractor_map[extractor_type](ep)
+        yield from account_resources(
+            legacy_extractor_map[extractor_type](ep))
         return
 
     # Latest generation extraction
@@ -419,7 +458,35 @@ def do_extraction(ep: ExtractionArguments):
         ep.source_dataset_version,
         ep.extraction_parameter)
 
-    yield from perform_metadata_extraction(ep, extractor)
+    yield from account_resources(perform_metadata_extraction(ep, extractor))
+
+
+def do_all_files_extraction(ep: ExtractionArguments):
+
+    if not issubclass(ep.extractor_class, MetadataExtractorBase):
+        lgr.debug(
+            "performing dataset-wide legacy file-level metadata "
+            "extraction (%s) for %s",
+            ep.extractor_name,
+            ep.source_dataset.path)
+        yield from account_resources(legacy_extract_all_files(ep))
+        return
+
+    if not issubclass(ep.extractor_class, FileMetadataExtractor):
+        raise ValueError(
+            f"A file-level metadata-extraction on all files was attempted, "
+            f"but the specified extractor ({ep.extractor_name}) is not a "
+            f"file-level extractor")
+
+    repo_path = ep.source_dataset.repo.pathobj
+    for path in get_dataset_file_status(ep.source_dataset):
+        file_tree_path = MetadataPath(*path.relative_to(repo_path).parts)
+        yield from do_extraction(
+            dataclasses.replace(
+                ep,
+                local_source_object_path=(
+                    ep.source_dataset.pathobj / file_tree_path).absolute(),
+                file_tree_path=file_tree_path))
 
 
 def perform_metadata_extraction(
@@ -427,11 +494,7 @@ def perform_metadata_extraction(
         extractor: Union[DatasetMetadataExtractor, FileMetadataExtractor]
     ):
 
-    # Get output category; only IMMEDIATE is supported
     output_category = extractor.get_data_output_category()
-    if output_category != DataOutputCategory.IMMEDIATE:
-        raise NotImplementedError(
-            f"Output category {output_category} not supported")
 
     # Prepare result record
     result_template = {
@@ -457,8 +520,22 @@ def perform_metadata_extraction(
         if failure_count > 0:
             return
 
-    # Run extraction and update result
-    result = extractor.extract(None)
+    # Run extraction and update result. Output of FILE- and DIRECTORY-category
+    # extractors is not read into memory, instead the metadata record will
+    # contain a reference to the output location.
+    output_location, output_reference = create_output_location(output_category)
+    try:
+        result = extractor.extract(output_location)
+    except Exception:
+        remove_output_location(output_reference)
+        raise
+    finally:
+        if output_category == DataOutputCategory.FILE:
+            output_location.close()
+
+    if output_reference is not None and not result.extraction_success:
+        remove_output_location(output_reference)
+
     result.datalad_result_dict.update(result_template)
     if result.extraction_success:
         result.datalad_result_dict["metadata_record"] = dict(
@@ -471,7 +548,10 @@ def perform_metadata_extraction(
             extraction_time=time.time(),
             agent_name=ep.agent_name,
             agent_email=ep.agent_email,
-            extracted_metadata=result.immediate_data)
+            extracted_metadata=(
+                output_reference
+                if output_reference is not None
+                else result.immediate_data))
         if issubclass(ep.extractor_class, FileMetadataExtractor):
             result.datalad_result_dict["metadata_record"].update(
                 dict(
@@ -627,10 +707,20 @@ def ensure_path_validity(dataset: Dataset, file_tree_path: MetadataPath):
         raise ValueError(f"FILE must not point to a directory ({full_path})")
 
 
+def _is_annexed_content_present(path: Union[str, Path]) -> bool:
+    # A locked annexed file is a symlink into the annex object store. If the
+    # symlink resolves, the content is locally present, for example because
+    # it was prefetched, and no "get" is required.
+    path = Path(path)
+    return path.is_symlink() and path.exists()
+
+
 def ensure_content_availability(extractor: FileMetadataExtractor,
                                 file_info: FileInfo):
 
     if extractor.is_content_required():
+        if _is_annexed_content_present(file_info.path):
+            return
         for result in extractor.dataset.get(path={file_info.path},
                                             get_data=True,
                                             return_type="generator",
@@ -645,8 +735,17 @@ def ensure_content_availability(extractor: FileMetadataExtractor,
                 extractor.dataset.path, file_info.intra_dataset_path))
 
 
-def ensure_legacy_path_availability(ep: ExtractionArguments, path: str):
-    for result in ep.source_dataset.get(path=path,
+def ensure_legacy_path_availability(ep: ExtractionArguments,
+                                    path: Union[str, List[str]]):
+
+    paths = [
+        p
+        for p in ([path] if isinstance(path, str) else path)
+        if not _is_annexed_content_present(p)]
+    if not paths:
+        return
+
+    for result in ep.source_dataset.get(path=paths,
                                         get_data=True,
                                         return_type="generator",
                                         result_renderer="disabled"):
@@ -655,7 +754,7 @@ def ensure_legacy_path_availability(ep: ExtractionArguments, path: str):
             lgr.error(
                 "cannot make content of {} available "
                 "in dataset {}".format(
-                    path, ep.source_dataset))
+                    result.get("path", path), ep.source_dataset))
             return
 
     lgr.debug(
@@ -668,15 +767,21 @@ def ensure_legacy_content_availability(ep: ExtractionArguments,
                                        operation: str,
                                        status: List[dict]):
 
-    try:
+    # Collect all required paths in order to fetch them with a single
+    # "get"-call. Required elements are either status records or objects
+    # with a path attribute.
+    required_paths = [
+        str(
+            required_element["path"]
+            if isinstance(required_element, dict)
+            else required_element.path)
         for required_element in extractor.get_required_content(
-                    ep.source_dataset,
-                    operation,
-                    status):
+            ep.source_dataset,
+            operation,
+            status)]
 
-            ensure_legacy_path_availability(ep, required_element.path)
-    except AttributeError:
-        pass
+    if required_paths:
+        ensure_legacy_path_availability(ep, required_paths)
 
 
 def legacy_extract_dataset(ea: ExtractionArguments) -> Iterable[dict]:
@@ -796,6 +901,65 @@ def legacy_get_file_info(dataset: Dataset,
     }
 
 
+def get_dataset_file_status(dataset: Dataset) -> Dict[Path, Dict]:
+    """ Get the status of all files in a dataset
+
+    Subdatasets and elements that are excluded from metadata processing,
+    e.g. ".datalad", are not reported. The keys of the result are absolute
+    paths based on `dataset.repo.pathobj`.
+    """
+    repo = dataset.repo
+    if isinstance(repo, AnnexRepo):
+        status = annex_status(repo)
+    else:
+        status = repo.status(untracked="no", eval_submodule_state="no")
+
+    return {
+        path: path_status
+        for path, path_status in status.items()
+        if path_status.get("type") in ("file", "symlink")
+        and path.relative_to(repo.pathobj).parts[0] not in exclude_from_metadata
+    }
+
+
+def _get_legacy_file_tree_path(dataset: Dataset,
+                               path: Union[str, PurePath]
+                               ) -> MetadataPath:
+    # Legacy extractors report paths either absolute or relative to the
+    # dataset root.
+    path = PurePath(path)
+    if path.is_absolute():
+        for base_path in (dataset.repo.pathobj, dataset.pathobj):
+            try:
+                return MetadataPath(*path.relative_to(base_path).parts)
+            except ValueError:
+                pass
+    return MetadataPath(*path.parts)
+
+
+def _legacy_file_result(ea: ExtractionArguments,
+                        file_tree_path: MetadataPath,
+                        extractor_version: str,
+                        metadata: dict) -> dict:
+    return dict(
+        action="meta_extract",
+        status="ok",
+        type="file",
+        path=str((ea.source_dataset.pathobj / file_tree_path).absolute()),
+        metadata_record=dict(
+            type="file",
+            dataset_id=ea.source_dataset_id,
+            dataset_version=ea.source_dataset_version,
+            path=file_tree_path,
+            extractor_name=ea.extractor_name,
+            extractor_version=extractor_version,
+            extraction_parameter=ea.extraction_parameter,
+            extraction_time=time.time(),
+            agent_name=ea.agent_name,
+            agent_email=ea.agent_email,
+            extracted_metadata=metadata))
+
+
 def legacy_extract_file(ea: ExtractionArguments) -> Iterable[dict]:
 
     if issubclass(ea.extractor_class, MetadataExtractor):
@@ -813,25 +977,13 @@ def legacy_extract_file(ea: ExtractionArguments) -> Iterable[dict]:
                                 [status]):
 
             if result["status"] == "ok":
-                yield dict(
-                    action="meta_extract",
-                    status="ok",
-                    type="file",
-                    path=str(file_path.absolute()),
-                    metadata_record=dict(
-                        type="file",
-                        dataset_id=ea.source_dataset_id,
-                        dataset_version=ea.source_dataset_version,
-                        path=ea.file_tree_path,
-                        extractor_name=ea.extractor_name,
-                        extractor_version=str(
-                            extractor.get_state(ea.source_dataset).get(
-                                "version", "---")),
-                        extraction_parameter=ea.extraction_parameter,
-                        extraction_time=time.time(),
-                        agent_name=ea.agent_name,
-                        agent_email=ea.agent_email,
-                        extracted_metadata=result["metadata"]))
+                yield _legacy_file_result(
+                    ea,
+                    ea.file_tree_path,
+                    str(
+                        extractor.get_state(ea.source_dataset).get(
+                            "version", "---")),
+                    result["metadata"])
             else:
                 yield dict(
                     action="meta_extract",
@@ -851,24 +1003,81 @@ def legacy_extract_file(ea: ExtractionArguments) -> Iterable[dict]:
         _, file_result = extractor.get_metadata(False, True)
 
         for extracted_path, metadata in file_result:
-            yield dict(
-                action="meta_extract",
-                status="ok",
-                type="file",
-                path=path,
-                metadata_record=dict(
+            result = _legacy_file_result(
+                ea,
+                MetadataPath(extracted_path),
+                "un-versioned",
+                metadata)
+            result["path"] = path
+            yield result
+
+    else:
+        raise ValueError(
+            f"unknown extractor class: {ea.extractor_class.__name__}")
+
+
+def legacy_extract_all_files(ea: ExtractionArguments) -> Iterable[dict]:
+    """ Run a legacy extractor once on all files of a dataset
+
+    The extractor is invoked with the status of all files, and every
+    per-file result is reported as an individual file-level metadata record.
+    Because the extractor is invoked only once, `account_resources` attributes
+    the resource usage of the invocation to the first result.
+    """
+    file_status = get_dataset_file_status(ea.source_dataset)
+
+    if issubclass(ea.extractor_class, MetadataExtractor):
+
+        extractor = ea.extractor_class()
+        status = [
+            {"path": str(path), **path_status}
+            for path, path_status in file_status.items()]
+        ensure_legacy_content_availability(ea, extractor, "content", status)
+        extractor_version = str(
+            extractor.get_state(ea.source_dataset).get("version", "---"))
+
+        for result in extractor(ea.source_dataset,
+                                ea.source_dataset_version,
+                                "content",
+                                status):
+
+            if result["status"] == "ok":
+                if result.get("type", "file") != "file":
+                    continue
+                yield _legacy_file_result(
+                    ea,
+                    _get_legacy_file_tree_path(
+                        ea.source_dataset,
+                        result["path"]),
+                    extractor_version,
+                    result["metadata"])
+            else:
+                yield dict(
+                    action="meta_extract",
+                    status=result["status"],
                     type="file",
-                    dataset_id=ea.source_dataset_id,
-                    dataset_version=ea.source_dataset_version,
-                    path=MetadataPath(extracted_path),
-                    extractor_name=ea.extractor_name,
-                    extractor_version="un-versioned",
-                    extraction_parameter=ea.extraction_parameter,
-                    extraction_time=time.time(),
-                    agent_name=ea.agent_name,
-                    agent_email=ea.agent_email,
-                    extracted_metadata=metadata
-                ))
+                    path=str(result.get("path", ea.source_dataset.path)),
+                    message=result.get("message", ""))
+
+    elif issubclass(ea.extractor_class, BaseMetadataExtractor):
+
+        repo_path = ea.source_dataset.repo.pathobj
+        if ea.extractor_class.NEEDS_CONTENT:
+            ensure_legacy_path_availability(
+                ea,
+                [str(path) for path in file_status])
+
+        extractor = ea.extractor_class(
+            ea.source_dataset,
+            [str(path.relative_to(repo_path)) for path in file_status])
+        _, file_result = extractor.get_metadata(False, True)
+
+        for extracted_path, metadata in file_result:
+            yield _legacy_file_result(
+                ea,
+                _get_legacy_file_tree_path(ea.source_dataset, extracted_path),
+                "un-versioned",
+                metadata)
 
     else:
         raise ValueError(
@@ -1,14 +1,48 @@
 """
 Common functionality for external extractor shells
+
+External extractors are either executed once per query, i.e. with one of
+the command line options "--get-uuid", "--get-version", etc., or, if the
+parameter "serve" is "True", as a long-lived co-process that is started
+with the option "--serve". A co-process is started once per worker and
+command, and is used by all extractor instances with the same command.
+
+A co-process reads JSON-serialized requests from stdin, one request per
+line, and writes one JSON-serialized response per line to stdout:
+
+    request:  {"request": <name>[, "arguments": [...]][, "output": <path>]}
+    response: {"status": "ok", "result": <JSON value>}
+              {"status": "error", "message": <string>}
+
+Supported request names are "get-uuid", "get-version",
+"get-data-output-category", "is-content-required", "get-required", and
+"extract". The "arguments" of "get-required" and "extract" are identical to
+the positional arguments of the respective command line options. For
+output category FILE and DIRECTORY, "output" contains the path of the
+output file or directory. The co-process terminates when stdin is closed.
+
+After starting the co-process, a "get-uuid" request is sent as handshake.
+If the co-process cannot be started, does not answer the handshake within
+`ExternalExtractorServer.startup_timeout` seconds, or does not respond
+properly, the one-shot command line protocol is used.
+
+A co-process is terminated and reaped when it is closed, at the latest when
+the worker exits. Its CPU time is only included in the resource usage of
+terminated child processes after it was reaped.
 """
+import atexit
+import json
 import logging
+import queue
 import subprocess
+import threading
 from typing import (
     Any,
     Dict,
     IO,
     List,
     Optional,
+    Tuple,
     Union,
 )
 from uuid import UUID
@@ -22,6 +56,170 @@ from .base import (
 lgr = logging.getLogger('datalad.metadata.extractors.external')
 
 
+class ExternalExtractorServerError(RuntimeError):
+    pass
+
+
+class ExternalExtractorServer:
+    """ Client side of a long-lived external extractor co-process """
+
+    # Capability queries, whose results do not depend on the arguments and
+    # are therefore only queried once per co-process.
+    capability_requests = (
+        "get-uuid",
+        "get-version",
+        "get-data-output-category",
+        "is-content-required",
+    )
+
+    # Seconds to wait for the response to the startup handshake
+    startup_timeout = 10
+
+    def __init__(self, command: List[str]):
+        self.command = command
+        self.lock = threading.Lock()
+        self.capabilities = dict()
+        self.process = subprocess.Popen(
+            command + ["--serve"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            bufsize=1)
+        try:
+            self._handshake()
+        except ExternalExtractorServerError:
+            self.close(timeout=0)
+            raise
+
+    def _handshake(self):
+        # Read the response in a helper thread, because a command that does
+        # not support the serve protocol might neither answer nor exit.
+        responses = queue.Queue()
+        reader = threading.Thread(
+            target=lambda: responses.put(self._try_request("get-uuid")),
+            daemon=True)
+        reader.start()
+        try:
+            error = responses.get(timeout=self.startup_timeout)
+        except queue.Empty:
+            raise ExternalExtractorServerError(
+                f"{self.command} --serve did not respond within "
+                f"{self.startup_timeout} seconds")
+        if error is not None:
+            raise error
+
+    def _try_request(self,
+                     request: str
+                     ) -> Optional[ExternalExtractorServerError]:
+        try:
+            self.request(request)
+        except (ExternalExtractorServerError, RuntimeError) as e:
+            return ExternalExtractorServerError(str(e))
+        return None
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def request(self,
+                request: str,
+                arguments: Optional[List[str]] = None,
+                output: Optional[str] = None) -> Any:
+
+        if request in self.capability_requests \
+                and request in self.capabilities:
+            return self.capabilities[request]
+
+        message = {
+            "request": request,
+            **({"arguments": arguments} if arguments is not None else {}),
+            **({"output": output} if output is not None else {})}
+
+        with self.lock:
+            try:
+                self.process.stdin.write(json.dumps(message) + "\n")
+                self.process.stdin.flush()
+                line = self.process.stdout.readline()
+            except (BrokenPipeError, OSError) as e:
+                raise ExternalExtractorServerError(
+                    f"communication with {self.command} --serve failed: {e}")
+
+        if not line:
+            raise ExternalExtractorServerError(
+                f"{self.command} --serve terminated unexpectedly")
+        try:
+            response = json.loads(line)
+        except json.JSONDecodeError:
+            raise ExternalExtractorServerError(
+                f"unexpected response from {self.command} --serve: {line}")
+        if not isinstance(response, dict) or "status" not in response:
+            raise ExternalExtractorServerError(
+                f"unexpected response from {self.command} --serve: {line}")
+        if response["status"] != "ok":
+            raise RuntimeError(
+                f"{self.command} --serve failed to process {message}: "
+                f"{response.get('message', '')}")
+
+        result = response.get("result", None)
+        if request in self.capability_requests:
+            self.capabilities[request] = result
+        return result
+
+    def close(self, timeout: float = 10):
+        """ Terminate the co-process and reap it """
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+# Co-processes of this worker, indexed by command. A value of None indicates
+# that the command does not support the serve protocol.
+_servers: Dict[Tuple[str, ...], Optional[ExternalExtractorServer]] = dict()
+_servers_lock = threading.Lock()
+
+
+def get_server(command: List[str]) -> Optional[ExternalExtractorServer]:
+    """ Get a running co-process for the command, start it if necessary """
+
+    key = tuple(command)
+    with _servers_lock:
+        if key in _servers:
+            server = _servers[key]
+            if server is None or server.is_alive():
+                return server
+            server.close()
+        try:
+            server = ExternalExtractorServer(command)
+        except (OSError, ExternalExtractorServerError) as e:
+            lgr.warning(
+                f"cannot start {command} --serve ({e}), using one-shot "
+                f"protocol")
+            server = None
+        _servers[key] = server
+        return server
+
+
+def disable_server(command: List[str]):
+    key = tuple(command)
+    with _servers_lock:
+        server = _servers.get(key, None)
+        if server is not None:
+            server.close()
+        _servers[key] = None
+
+
+@atexit.register
+def close_servers():
+    with _servers_lock:
+        for server in _servers.values():
+            if server is not None:
+                server.close()
+        _servers.clear()
+
+
 class ExternalExtractor:
 
     known_extractor_types = ("dataset", "file")
@@ -52,6 +250,7 @@ class ExternalExtractor:
         )
 
         self.command_arguments = parameter.get("arguments", [])
+        self.serve = str(self.parameter.get("serve", "False")).lower() == "true"
 
         self.extractor_id = (
             UUID(provided_extractor_id)
@@ -60,42 +259,76 @@ class ExternalExtractor:
 
         self.required_content_acquired = False
 
-    def _execute(self, args: List[str]) -> str:
+    def _get_command_head(self) -> List[str]:
         if isinstance(self.external_command, list):
-            head = self.external_command
+            return self.external_command
         elif isinstance(self.external_command, str):
-            head = [self.external_command]
-        else:
-            raise ValueError(
-                f"Unsupported type for command: {type(self.external_command)}")
+            return [self.external_command]
+        raise ValueError(
+            f"Unsupported type for command: {type(self.external_command)}")
 
+    def _execute(self, args: List[str]) -> str:
         return subprocess.run(
-            head + args,
+            self._get_command_head() + args,
             check=True,
             stdout=subprocess.PIPE).stdout.decode().strip()
 
     def _execute_redirect(self, args: List[str], output: IO):
         subprocess.run(
-            [self.external_command] + args,
+            self._get_command_head() + args,
             check=True,
             stdout=output)
 
+    def _get_server(self) -> Optional[ExternalExtractorServer]:
+        if not self.serve:
+            return None
+        server = get_server(self._get_command_head() + self.command_arguments)
+        if server is None:
+            self.serve = False
+        return server
+
+    def _serve(self,
+               request: str,
+               arguments: Optional[List[str]] = None,
+               output: Optional[str] = None
+               ) -> Tuple[bool, Any]:
+        """ Process a request in the co-process, if serve mode is enabled
+
+        Returns a tuple, the first element is True, if the request was
+        processed by the co-process, the second element contains the result.
+        """
+        server = self._get_server()
+        if server is None:
+            return False, None
+        try:
+            return True, server.request(request, arguments, output)
+        except ExternalExtractorServerError as e:
+            lgr.warning(f"{e}, falling back to one-shot protocol")
+            disable_server(server.command)
+            self.serve = False
+            return False, None
+
+    def _query(self, request: str) -> str:
+        served, result = self._serve(request)
+        if served:
+            return str(result)
+        return self._execute(self.command_arguments + ["--" + request])
+
     def get_id(self) -> UUID:
         if self.extractor_id is None:
-            self.extractor_id = UUID(self._execute(self.command_arguments + ["--get-uuid"]))
+            self.extractor_id = UUID(self._query("get-uuid"))
         return self.extractor_id
 
     def get_version(self) -> str:
         if self.version is None:
-            self.version = self._execute(self.command_arguments + ["--get-version"])
+            self.version = self._query("get-version")
         return self.version
 
     def get_data_output_category(self) -> DataOutputCategory:
         if self.data_output_category is None:
-            category = self._execute(self.command_arguments + ["--get-data-output-category"])
+            category = self._query("get-data-output-category")
             if category == "DIRECTORY":
                 self.data_output_category = DataOutputCategory.DIRECTORY
-                raise NotImplementedError
             elif category == "FILE":
                 self.data_output_category = DataOutputCategory.FILE
             elif category == "IMMEDIATE":
@@ -114,7 +347,22 @@ class ExternalExtractor:
         args = self.command_arguments + ["--extract"] + self._get_args()
         output_category = self.get_data_output_category()
 
-        if output_category == DataOutputCategory.IMMEDIATE:
+        served, immediate_data = self._serve(
+            "extract",
+            self._get_args(),
+            (
+                None
+                if output_category == DataOutputCategory.IMMEDIATE
+                else str(getattr(file_or_name, "name", file_or_name))))
+
+        if served:
+            lgr.debug(
+                f"processed extract request in '{self.external_command} "
+                f"--serve' in {output_category.name} mode")
+            if output_category != DataOutputCategory.IMMEDIATE:
+                immediate_data = None
+
+        elif output_category == DataOutputCategory.IMMEDIATE:
 
             lgr.debug(
                 f"calling '{self.external_command} {' '.join(args)}' "
@@ -131,7 +379,18 @@ class ExternalExtractor:
 
         elif output_category == DataOutputCategory.DIRECTORY:
 
-            raise NotImplementedError
+            # The output directory is passed as additional last argument.
+            # The external extractor should write its output into this
+            # directory.
+            args = args + [str(file_or_name)]
+            lgr.debug(
+                f"calling '{self.external_command} {' '.join(args)}' "
+                f"in DIRECTORY mode")
+            self._execute(args)
+            immediate_data = None
+
+        else:
+            raise ValueError(f"unknown output category: {output_category}")
 
         return ExtractorResult(
             extractor_version=self.get_version(),
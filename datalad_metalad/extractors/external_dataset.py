@@ -39,6 +39,8 @@ class ExternalDatasetExtractor(ExternalExtractor, DatasetMetadataExtractor):
 
     def get_required_content(self) -> bool:
         if self.required_content_acquired is False:
-            self._execute(["--get-required"] + self._get_args())
+            served, _ = self._serve("get-required", self._get_args())
+            if not served:
+                self._execute(["--get-required"] + self._get_args())
             self.required_content_acquired = True
         return self.required_content_acquired
@@ -41,7 +41,7 @@ class ExternalFileExtractor(ExternalExtractor, FileMetadataExtractor):
 
     def is_content_required(self) -> bool:
         if self.content_required is None:
-            required = self._execute(self.command_arguments + ["--is-content-required"])
+            required = self._query("is-content-required")
             if required not in ("True", "False"):
                 raise ValueError(
                     f"expected 'True' or 'False' from {self.external_command} "
@@ -9,7 +9,6 @@
 """
 Run a metadata filter on a set of metadata elements
 """
-import json
 import logging
 from pathlib import Path
 import sys
@@ -40,6 +39,7 @@ from datalad.support.constraints import (
 from datalad.support.param import Parameter
 from datalad.ui import ui
 
+from . import jsoncodec
 from .dump import (
     dump_from_dataset_tree,
     dump_from_uuid_set,
@@ -258,7 +258,7 @@ class Filter(Interface):
                 else {}
             )
 
-            ui.message(json.dumps({
+            ui.message(jsoncodec.dumps({
                 **metadata_record,
                 **path,
                 **dataset_path,
@@ -267,7 +267,7 @@ class Filter(Interface):
 
         context = res.get("context")
         if context is not None:
-            ui.message(json.dumps(context))
+            ui.message(jsoncodec.dumps(context))
 
 
 def run_filter(filter_name: str,
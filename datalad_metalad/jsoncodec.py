@@ -0,0 +1,178 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""
+JSON encoding and decoding of metadata records.
+
+Metadata records are serialized with the JSON codec of the standard library
+by default. A faster codec, i.e. "orjson" or "ujson", can be selected with
+the configuration variable "datalad.metalad.jsoncodec", e.g. by setting the
+environment variable DATALAD_METALAD_JSONCODEC.
+
+Fast codecs decode to the same values as the standard library: input that
+they reject, e.g. NaN, and input with integers that might exceed 64 bit,
+which "orjson" decodes to floats, is decoded with the standard library.
+Values that they cannot encode, or would encode differently, e.g. integers
+that exceed 64 bit and non-finite floats, are encoded with the standard
+library. Their output differs from the output of the standard library in
+formatting, e.g. "orjson" does not insert whitespace after separators,
+and they encode some objects that the standard library rejects, e.g.
+"orjson" encodes UUIDs as strings.
+"""
+import json
+import logging
+import math
+import re
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Union,
+)
+
+from datalad import cfg
+
+from .metadatatypes import JSONType
+
+
+lgr = logging.getLogger("datalad.metadata.jsoncodec")
+
+codec_names = ("json", "orjson", "ujson")
+
+default_codec_name = "json"
+
+# Every codec raises a ValueError-subclass on invalid input
+JSONDecodeError = ValueError
+
+# Integers with at least 19 digits might exceed 64 bit. The pattern might
+# also match digits in strings, which only leads to unnecessary fallbacks.
+_large_integer_pattern = re.compile(r"\d{19}")
+_large_integer_pattern_bytes = re.compile(rb"\d{19}")
+
+
+class JSONCodec:
+    def __init__(self,
+                 name: str,
+                 encode: Callable[[Any], str],
+                 decode: Callable[[Union[str, bytes]], JSONType]):
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return self.encode(obj)
+        except (TypeError, OverflowError):
+            return json.dumps(obj)
+
+    def loads(self, json_string: Union[str, bytes]) -> JSONType:
+        return self.decode(json_string)
+
+
+class FastJSONCodec(JSONCodec):
+    """ A codec that falls back to the standard library for special values """
+
+    def dumps(self, obj: Any) -> str:
+        json_string = super().dumps(obj)
+        if "null" in json_string and _contains_non_finite_float(obj):
+            return json.dumps(obj)
+        return json_string
+
+    def loads(self, json_string: Union[str, bytes]) -> JSONType:
+        pattern = (
+            _large_integer_pattern_bytes
+            if isinstance(json_string, bytes)
+            else _large_integer_pattern)
+        if pattern.search(json_string):
+            return json.loads(json_string)
+        try:
+            return self.decode(json_string)
+        except ValueError:
+            # The standard library accepts NaN and Infinity
+            return json.loads(json_string)
+
+
+def _contains_non_finite_float(obj: Any) -> bool:
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(map(_contains_non_finite_float, obj.values()))
+    if isinstance(obj, (list, tuple)):
+        return any(map(_contains_non_finite_float, obj))
+    return False
+
+
+def _create_orjson_codec() -> JSONCodec:
+    import orjson
+
+    def encode(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    return FastJSONCodec("orjson", encode, orjson.loads)
+
+
+def _create_ujson_codec() -> JSONCodec:
+    import ujson
+
+    def encode(obj: Any) -> str:
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+    return FastJSONCodec("ujson", encode, ujson.loads)
+
+
+def _create_json_codec() -> JSONCodec:
+    return JSONCodec("json", json.dumps, json.loads)
+
+
+_codec_factories: Dict[str, Callable[[], JSONCodec]] = {
+    "orjson": _create_orjson_codec,
+    "ujson": _create_ujson_codec,
+    "json": _create_json_codec,
+}
+
+_codec: Optional[JSONCodec] = None
+
+
+def get_codec(name: Optional[str] = None) -> JSONCodec:
+    """ Get the codec with the given name, or the selected codec
+
+    If no name is given, the codec that is configured in
+    "datalad.metalad.jsoncodec" is returned, or, if none is configured, the
+    codec of the standard library.
+    """
+    global _codec
+
+    if name is not None:
+        if name not in _codec_factories:
+            raise ValueError(
+                f"unknown JSON codec: {name}, known codecs are: "
+                f"{', '.join(codec_names)}")
+        return _codec_factories[name]()
+
+    if _codec is None:
+        configured_name = cfg.get(
+            "datalad.metalad.jsoncodec",
+            default_codec_name)
+        try:
+            _codec = get_codec(configured_name)
+        except ImportError:
+            lgr.warning(
+                f"configured JSON codec {configured_name} is not available, "
+                f"using {default_codec_name}")
+            _codec = get_codec(default_codec_name)
+        lgr.debug(f"using JSON codec {_codec.name}")
+    return _codec
+
+
+def dumps(obj: Any) -> str:
+    return get_codec().dumps(obj)
+
+
+def loads(json_string: Union[str, bytes]) -> JSONType:
+    return get_codec().loads(json_string)
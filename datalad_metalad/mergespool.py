@@ -0,0 +1,195 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""
+Merge spooled metadata records into a metadata store
+"""
+import logging
+from os import curdir
+from typing import (
+    Optional,
+    Union,
+)
+
+from datalad.distribution.dataset import (
+    Dataset,
+    EnsureDataset,
+    datasetmethod,
+)
+from datalad.interface.base import (
+    Interface,
+    build_doc,
+    eval_results,
+)
+from datalad.support.constraints import (
+    EnsureChoice,
+    EnsureInt,
+    EnsureNone,
+    EnsureStr,
+)
+from datalad.support.param import Parameter
+
+from .add import (
+    add_finite_set,
+    add_policies,
+)
+from .spool import (
+    SpoolWriter,
+    claim_spool_files,
+    failed_suffix,
+    read_spool_files,
+    release_spool_files,
+)
+from .utils import check_dataset
+
+
+__docformat__ = "restructuredtext"
+
+lgr = logging.getLogger("datalad.metadata.mergespool")
+
+# Spooled records are written to the metadata store in batches of this size
+merge_batch_size = 100000
+
+
+@build_doc
+class MergeSpool(Interface):
+    r"""Merge spooled metadata records into a metadata store
+
+    This command adds all metadata records that were spooled by
+    "meta-add --spool-dir" into the metadata store of a dataset. Only spool
+    files that were completely written are merged. The spool files are
+    claimed by the merger, i.e. concurrent mergers do not merge the same
+    spool file twice. Spool files are removed after their records were
+    written to the metadata store. Records that could not be added, e.g.
+    due to a dataset ID mismatch, are written to a new spool file with the
+    suffix ".jsonl.failed". They are merged again after the file was renamed
+    to ".jsonl". If the merge is stopped early, e.g. due to
+    "--on-failure stop", the records that were not yet merged are written to
+    a new spool file. If any other error occurs, the claimed spool files are
+    returned to the spool.
+
+    The metadata store is locked only while the records are merged, and the
+    records are written in large batches.
+    """
+
+    _examples_ = [
+        dict(
+            text='Merge all records that were spooled to "/tmp/spool" into '
+                 'the metadata store of the dataset in the current directory',
+            code_cmd="datalad meta-merge-spool /tmp/spool"),
+    ]
+
+    result_renderer = "generic"
+
+    _params_ = dict(
+        spool_dir=Parameter(
+            args=("spool_dir",),
+            metavar="SPOOL_DIR",
+            doc="""directory that contains the spool files, i.e. the
+            directory that was given as --spool-dir to meta-add.""",
+            constraints=EnsureStr()),
+        dataset=Parameter(
+            args=("-d", "--dataset"),
+            doc=""""dataset to which the spooled metadata should be added. If
+            not provided, the dataset is assumed to be given by the current
+            directory.""",
+            constraints=EnsureDataset() | EnsureNone()),
+        allow_id_mismatch=Parameter(
+            args=("-i", "--allow-id-mismatch",),
+            action='store_true',
+            doc="""Allow insertion of metadata, even if the "dataset-id" in
+            the spooled records does not match the ID of the target
+            dataset.""",
+            default=False),
+        max_cache_size=Parameter(
+            args=("--max-cache-size",),
+            doc=f"""The number of records after which the merged metadata is
+            written to the metadata store and released from memory
+            (default: {merge_batch_size}).""",
+            constraints=EnsureInt() | EnsureNone()),
+        add_policy=Parameter(
+            args=("--add-policy",),
+            doc="""Determine how extractor runs with an already stored
+            configuration are handled, see "meta-add --add-policy"
+            (default: "replace-latest").""",
+            constraints=EnsureChoice(*add_policies),
+            default="replace-latest"))
+
+    @staticmethod
+    @datasetmethod(name="meta_merge_spool")
+    @eval_results
+    def __call__(
+            spool_dir: str,
+            dataset: Optional[Union[str, Dataset]] = None,
+            allow_id_mismatch: bool = False,
+            max_cache_size: Optional[int] = None,
+            add_policy: str = "replace-latest"):
+
+        dataset = check_dataset(dataset or curdir, "merge spooled metadata")
+
+        claimed_paths = claim_spool_files(spool_dir)
+        if not claimed_paths:
+            lgr.info(f"no spool files to merge in {spool_dir}")
+            return
+
+        lgr.debug(f"merging spool files: {claimed_paths}")
+
+        # add_finite_set yields the results of a record before it reads the
+        # next record. The current record is therefore the record of the
+        # current result.
+        current_record = None
+
+        def read_records():
+            nonlocal current_record
+            for current_record in read_spool_files(claimed_paths):
+                yield current_record
+
+        records = read_records()
+        failed_writer = SpoolWriter(spool_dir, failed_suffix)
+
+        # Spooled records are already checked and combined with their
+        # additional values. Unknown keys were accepted when the records
+        # were spooled.
+        results = add_finite_set(
+            records,
+            {},
+            dataset,
+            allow_override=False,
+            allow_unknown=True,
+            allow_id_mismatch=allow_id_mismatch,
+            flush_interval=max_cache_size or merge_batch_size,
+            add_policy=add_policy)
+        try:
+            for result in results:
+                if result["status"] in ("error", "impossible"):
+                    failed_writer.write(current_record)
+                yield result
+        except GeneratorExit:
+            # The records that were reported are kept in the metadata store,
+            # the remaining records are returned to the spool.
+            results.close()
+            with SpoolWriter(spool_dir) as remaining_writer:
+                for record in records:
+                    remaining_writer.write(record)
+            failed_writer.close()
+            for path in claimed_paths:
+                path.unlink()
+            raise
+        except BaseException:
+            failed_writer.discard()
+            release_spool_files(claimed_paths)
+            raise
+
+        failed_path = failed_writer.close()
+        if failed_path is not None:
+            lgr.warning(
+                f"{failed_writer.record_count} spooled records could not be "
+                f"merged, they were written to {failed_path}")
+
+        for path in claimed_paths:
+            path.unlink()
@@ -1,4 +1,3 @@
-import json
 from dataclasses import (
     dataclass,
     asdict,
@@ -15,6 +14,7 @@ from uuid import UUID
 from dataladmetadatamodel.metadatapath import MetadataPath
 
 from . import JSONType
+from .. import jsoncodec
 from .result import (
     Result,
     ACTION,
@@ -89,7 +89,7 @@ class MetadataRecord:
         return result
 
     def as_json_str(self):
-        return json.dumps(self.as_json_obj())
+        return jsoncodec.dumps(self.as_json_obj())
 
     @classmethod
     def from_json(cls, json_obj):
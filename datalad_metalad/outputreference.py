@@ -0,0 +1,349 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""
+Handle FILE- and DIRECTORY-category extractor output by reference.
+
+Extractors with the output category FILE or DIRECTORY write their output
+into a temporary file or directory. Instead of reading the output into
+memory, meta-extract emits an output reference as extracted metadata, i.e.:
+
+    {
+        "@type": "datalad-metalad-output-reference",
+        "output_category": "FILE" | "DIRECTORY",
+        "location": <path of the output file or directory>,
+        "temporary": <true if the location should be removed after storage>
+    }
+
+meta-add streams the referenced file or directory into the git object store
+of the metadata store, as blob or as tree, and replaces "location" and
+"temporary" by "git_object", which contains the hash of the stored object.
+
+Output locations are created in a private output directory of the current
+user in the temporary directory. meta-add only accepts output references
+whose location is an entry of this directory, i.e. it does not read, or
+remove, any other file or directory. Outputs that are not added to a
+metadata store, e.g. because meta-add reported an error for their record,
+are removed when they are older than `max_output_age` seconds.
+"""
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import time
+from pathlib import Path
+from typing import (
+    IO,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from dataladmetadatamodel.mapper.gitmapper.gitbackend.subprocess import (
+    checked_execute,
+    git_command_line,
+    git_save_file_list,
+    git_save_tree,
+)
+from dataladmetadatamodel.mapper.gitmapper.objectreference import (
+    add_blob_reference,
+    add_tree_reference,
+)
+
+from .extractors.base import DataOutputCategory
+from .metadatatypes import JSONType
+
+
+lgr = logging.getLogger("datalad.metadata.outputreference")
+
+output_reference_type = "datalad-metalad-output-reference"
+
+output_prefix = "datalad-metalad-output-"
+
+# Age in seconds after which outputs that were not added are removed
+max_output_age = 7 * 24 * 60 * 60
+
+# Minimal interval in seconds between two searches for expired outputs
+expiry_check_interval = 60 * 60
+
+
+def create_output_location(output_category: DataOutputCategory
+                           ) -> Tuple[Optional[Union[IO, str]], Optional[dict]]:
+    """ Create a temporary output location for the given output category
+
+    Returns a tuple with the output location that should be passed to the
+    extractor, and the output reference for the location. For the output
+    category IMMEDIATE both elements are None.
+    """
+    if output_category not in (DataOutputCategory.FILE,
+                               DataOutputCategory.DIRECTORY):
+        return None, None
+
+    output_directory = get_output_directory()
+    remove_expired_outputs(output_directory)
+
+    if output_category == DataOutputCategory.FILE:
+        handle, path = tempfile.mkstemp(
+            prefix=output_prefix,
+            dir=output_directory)
+        # Re-open by path, in order to provide the path in the "name"
+        # attribute of the returned file object.
+        os.close(handle)
+        return (
+            open(path, "w+b"),
+            create_output_reference(output_category, path, True))
+
+    path = tempfile.mkdtemp(prefix=output_prefix, dir=output_directory)
+    return (
+        path,
+        create_output_reference(output_category, path, True))
+
+
+def get_output_directory() -> Path:
+    """ Get the output directory of the current user, create it if necessary
+
+    The directory is only accessible by the current user. An existing
+    directory is only used if it is not a symlink, if it is owned by the
+    current user, and if it is not writable by other users.
+    """
+    user_id = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    output_directory = Path(tempfile.gettempdir()) / f"{output_prefix}{user_id}"
+    output_directory.mkdir(mode=0o700, exist_ok=True)
+
+    directory_stat = output_directory.lstat()
+    if not stat.S_ISDIR(directory_stat.st_mode) \
+            or directory_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH) \
+            or (hasattr(os, "getuid") and directory_stat.st_uid != os.getuid()):
+        raise RuntimeError(
+            f"refusing to use output directory {output_directory}, it is not "
+            f"a private directory of the current user")
+    return output_directory
+
+
+def remove_expired_outputs(output_directory: Path):
+    """ Remove outputs that are older than max_output_age
+
+    The output directory is searched at most once every
+    expiry_check_interval seconds.
+    """
+    marker = output_directory / ".last-expiry-check"
+    now = time.time()
+    try:
+        if now - marker.stat().st_mtime < expiry_check_interval:
+            return
+    except FileNotFoundError:
+        pass
+    marker.touch()
+
+    for entry in os.scandir(output_directory):
+        if not entry.name.startswith(output_prefix):
+            continue
+        try:
+            if now - entry.stat(follow_symlinks=False).st_mtime < max_output_age:
+                continue
+        except FileNotFoundError:
+            continue
+        lgr.debug(f"removing expired output {entry.path}")
+        _remove_location(Path(entry.path))
+
+
+def get_output_location(output_reference: dict) -> Path:
+    """ Get the location of an output reference
+
+    :raise ValueError: if the location is not an entry of the output
+        directory of the current user
+    """
+    location = Path(output_reference["location"])
+    output_directory = get_output_directory()
+    if not location.name.startswith(output_prefix) \
+            or location.is_symlink() \
+            or location.resolve().parent != output_directory.resolve():
+        raise ValueError(
+            f"output reference location {location} is not an output "
+            f"location in {output_directory}")
+    return location
+
+
+def check_output_reference(extracted_metadata: JSONType):
+    """ Check the location of an unstored output reference
+
+    :raise ValueError: if extracted_metadata is an output reference with an
+        invalid location
+    """
+    if is_output_reference(extracted_metadata) \
+            and "location" in extracted_metadata:
+        get_output_location(extracted_metadata)
+
+
+def create_output_reference(output_category: DataOutputCategory,
+                            location: Union[str, Path],
+                            temporary: bool = False
+                            ) -> dict:
+    return {
+        "@type": output_reference_type,
+        "output_category": output_category.name,
+        "location": str(location),
+        "temporary": temporary,
+    }
+
+
+def is_output_reference(extracted_metadata: JSONType) -> bool:
+    return (
+        isinstance(extracted_metadata, dict)
+        and extracted_metadata.get("@type", None) == output_reference_type)
+
+
+def remove_output_location(output_reference: Optional[dict]):
+    """ Remove the location of a temporary output reference
+
+    Locations that are not entries of the output directory are not removed.
+    """
+    if output_reference is None \
+            or "location" not in output_reference \
+            or not output_reference.get("temporary"):
+        return
+    try:
+        location = get_output_location(output_reference)
+    except ValueError as e:
+        lgr.warning(f"not removing output: {e}")
+        return
+    _remove_location(location)
+
+
+def _remove_location(location: Path):
+    if location.is_dir() and not location.is_symlink():
+        shutil.rmtree(location, ignore_errors=True)
+    elif location.exists() or location.is_symlink():
+        location.unlink()
+
+
+def store_output_reference(metadata_store: Path,
+                           output_reference: dict
+                           ) -> dict:
+    """ Stream the referenced output into the git object store
+
+    The content of the referenced file or directory is written as blob or
+    tree into the metadata store without reading it into memory. The object
+    is registered as object reference and will therefore be persisted with
+    the next flush of object references.
+
+    Output references that have already been stored, i.e. references
+    without a location, are returned unmodified.
+
+    :raise ValueError: if the location is not an entry of the output
+        directory of the current user
+    """
+    if "location" not in output_reference:
+        return output_reference
+
+    stored_reference = _save_output(metadata_store, output_reference, True)
+    if stored_reference["output_category"] == DataOutputCategory.FILE.name:
+        add_blob_reference(stored_reference["git_object"])
+    else:
+        add_tree_reference(stored_reference["git_object"])
+
+    lgr.debug(
+        f"stored {stored_reference['output_category']} output from "
+        f"{output_reference['location']} as "
+        f"{stored_reference['git_object']} in {metadata_store}")
+
+    remove_output_location(output_reference)
+    return stored_reference
+
+
+def hash_output_reference(metadata_store: Path,
+                          output_reference: dict
+                          ) -> dict:
+    """ Determine the stored form of an output reference without storing it
+
+    The git object hash of the referenced file or directory is calculated,
+    but file content is not written into the metadata store, and the
+    location is not removed. This allows to compare unstored output with
+    stored output.
+
+    :raise ValueError: if the location is not an entry of the output
+        directory of the current user
+    """
+    if "location" not in output_reference:
+        return output_reference
+    return _save_output(metadata_store, output_reference, False)
+
+
+def _save_output(metadata_store: Path,
+                 output_reference: dict,
+                 write: bool
+                 ) -> dict:
+
+    location = get_output_location(output_reference)
+    output_category = DataOutputCategory[output_reference["output_category"]]
+    repo_dir = str(metadata_store)
+
+    if output_category == DataOutputCategory.FILE:
+        object_hash = _save_file_list(repo_dir, [str(location)], write)[0]
+    elif output_category == DataOutputCategory.DIRECTORY:
+        object_hash = _save_directory(repo_dir, location, write)
+    else:
+        raise ValueError(
+            f"unsupported output category in output reference: "
+            f"{output_category.name}")
+
+    return {
+        "@type": output_reference_type,
+        "output_category": output_category.name,
+        "git_object": object_hash,
+    }
+
+
+def _save_file_list(repo_dir: str,
+                    file_list: List[str],
+                    write: bool
+                    ) -> List[str]:
+    if write:
+        return git_save_file_list(repo_dir, file_list)
+    cmd_line = git_command_line(
+        repo_dir,
+        "hash-object",
+        ["--no-filters", "--stdin-paths"])
+    return checked_execute(cmd_line, stdin_content="\n".join(file_list))[0]
+
+
+def _save_directory(repo_dir: str, directory: Path, write: bool) -> str:
+    # Tree objects are always written, because git cannot hash a tree
+    # without writing it. They are small, and unreferenced trees are
+    # removed by git's garbage collection.
+    entries = []
+    files = []
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if entry.is_dir(follow_symlinks=False):
+            entries.append((
+                "040000",
+                "tree",
+                _save_directory(repo_dir, Path(entry.path), write),
+                entry.name))
+        elif entry.is_file(follow_symlinks=False):
+            files.append(entry)
+        else:
+            lgr.warning(f"ignoring non-regular output element {entry.path}")
+
+    if files:
+        file_hashes = _save_file_list(
+            repo_dir,
+            [entry.path for entry in files],
+            write)
+        entries.extend(
+            ("100644", "blob", file_hash, entry.name)
+            for entry, file_hash in zip(files, file_hashes))
+
+    if not entries:
+        # mktree does not accept an empty entry set with a trailing newline
+        cmd_line = git_command_line(repo_dir, "mktree", [])
+        return checked_execute(cmd_line, stdin_content="")[0][0]
+
+    return git_save_tree(repo_dir, entries)
@@ -1,10 +1,16 @@
 import enum
-from typing import Optional
+from typing import (
+    Optional,
+    Tuple,
+    Union,
+)
 from uuid import UUID
 
 
 from dataladmetadatamodel.metadatapath import MetadataPath
 
+from .mtreesearch import PatternType
+
 
 class MetadataURLScheme(enum.Enum):
     UUID = "uuid"
@@ -13,36 +19,41 @@ class MetadataURLScheme(enum.Enum):
 
 class MetadataURL:
     def __init__(self,
-                 local_path: Optional[MetadataPath],
-                 version: Optional[str] = None):
+                 local_path: Optional[Union[MetadataPath, str]],
+                 version: Optional[str] = None,
+                 pattern_type: PatternType = PatternType.glob):
 
         self.local_path = local_path
         self.version = version
+        self.pattern_type = pattern_type
 
 
 class TreeMetadataURL(MetadataURL):
     def __init__(self,
                  dataset_path: MetadataPath,
-                 local_path: Optional[MetadataPath],
-                 version: Optional[str] = None):
+                 local_path: Optional[Union[MetadataPath, str]],
+                 version: Optional[str] = None,
+                 pattern_type: PatternType = PatternType.glob):
 
-        super().__init__(local_path, version)
+        super().__init__(local_path, version, pattern_type)
         self.dataset_path = dataset_path
 
 
 class UUIDMetadataURL(MetadataURL):
     def __init__(self,
                  uuid: UUID,
-                 local_path: Optional[MetadataPath],
-                 version: Optional[str] = None):
+                 local_path: Optional[Union[MetadataPath, str]],
+                 version: Optional[str] = None,
+                 pattern_type: PatternType = PatternType.glob):
 
-        super().__init__(local_path, version)
+        super().__init__(local_path, version, pattern_type)
         self.uuid = uuid
 
 
 class MetadataURLParser(object):
     uuid_header = MetadataURLScheme.UUID.value + ":"
     tree_header = MetadataURLScheme.TREE.value + ":"
+    regex_header = "re:"
 
     uuid_string_length = 36
 
@@ -77,9 +88,15 @@ class MetadataURLParser(object):
 
     def get_path(self):
         if self.match(":"):
-            path = MetadataPath(self.get_remaining())
-            return True, path
-        return False, MetadataPath("")
+            return True, self.get_local_path()
+        return False, (MetadataPath(""), PatternType.glob)
+
+    def get_local_path(self) -> Tuple[Union[MetadataPath, str], PatternType]:
+        # Regex-paths are kept as strings, because MetadataPath would
+        # normalize components like ".", which are valid regexes.
+        if self.match(self.regex_header):
+            return self.get_remaining(), PatternType.regex
+        return MetadataPath(self.get_remaining()), PatternType.glob
 
     def parse_version(self):
         if self.match("@"):
@@ -100,14 +117,17 @@ class MetadataURLParser(object):
 
         UUID:   "uuid:" UUID-DIGITS ["@" VERSION-DIGITS] [":" [LOCAL_PATH]]
         TREE:   ["tree:"] [DATASET_PATH] ["@" VERSION-DIGITS] [":" [LOCAL_PATH]]
+
+        LOCAL_PATH is a path with shell-style wildcards. If it is prefixed
+        with "re:", its components are regular expressions.
         """
 
         # Try to parse a uuid-spec
         if self.match(MetadataURLParser.uuid_header):
             uuid = UUID(self.fetch(MetadataURLParser.uuid_string_length))
             _, version = self.parse_version()
-            _, local_path = self.get_path()
-            return UUIDMetadataURL(uuid, local_path, version)
+            _, (local_path, pattern_type) = self.get_path()
+            return UUIDMetadataURL(uuid, local_path, version, pattern_type)
 
         # Expect a tree spec
         self.match(self.tree_header)
@@ -117,17 +137,18 @@ class MetadataURLParser(object):
             dataset_path = MetadataPath(dataset_path)
             _, version = self.parse_version()
             self.match(":")
-            local_path = MetadataPath(self.get_remaining())
+            local_path, pattern_type = self.get_local_path()
         else:
             version = None
             success, dataset_path = self.fetch_upto(":")
             if success:
                 dataset_path = MetadataPath(dataset_path)
-                _, local_path = self.get_path()
+                _, (local_path, pattern_type) = self.get_path()
             else:
                 dataset_path = MetadataPath(self.get_remaining())
                 local_path = MetadataPath("")
-        return TreeMetadataURL(dataset_path, local_path, version)
+                pattern_type = PatternType.glob
+        return TreeMetadataURL(dataset_path, local_path, version, pattern_type)
 
 
 def parse_metadata_url(metadata_url: str) -> MetadataURL:
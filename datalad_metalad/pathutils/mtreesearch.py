@@ -5,15 +5,27 @@ This implementation tries to keep memory usage low by:
  - using generators
  - purging MTreeNode-objects, that are not needed anymore
 
+Nodes are mapped when they are processed, not when they are put on the
+stack. A node that was mapped by the search is purged as soon as all
+results that were yielded for it have been consumed, i.e. when the
+consumer resumes the search. At that time its children are on the stack,
+but they are not mapped yet. A depth-first search therefore holds only
+the nodes on the current path in memory, independent of the total number
+of nodes in the tree.
 """
 # TODO: unify recursive and non-recursive calls
 import enum
 import fnmatch
+import re
 from collections import deque
 from dataclasses import dataclass
 from typing import (
+    FrozenSet,
     Generator,
+    Iterable,
+    List,
     Optional,
+    Pattern,
     Tuple,
     Union,
 )
@@ -34,7 +46,13 @@ class StackItem:
     item_path: MetadataPath
     item_level: int
     node: Union[MTreeNode, MappableObject]
-    needs_purge: bool
+
+
+@dataclass(frozen=True)
+class SearchItem:
+    item_path: MetadataPath
+    pattern_positions: FrozenSet[int]
+    node: Union[MTreeNode, MappableObject]
 
 
 @dataclass(frozen=True)
@@ -44,6 +62,115 @@ class SearchResult:
     possible_contained_element_path: MetadataPath
 
 
+class PatternType(enum.Enum):
+    glob = "glob"
+    regex = "regex"
+
+
+globstar = "**"
+
+
+@dataclass(frozen=True)
+class PatternComponent:
+    """ A compiled path component of a search pattern
+
+    Literal components, i.e. components without wildcards, are matched by a
+    direct lookup in the child nodes. Components with wildcards are matched
+    against every child name. The globstar component "**" matches any
+    number of path components, including none.
+
+    In glob-patterns, components may contain shell-style wildcards. In
+    regex-patterns, every component, except "**", is a regular expression
+    that has to match the complete name of a child.
+    """
+    pattern: str
+    regex: Optional[Pattern]
+    is_globstar: bool = False
+
+    @classmethod
+    def compile(cls,
+                pattern: str,
+                pattern_type: PatternType = PatternType.glob
+                ) -> "PatternComponent":
+
+        if pattern == globstar:
+            return cls(pattern, None, True)
+        if pattern_type == PatternType.regex:
+            if re.escape(pattern) == pattern:
+                return cls(pattern, None)
+            return cls(pattern, re.compile(pattern))
+        if is_literal_component(pattern):
+            return cls(pattern, None)
+        return cls(pattern, re.compile(fnmatch.translate(pattern)))
+
+    @property
+    def is_literal(self) -> bool:
+        return self.regex is None and not self.is_globstar
+
+    def matching_children(self,
+                          node: MTreeNode
+                          ) -> Iterable[Tuple[str, MappableObject]]:
+        if self.is_globstar:
+            yield from node.child_nodes.items()
+            return
+
+        if self.regex is None:
+            child_node = node.child_nodes.get(self.pattern)
+            if child_node is not None:
+                yield self.pattern, child_node
+            return
+
+        match = self.regex.fullmatch
+        yield from (
+            (child_name, child_node)
+            for child_name, child_node in node.child_nodes.items()
+            if match(child_name))
+
+
+def is_literal_component(pattern: str) -> bool:
+    return not any(character in pattern for character in "*?[")
+
+
+def get_pattern_parts(pattern: Union[MetadataPath, str]) -> Tuple[str, ...]:
+    """ Split a pattern into components
+
+    Patterns that are given as strings, e.g. regex-patterns, are split at
+    "/". In contrast to MetadataPath, components like "." are preserved.
+    """
+    if isinstance(pattern, MetadataPath):
+        return pattern.parts
+    return tuple(part for part in pattern.split("/") if part)
+
+
+def compile_pattern(pattern: Union[MetadataPath, str],
+                    pattern_type: PatternType = PatternType.glob
+                    ) -> List[PatternComponent]:
+    return [
+        PatternComponent.compile(component, pattern_type)
+        for component in get_pattern_parts(pattern)]
+
+
+def _advance_globstars(pattern_components: List[PatternComponent],
+                       positions: Iterable[int]
+                       ) -> FrozenSet[int]:
+    # A globstar may match no path component, i.e. every position that
+    # points to a globstar also allows the position after the globstar.
+    result = set()
+    for position in positions:
+        result.add(position)
+        while position < len(pattern_components) \
+                and pattern_components[position].is_globstar:
+            position += 1
+            result.add(position)
+    return frozenset(result)
+
+
+def _get_node_to_map(node: Union[MTreeNode, MappableObject],
+                     map_leaves: bool
+                     ) -> Optional[Union[MTreeNode, MappableObject]]:
+    return node if map_leaves or isinstance(node, MTreeNode) else None
+
+
 class TraversalOrder(enum.Enum):
     depth_first_search = 0
     breadth_first_search = 1
@@ -60,35 +187,57 @@ class MTreeSearch:
         self.mtree = mtree
 
     def search_pattern(self,
-                       pattern: MetadataPath,
+                       pattern: Union[MetadataPath, str],
                        recursive: bool = False,
                        traversal_order: TraversalOrder = TraversalOrder.depth_first_search,
                        item_indicator: Optional[str] = None,
+                       pattern_type: PatternType = PatternType.glob,
+                       map_leaves: bool = True,
                        ) -> Generator[Tuple[MetadataPath, MTreeNode, Optional[MetadataPath]], None, None]:
 
         if recursive is True:
             generator_function = self._search_pattern_recursive
         else:
             generator_function = self._search_pattern
-        yield from generator_function(pattern, traversal_order, item_indicator)
+        yield from generator_function(
+            pattern,
+            traversal_order,
+            item_indicator,
+            pattern_type,
+            map_leaves=map_leaves)
 
     def _search_pattern(self,
-                        pattern: MetadataPath,
+                        pattern: Union[MetadataPath, str],
                         traversal_order: TraversalOrder = TraversalOrder.depth_first_search,
                         item_indicator: Optional[str] = None,
+                        pattern_type: PatternType = PatternType.glob,
+                        descend_into_matches: bool = True,
+                        map_leaves: bool = True,
                         ) -> Generator[Tuple[MetadataPath, MTreeNode, Optional[MetadataPath]], None, None]:
         """
         Search the tree und yield nodes that match the pattern.
 
         Parameters
         ----------
-        pattern: file name with shell-style wildcards
+        pattern: file name with shell-style wildcards, or, if pattern_type
+                 is PatternType.regex, with regular expressions as path
+                 components. In both cases, a "**"-component matches any
+                 number of path components.
         traversal_order: specify whether to use depth-first-order
                          or breadth-first-order in search
         item_indicator: a string that indicates that the current
                         mtree-node is an item in an enclosing context,
                         for example: ".datalad_metadata-root-record"
                         could indicate a dataset-node.
+        pattern_type: specify whether pattern components are shell-style
+                      wildcards or regular expressions
+        descend_into_matches: if False, nodes below a full-match are not
+                              searched, even if a "**"-component could
+                              match them.
+        map_leaves: if False, leaves, i.e. nodes that are not MTreeNodes,
+                    are yielded without mapping them. That allows to
+                    inspect matching leaves, e.g. their references, without
+                    reading them.
 
         Returns:
         -------
@@ -108,16 +257,20 @@ class MTreeSearch:
         In an item match, the first element is the MetadataPath of the
         item-node, the second element is the item node, and the third
         element is a MetadataPath containing the remaining pattern.
+
+        Only children that are matched by a pattern component are searched.
+        Subtrees that cannot contain a match are therefore never mapped.
         """
 
-        pattern_elements = pattern.parts
+        pattern_elements = get_pattern_parts(pattern)
+        pattern_components = compile_pattern(pattern, pattern_type)
+        pattern_length = len(pattern_components)
 
         to_process = deque([
-            StackItem(
+            SearchItem(
                 MetadataPath(""),
-                0,
-                self.mtree,
-                False)])
+                _advance_globstars(pattern_components, [0]),
+                self.mtree)])
 
         while to_process:
             if traversal_order == TraversalOrder.depth_first_search:
@@ -125,25 +278,30 @@ class MTreeSearch:
             else:
                 current_item = to_process.popleft()
 
-            with ensure_mapped(current_item.node):
+            # Every position in pattern_positions denotes a pattern element
+            # that has to be matched by the children of the current item.
+            # A position equal to the number of pattern elements indicates
+            # that all pattern elements were matched earlier.
+            pattern_positions = current_item.pattern_positions
 
-                # If the current item level is equal to the number of
-                # pattern elements, i.e. all pattern element were matched
-                # earlier, the current item is a valid match.
-                if len(pattern_elements) == current_item.item_level:
+            with ensure_mapped(_get_node_to_map(current_item.node, map_leaves)):
+
+                if pattern_length in pattern_positions:
+                    # The current item is a valid match.
                     yield current_item.item_path, current_item.node, None
 
-                    # There will be no further matches below the
-                    # current item, because the pattern elements are
-                    # exhausted. Go to the next item.
-                    continue
+                    # If the pattern elements are exhausted, there will
+                    # be no further matches below the current item. Go
+                    # to the next item.
+                    if not descend_into_matches or len(pattern_positions) == 1:
+                        continue
 
                 # Check for item-node, if item indicator is not None
-                if item_indicator is not None:
+                elif item_indicator is not None:
                     if isinstance(current_item.node, MTreeNode):
                         if item_indicator in current_item.node.child_nodes:
                             yield current_item.item_path, current_item.node, MetadataPath(
-                                    *pattern_elements[current_item.item_level:])
+                                    *pattern_elements[min(pattern_positions):])
 
                 # There is at least one more pattern element, try to
                 # match it against the current nodes children.
@@ -152,26 +310,53 @@ class MTreeSearch:
                     # match anything and go to the next item
                     continue
 
-                # Check whether the current pattern matches any children,
-                # if it does, add the children to `to_process`.
-                for child_name, child_mtree in current_item.node.child_nodes.items():
-                    if fnmatch.fnmatch(child_name, pattern_elements[current_item.item_level]):
-                        # If we have an item indicator, do not append the item
-                        # indicator node
-                        if item_indicator is None or item_indicator != child_name:
-                            to_process.append(
-                                StackItem(
-                                    current_item.item_path / child_name,
-                                    current_item.item_level + 1,
-                                    child_mtree,
-                                    child_mtree.ensure_mapped()
-                                )
-                            )
+                # Determine the children that are matched by any pattern
+                # element, and add them to `to_process`. Children that are
+                # matched by a globstar keep its position, other children
+                # advance to the next pattern element.
+                child_positions = dict()
+                for position in sorted(pattern_positions):
+                    if position == pattern_length:
+                        continue
+                    pattern_component = pattern_components[position]
+                    next_position = (
+                        position
+                        if pattern_component.is_globstar
+                        else position + 1)
+                    for child_name, child_mtree in pattern_component.matching_children(
+                            current_item.node):
+                        child_positions.setdefault(
+                            child_name,
+                            (child_mtree, set()))[1].add(next_position)
+
+                for child_name, (child_mtree, positions) in child_positions.items():
+                    # If we have an item indicator, do not append the item
+                    # indicator node
+                    if item_indicator is not None and item_indicator == child_name:
+                        continue
+
+                    positions = _advance_globstars(pattern_components, positions)
+
+                    # Leaves can only be full-matches, skip all other leaves
+                    # without mapping them.
+                    if not isinstance(child_mtree, MTreeNode) \
+                            and pattern_length not in positions:
+                        continue
+
+                    to_process.append(
+                        SearchItem(
+                            current_item.item_path / child_name,
+                            positions,
+                            child_mtree
+                        )
+                    )
 
     def _search_pattern_recursive(self,
-                                  pattern: MetadataPath,
+                                  pattern: Union[MetadataPath, str],
                                   traversal_order: TraversalOrder = TraversalOrder.depth_first_search,
                                   item_indicator: Optional[str] = None,
+                                  pattern_type: PatternType = PatternType.glob,
+                                  map_leaves: bool = True,
                                   ) -> Generator[Tuple[MetadataPath, MTreeNode, Optional[MetadataPath]], None, None]:
         """
         Find nodes that match the given pattern and list all nodes
@@ -182,7 +367,10 @@ class MTreeSearch:
         """
         for result in self._search_pattern(pattern,
                                            traversal_order,
-                                           item_indicator):
+                                           item_indicator,
+                                           pattern_type,
+                                           descend_into_matches=False,
+                                           map_leaves=map_leaves):
             if result[2] is not None:
                 # Do not recursively list item-matches.
                 yield result
@@ -190,21 +378,22 @@ class MTreeSearch:
                 yield from self._list_recursive(result[0],
                                                 result[1],
                                                 traversal_order,
-                                                item_indicator)
+                                                item_indicator,
+                                                map_leaves)
 
     def _list_recursive(self,
                         start_path: MetadataPath,
                         start_node: MTreeNode,
                         traversal_order: TraversalOrder = TraversalOrder.depth_first_search,
                         item_indicator: Optional[str] = None,
+                        map_leaves: bool = True,
                         ):
 
         to_process = deque([
             StackItem(
                 start_path,
                 0,
-                start_node,
-                False)])
+                start_node)])
 
         while to_process:
             if traversal_order == TraversalOrder.depth_first_search:
@@ -212,7 +401,7 @@ class MTreeSearch:
             else:
                 current_item = to_process.popleft()
 
-            with ensure_mapped(current_item.node):
+            with ensure_mapped(_get_node_to_map(current_item.node, map_leaves)):
                 # Check for item-node, if item indicator is not None
                 if isinstance(current_item.node, MTreeNode):
                     if item_indicator is not None:
@@ -227,8 +416,7 @@ class MTreeSearch:
                                 StackItem(
                                     current_item.item_path / child_name,
                                     current_item.item_level + 1,
-                                    child_node,
-                                    False
+                                    child_node
                                 )
                             )
                 else:
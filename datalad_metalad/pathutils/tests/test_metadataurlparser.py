@@ -7,6 +7,7 @@ from ..metadataurlparser import (
     MetadataURLParser,
     TreeMetadataURL,
     UUIDMetadataURL)
+from ..mtreesearch import PatternType
 
 
 class TestMetadataPathParser(unittest.TestCase):
@@ -84,3 +85,24 @@ class TestMetadataPathParser(unittest.TestCase):
 
 if __name__ == '__main__':
     unittest.main()
+
+    def test_regex_path(self):
+        parser = MetadataURLParser(r"a/b@0011:re:x/./sub-[0-9]+\.json")
+        result = parser.parse()
+        self.assertIsInstance(result, TreeMetadataURL)
+        self.assertEqual(result.version, "0011")
+        self.assertEqual(result.dataset_path, MetadataPath("a/b"))
+        self.assertEqual(result.local_path, r"x/./sub-[0-9]+\.json")
+        self.assertEqual(result.pattern_type, PatternType.regex)
+
+        parser = MetadataURLParser(
+            "uuid:00112233-0011-2233-4455-66778899aabb:re:.*")
+        result = parser.parse()
+        self.assertIsInstance(result, UUIDMetadataURL)
+        self.assertEqual(result.local_path, ".*")
+        self.assertEqual(result.pattern_type, PatternType.regex)
+
+        parser = MetadataURLParser("a:**/*.json")
+        result = parser.parse()
+        self.assertEqual(result.local_path, MetadataPath("**/*.json"))
+        self.assertEqual(result.pattern_type, PatternType.glob)
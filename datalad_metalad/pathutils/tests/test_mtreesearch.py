@@ -1,16 +1,22 @@
+import subprocess
+import tempfile
 import unittest
 from typing import (
     Any,
     List,
 )
+from unittest.mock import patch
 
 from dataladmetadatamodel.datasettree import datalad_root_record_name
+from dataladmetadatamodel.mappableobject import MappableObject
 from dataladmetadatamodel.metadata import Metadata
 from dataladmetadatamodel.metadatapath import MetadataPath
 from dataladmetadatamodel.mtreenode import MTreeNode
 
 from ..mtreesearch import (
     MTreeSearch,
+    PatternComponent,
+    PatternType,
     TraversalOrder,
 )
 
@@ -110,3 +116,216 @@ class TestTreeSearchMatching(TestMTreeSearchBase):
                 MetadataPath("dataset_0.1/dataset_0.1.2"),
                 MetadataPath("dataset_0.1")]:
             self.assertIn(expected_path, [result[0] for result in results])
+
+    def test_literal_lookup(self):
+
+        class NonIterableDict(dict):
+            def items(self):
+                raise AssertionError("children of literal component iterated")
+
+        self.mtree_search.mtree.child_nodes = NonIterableDict(
+            self.mtree_search.mtree.child_nodes)
+
+        results = list(
+            self.mtree_search.search_pattern(
+                pattern=MetadataPath("dataset_0.1/dataset_0.1.*")))
+        self.assertEqual(
+            sorted(result[0] for result in results),
+            [
+                MetadataPath("dataset_0.1/dataset_0.1.0"),
+                MetadataPath("dataset_0.1/dataset_0.1.1"),
+                MetadataPath("dataset_0.1/dataset_0.1.2")])
+
+        results = list(
+            self.mtree_search.search_pattern(
+                pattern=MetadataPath("does_not_exist/dataset_0.1.1")))
+        self.assertEqual(results, [])
+
+    def test_pattern_components(self):
+        self.assertTrue(PatternComponent.compile("a.b").is_literal)
+        for pattern in ("*.json", "a?", "[ab]", "x[!y]"):
+            self.assertFalse(PatternComponent.compile(pattern).is_literal)
+
+        tree = MTreeNode(Metadata)
+        for name in ("a.json", "b.json", "a-json", "c.txt"):
+            tree.add_child(name, Metadata())
+        self.assertEqual(
+            [
+                name
+                for name, _
+                in PatternComponent.compile("?.json").matching_children(tree)],
+            ["a.json", "b.json"])
+        self.assertEqual(
+            [
+                name
+                for name, _
+                in PatternComponent.compile("a.json").matching_children(tree)],
+            ["a.json"])
+
+
+class TestTreeSearchGlobstar(TestMTreeSearchBase):
+    def setUp(self) -> None:
+        self.path_list = [
+            MetadataPath("a.json"),
+            MetadataPath("derivatives/b.json"),
+            MetadataPath("derivatives/b.txt"),
+            MetadataPath("derivatives/x/c.json"),
+            MetadataPath("derivatives/x/y/d.json"),
+            MetadataPath("derivatives/x/y/sub-01.json"),
+            MetadataPath("derivatives/x/y/sub-aa.json"),
+            MetadataPath("raw/e.json")
+        ]
+        self.mtree_search = self.create_mtree_search_from_paths(
+            self.path_list,
+            Metadata)
+
+    def search(self, pattern, **kwargs) -> List[MetadataPath]:
+        return sorted(
+            result[0]
+            for result in self.mtree_search.search_pattern(
+                pattern=pattern,
+                **kwargs))
+
+    def test_globstar(self):
+        self.assertEqual(
+            self.search(MetadataPath("derivatives/**/*.json")),
+            [
+                MetadataPath("derivatives/b.json"),
+                MetadataPath("derivatives/x/c.json"),
+                MetadataPath("derivatives/x/y/d.json"),
+                MetadataPath("derivatives/x/y/sub-01.json"),
+                MetadataPath("derivatives/x/y/sub-aa.json")])
+
+        self.assertEqual(
+            self.search(MetadataPath("**/y")),
+            [MetadataPath("derivatives/x/y")])
+
+        self.assertEqual(
+            self.search(MetadataPath("**/**/e.json")),
+            [MetadataPath("raw/e.json")])
+
+        self.assertEqual(
+            self.search(MetadataPath("**")),
+            sorted(
+                [MetadataPath(""), MetadataPath("derivatives"),
+                 MetadataPath("derivatives/x"),
+                 MetadataPath("derivatives/x/y"), MetadataPath("raw")]
+                + self.path_list))
+
+    def test_globstar_recursive(self):
+        # Every element is reported only once, although the globstar
+        # matches nodes below other matches.
+        results = self.search(MetadataPath("derivatives/**"), recursive=True)
+        self.assertEqual(
+            results,
+            [path for path in self.path_list if path.parts[0] == "derivatives"])
+
+    def test_regex(self):
+        self.assertEqual(
+            self.search(
+                r"derivatives/**/sub-[0-9]+\.json",
+                pattern_type=PatternType.regex),
+            [MetadataPath("derivatives/x/y/sub-01.json")])
+
+        # "." is a regex that matches one character, not a path component
+        self.assertEqual(
+            self.search(
+                r"derivatives/./y",
+                pattern_type=PatternType.regex),
+            [MetadataPath("derivatives/x/y")])
+
+        self.assertEqual(
+            self.search(
+                r"derivatives/b\..*",
+                pattern_type=PatternType.regex),
+            [
+                MetadataPath("derivatives/b.json"),
+                MetadataPath("derivatives/b.txt")])
+
+        self.assertTrue(
+            PatternComponent.compile("b", PatternType.regex).is_literal)
+        self.assertFalse(
+            PatternComponent.compile("b.json", PatternType.regex).is_literal)
+
+
+class TestTreeSearchPurging(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        subprocess.run(["git", "init", "-q", self.temp_dir.name], check=True)
+
+        tree = MTreeNode(Metadata)
+        for a in range(4):
+            for b in range(4):
+                for c in range(4):
+                    tree.add_child_at(
+                        Metadata(),
+                        MetadataPath(f"d{a}/e{b}/f{c}"))
+        self.reference = tree.write_out(self.temp_dir.name)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_bounded_mapping(self):
+        mapped_objects = set()
+        read_in, purge = MappableObject.read_in, MappableObject.purge
+
+        def counting_read_in(mappable_object, *args, **kwargs):
+            if not mappable_object.mapped:
+                mapped_objects.add(id(mappable_object))
+                counting_read_in.call_count += 1
+            return read_in(mappable_object, *args, **kwargs)
+
+        def counting_purge(mappable_object):
+            mapped_objects.discard(id(mappable_object))
+            return purge(mappable_object)
+
+        # Patterns and the number of nodes that have to be read
+        for pattern, expected_reads in (
+                ("", 1 + 4 + 16 + 64),
+                ("*/*", 1 + 4 + 16 + 64),
+                ("d1/e2", 1 + 1 + 1 + 4),
+                ("d1/**", 1 + 1 + 4 + 16),
+                ("**/e2/f1", 1 + 4 + 16 + 4)):
+
+            mtree = MTreeNode(Metadata, self.temp_dir.name, self.reference)
+            counting_read_in.call_count = 0
+            max_mapped = 0
+            with \
+                    patch.object(MappableObject, "read_in", counting_read_in), \
+                    patch.object(MappableObject, "purge", counting_purge):
+
+                for path, node, _ in MTreeSearch(mtree).search_pattern(
+                        MetadataPath(pattern),
+                        recursive=True):
+                    self.assertTrue(node.mapped)
+                    max_mapped = max(max_mapped, len(mapped_objects))
+
+            # Every node is read once. At most the nodes on the current
+            # path are mapped, and all nodes are purged at the end of the
+            # search.
+            self.assertEqual(counting_read_in.call_count, expected_reads)
+            self.assertLessEqual(max_mapped, 4)
+            self.assertEqual(len(mapped_objects), 0)
+
+    def test_unmapped_leaves(self):
+        read_in = MappableObject.read_in
+        for recursive in (False, True):
+            mtree = MTreeNode(Metadata, self.temp_dir.name, self.reference)
+            with patch.object(
+                    MappableObject,
+                    "read_in",
+                    autospec=True,
+                    side_effect=read_in) as read_in_mock:
+
+                results = [
+                    (path, node.mapped)
+                    for path, node, _ in MTreeSearch(mtree).search_pattern(
+                        MetadataPath("d1/**" if recursive else "d1/*/f2"),
+                        recursive=recursive,
+                        map_leaves=False)
+                    if isinstance(node, Metadata)]
+
+            # Only the directory nodes are read
+            self.assertEqual(len(results), 16 if recursive else 4)
+            self.assertFalse(any(mapped for _, mapped in results))
+            self.assertEqual(read_in_mock.call_count, 1 + 1 + 4)
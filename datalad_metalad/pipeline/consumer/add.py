@@ -1,4 +1,3 @@
-import json
 import logging
 from dataclasses import dataclass
 from pathlib import Path
@@ -8,10 +7,18 @@ from typing import (
     cast,
 )
 
-from datalad.cmd import BatchedCommand
-from datalad.support.constraints import EnsureBool
+from datalad.support.constraints import (
+    EnsureBool,
+    EnsureChoice,
+    EnsureFloat,
+    EnsureNone,
+)
 
 from .base import Consumer
+from ...add import (
+    MetadataStoreWriter,
+    add_policies,
+)
 from ..documentedinterface import (
     DocumentedInterface,
     ParameterEntry,
@@ -59,22 +66,62 @@ class BatchAdder(Consumer):
                         be ignored (aggregate=False).""",
                 optional=True,
                 default=True,
-                constraints=EnsureBool())
+                constraints=EnsureBool()),
+            ParameterEntry(
+                keyword="add_policy",
+                help="""Determines whether extractor runs that are identical
+                        to already stored runs are skipped ("skip-identical"),
+                        or whether they replace the stored runs
+                        ("replace-latest").""",
+                optional=True,
+                default="replace-latest",
+                constraints=EnsureChoice(*add_policies)),
+            ParameterEntry(
+                keyword="max_age",
+                help="""The maximum time in seconds that added records are
+                        cached before they are written to the metadata store.
+                        The metadata store is locked while records are cached.
+                        If set to None, records are only written when the
+                        cache is full, and when consumption finishes.""",
+                optional=True,
+                default=60.0,
+                constraints=EnsureFloat() | EnsureNone())
         ]
     )
 
     def __init__(self,
                  *,
                  dataset: str = ".",
-                 aggregate: Optional[bool] = True):
+                 aggregate: Optional[bool] = True,
+                 add_policy: str = "replace-latest",
+                 max_age: Optional[float] = 60.0):
 
+        self.dataset = dataset
         self.aggregate = aggregate
-        self.batched_add = BatchedCommand(
-            ["datalad", "meta-add", "-d", dataset, "--batch-mode", "-"])
+        self.add_policy = add_policy
+        self.max_age = max_age
+        self.metadata_store_writer = None
 
     def __del__(self):
-        self.batched_add("")
-        self.batched_add.close()
+        self.finish()
+
+    def finish(self):
+        if self.metadata_store_writer is not None:
+            metadata_store_writer = self.metadata_store_writer
+            self.metadata_store_writer = None
+            metadata_store_writer.close()
+
+    def get_metadata_store_writer(self) -> MetadataStoreWriter:
+        # Records are added in-process. The writer caches modified metadata
+        # and writes it to the metadata store, and unlocks the store, when its
+        # cache is full, when the oldest cached record is older than max_age,
+        # and when consumption finishes.
+        if self.metadata_store_writer is None:
+            self.metadata_store_writer = MetadataStoreWriter(
+                self.dataset,
+                max_age=self.max_age,
+                add_policy=self.add_policy)
+        return self.metadata_store_writer
 
     def consume(self, pipeline_data: PipelineData) -> PipelineData:
 
@@ -109,20 +156,23 @@ class BatchAdder(Consumer):
             else:
                 path = ""
 
-            metadata_record_json = json.dumps({
-                **metadata_record,
-                **(additional_values or {})
-            })
+            logger.debug(f"adding {repr(metadata_record)}")
+            responses = self.get_metadata_store_writer().add(
+                metadata_record,
+                additional_values,
+                allow_override=True)
 
-            logger.debug(f"adding {repr(metadata_record_json)}")
-            response = json.loads(self.batched_add(metadata_record_json))
+            failures = [
+                response
+                for response in responses
+                if response["status"] not in ("ok", "notneeded")]
 
-            if response["status"] == "ok":
+            if not failures:
                 add_result = MetadataBatchAddResult(ResultState.SUCCESS, path)
                 pipeline_data.set_result("path", path)
             else:
                 add_result = MetadataBatchAddResult(ResultState.FAILURE, path)
-                add_result.base_error = response
+                add_result.base_error = failures[0]
             pipeline_data.add_result_list("batch_add", [add_result])
 
         return pipeline_data
@@ -31,3 +31,13 @@ class Consumer(PipelineElement, metaclass=abc.ABCMeta):
         :rtype: bool
         """
         raise NotImplementedError
+
+    def finish(self):
+        """ Finish consumption
+
+        meta-conduct calls this method once, after the last pipeline data
+        was consumed, or after the processing was stopped. Overwrite this
+        method in derived classes to write out buffered data and to release
+        resources.
+        """
+        pass
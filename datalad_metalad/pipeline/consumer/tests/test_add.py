@@ -1,7 +1,8 @@
-import json
 from pathlib import Path
 from unittest.mock import patch
 
+from datalad.tests.utils_pytest import assert_equal
+
 from ..add import BatchAdder
 
 from ...pipelinedata import (
@@ -39,18 +40,35 @@ def test_batch_adder():
     pipeline_data.add_result("dataset-traversal-record", test_record)
     pipeline_data.add_result("metadata", metadata_extractor_result)
 
-    class BatchCommandMock:
+    class MetadataStoreWriterMock:
+        def __init__(self, *args, **kwargs):
+            self.kwargs = kwargs
+            self.added = []
+            self.closed = False
+
         def close(self):
-            pass
+            self.closed = True
 
-        def __call__(self, *args, **kwargs):
-            print("__call__", args, kwargs)
-            return json.dumps({"status": "ok"})
+        def add(self, metadata_record, additional_values=None, **kwargs):
+            self.added.append((metadata_record, additional_values))
+            return [{"status": "ok", "path": "/tmp/a"}]
 
-    with patch("datalad_metalad.pipeline.consumer.add.BatchedCommand") as bc:
-        bc.return_value = BatchCommandMock()
+    with patch("datalad_metalad.pipeline.consumer.add.MetadataStoreWriter",
+               MetadataStoreWriterMock):
         batch_adder = BatchAdder(dataset="/tmp/a", aggregate=False)
         batch_adder.consume(pipeline_data)
+        assert_equal(len(batch_adder.metadata_store_writer.added), 1)
 
         batch_adder = BatchAdder(dataset="/tmp/a", aggregate=True)
         batch_adder.consume(pipeline_data)
+        assert_equal(len(batch_adder.metadata_store_writer.added), 1)
+        assert_equal(
+            pipeline_data.get_result("batch_add")[-1].state,
+            ResultState.SUCCESS)
+
+        # Cached records are written when consumption finishes
+        metadata_store_writer = batch_adder.metadata_store_writer
+        assert_equal(metadata_store_writer.kwargs["max_age"], 60.0)
+        batch_adder.finish()
+        assert_equal(metadata_store_writer.closed, True)
+        assert_equal(batch_adder.metadata_store_writer, None)
@@ -8,12 +8,26 @@ from pathlib import Path
 from typing import (
     cast,
     Dict,
+    Iterable,
+    List,
+    Optional,
 )
 
-from datalad.api import meta_add
-from datalad.support.constraints import EnsureBool
+from datalad.distribution.dataset import Dataset
+from datalad.support.constraints import (
+    EnsureBool,
+    EnsureChoice,
+    EnsureNone,
+    EnsureStr,
+)
 
 from .base import Processor
+from ...add import (
+    MetadataStoreWriter,
+    add_policies,
+    spool_finite_set,
+)
+from ...spool import get_shared_spool_writer
 from ..documentedinterface import (
     DocumentedInterface,
     ParameterEntry,
@@ -55,17 +69,45 @@ class MetadataAdder(Processor):
                         sub-dataset path must exist and contain a git-repo.""",
                 optional=True,
                 default=False,
-                constraints=EnsureBool())
+                constraints=EnsureBool()),
+            ParameterEntry(
+                keyword="add_policy",
+                help="""Determines whether extractor runs that are identical
+                        to already stored runs are skipped ("skip-identical"),
+                        or whether they replace the stored runs
+                        ("replace-latest").""",
+                optional=True,
+                default="replace-latest",
+                constraints=EnsureChoice(*add_policies)),
+            ParameterEntry(
+                keyword="spool_dir",
+                help="""If given, metadata is not added to the metadata-store,
+                        but appended to a spool file in this directory, which
+                        does not require to lock the metadata-store. Spooled
+                        metadata is added to the metadata-store with
+                        "datalad meta-merge-spool". All spooled metadata
+                        should belong to the same metadata-store. The records
+                        of all pipeline items that are processed by a worker
+                        are appended to the same spool file. It is completed
+                        after 10000 records, and when meta-conduct
+                        finishes.""",
+                optional=True,
+                default=None,
+                constraints=EnsureStr() | EnsureNone())
         ]
     )
 
     def __init__(self,
                  *,
-                 aggregate: bool = False
+                 aggregate: bool = False,
+                 add_policy: str = "replace-latest",
+                 spool_dir: Optional[str] = None
                  ):
 
         super().__init__()
         self.aggregate = aggregate
+        self.add_policy = add_policy
+        self.spool_dir = spool_dir
 
     def process(self, pipeline_data: PipelineData) -> PipelineData:
 
@@ -89,11 +131,11 @@ class MetadataAdder(Processor):
         else:
             if self.aggregate:
                 metadata_repository = dataset_traversal_record.fs_base_path
-                additional_values = json.dumps({
+                additional_values = {
                     "dataset_path": str(dataset_traversal_record.dataset_path),
                     "root_dataset_id": str(dataset_traversal_record.root_dataset_id),
                     "root_dataset_version": str(dataset_traversal_record.root_dataset_version)
-                })
+                }
             else:
                 metadata_repository = (
                     dataset_traversal_record.fs_base_path
@@ -101,6 +143,7 @@ class MetadataAdder(Processor):
                 )
                 additional_values = None
 
+        metadata_records = []
         for metadata_extractor_result in metadata_result_list:
 
             metadata_record = cast(
@@ -112,20 +155,22 @@ class MetadataAdder(Processor):
                 metadata_record["path"] = str(metadata_record["path"])
 
             logger.debug(
-                "processor.add: running meta-add with:\n"
+                "processor.add: adding metadata:\n"
                 f"metadata:\n"
                 f"{json.dumps(metadata_record)}\n"
                 f"dataset: {metadata_repository}\n"
                 f"additional_values:\n"
                 f"{json.dumps(additional_values)}\n")
 
+            metadata_records.append(metadata_record)
+
+        for add_results in self.add_records(metadata_records,
+                                            metadata_repository,
+                                            additional_values):
             result = []
-            for add_result in meta_add(metadata=metadata_record,
-                                       dataset=str(metadata_repository),
-                                       additionalvalues=additional_values,
-                                       result_renderer="disabled"):
+            for add_result in add_results:
                 path = add_result["path"]
-                if add_result["status"] == "ok":
+                if add_result["status"] in ("ok", "notneeded"):
                     md_add_result = MetadataAddResult(ResultState.SUCCESS, path)
                     pipeline_data.set_result("path", path)
                 else:
@@ -135,3 +180,31 @@ class MetadataAdder(Processor):
 
             pipeline_data.add_result_list("add", result)
         return pipeline_data
+
+    def add_records(self,
+                    metadata_records: List[Dict],
+                    metadata_repository: Path,
+                    additional_values: Optional[Dict]
+                    ) -> Iterable[List[Dict]]:
+        """ Add or spool metadata records and yield the results per record """
+
+        if self.spool_dir is not None:
+            shared_spool_writer = get_shared_spool_writer(self.spool_dir)
+            with shared_spool_writer.open() as spool_writer:
+                spool_results = list(spool_finite_set(
+                    metadata_records,
+                    additional_values or {},
+                    Dataset(str(metadata_repository)),
+                    False,
+                    False,
+                    self.spool_dir,
+                    spool_writer))
+            yield from ([spool_result] for spool_result in spool_results)
+            return
+
+        # Add all records in-process, and write them to the metadata store
+        # in one go, when the writer is closed.
+        with MetadataStoreWriter(str(metadata_repository),
+                                 add_policy=self.add_policy) as writer:
+            for metadata_record in metadata_records:
+                yield writer.add(metadata_record, additional_values)
@@ -40,12 +40,17 @@ class MetadataExtractorResult(PipelineResult):
     path: str
     context: Optional[Dict] = None
     metadata_record: Optional[Dict] = field(init=False)
+    resource_usage: Optional[Dict] = field(init=False, default=None)
 
     def to_json(self) -> Dict:
         return {
             **super().to_json(),
             "path": str(self.path),
-            "metadata_record": self.metadata_record
+            "metadata_record": self.metadata_record,
+            **(
+                {"resource_usage": self.resource_usage}
+                if self.resource_usage is not None
+                else {})
         }
 
 
@@ -125,6 +130,8 @@ class MetadataExtractor(Processor):
             else:
                 md_extractor_result = MetadataExtractorResult(ResultState.FAILURE, path)
                 md_extractor_result.base_error = extract_result
+            md_extractor_result.resource_usage = extract_result.get(
+                "resource_usage", None)
             results.append(md_extractor_result)
 
         pipeline_data.add_result_list("metadata", results)
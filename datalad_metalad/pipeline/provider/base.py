@@ -1,6 +1,7 @@
 import abc
 from typing import Iterable
 
+from ..pipelinedata import PipelineData
 from ..pipelineelement import PipelineElement
 
 
@@ -9,3 +10,24 @@ class Provider(PipelineElement, metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def next_object(self) -> Iterable:
         raise NotImplementedError
+
+    def is_saturated(self) -> bool:
+        """ Check whether the provider waits for the release of objects
+
+        meta-conduct does not request further objects from a saturated
+        provider, until enough earlier objects were released, e.g. to
+        limit the size of prefetched content.
+        """
+        return False
+
+    def release(self, pipeline_data: PipelineData):
+        """ Signal that the processing of a provider result has finished
+
+        meta-conduct calls this method for every object that was yielded
+        by `next_object`, once the object was consumed, or once its
+        processing failed.
+
+        :param PipelineData pipeline_data: The object that was yielded by
+            `next_object`.
+        """
+        pass
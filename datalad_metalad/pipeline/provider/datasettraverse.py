@@ -21,6 +21,8 @@ from datalad.distribution.dataset import (
 from datalad.support.constraints import (
     EnsureBool,
     EnsureChoice,
+    EnsureInt,
+    EnsureNone,
 )
 
 from .base import Provider
@@ -33,6 +35,7 @@ from ..pipelinedata import (
     PipelineResult,
     ResultState,
 )
+from .prefetch import ContentPrefetcher
 
 
 lgr = logging.getLogger('datalad.metadata.pipeline.provider.datasettraverse')
@@ -87,7 +90,36 @@ class DatasetTraverser(Provider):
                         well.""",
                 optional=True,
                 default=False,
-                constraints=EnsureBool())
+                constraints=EnsureBool()),
+            ParameterEntry(
+                keyword="prefetch",
+                help="""Number of items that are inspected ahead of the
+                        current item in order to fetch annexed file content
+                        that is not locally available. Content is fetched in
+                        grouped "get"-calls before the items are handed to
+                        the processors. A value of 0 disables prefetching.""",
+                optional=True,
+                default=0,
+                constraints=EnsureInt()),
+            ParameterEntry(
+                keyword="prefetch_jobs",
+                help="""Number of parallel jobs that are used to fetch
+                        content during prefetching.""",
+                optional=True,
+                default=1,
+                constraints=EnsureInt()),
+            ParameterEntry(
+                keyword="prefetch_budget",
+                help="""Maximum number of bytes of prefetched content
+                        whose items were not yet processed. No further
+                        items are fetched, once the budget is reached, until
+                        the processing of earlier items has finished. The
+                        budget is exceeded by at most the size of one file.
+                        If not given, the size of prefetched content is not
+                        limited.""",
+                optional=True,
+                default=None,
+                constraints=EnsureInt() | EnsureNone())
         ]
     )
 
@@ -95,7 +127,10 @@ class DatasetTraverser(Provider):
                  *,
                  top_level_dir: Union[str, Path],
                  item_type: str,
-                 traverse_sub_datasets: bool = False
+                 traverse_sub_datasets: bool = False,
+                 prefetch: int = 0,
+                 prefetch_jobs: int = 1,
+                 prefetch_budget: Optional[int] = None
                  ):
 
         known_types = tuple(DatasetTraverser.name_to_item_set.keys())
@@ -111,6 +146,10 @@ class DatasetTraverser(Provider):
         self.fs_base_path = Path(resolve_path(self.top_level_dir,
                                               self.root_dataset))
         self.seen = dict()
+        self.prefetcher = (
+            ContentPrefetcher(prefetch, prefetch_jobs, prefetch_budget)
+            if prefetch > 0
+            else None)
 
     def _already_visited(self, dataset: Dataset, relative_element_path: Path):
         if dataset.id not in self.seen:
@@ -218,4 +257,15 @@ class DatasetTraverser(Provider):
         return
 
     def next_object(self) -> Iterable:
-        yield from self._traverse_dataset(self.fs_base_path)
+        if self.prefetcher is None:
+            yield from self._traverse_dataset(self.fs_base_path)
+        else:
+            yield from self.prefetcher.prefetch(
+                self._traverse_dataset(self.fs_base_path))
+
+    def is_saturated(self) -> bool:
+        return self.prefetcher is not None and self.prefetcher.is_saturated()
+
+    def release(self, pipeline_data: PipelineData):
+        if self.prefetcher is not None:
+            self.prefetcher.release(pipeline_data)
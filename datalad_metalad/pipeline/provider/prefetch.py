@@ -0,0 +1,222 @@
+"""
+Prefetch annexed content for traversal results.
+
+A prefetcher looks ahead a number of items in the provider output,
+issues grouped "get"-calls for annexed file content that is not locally
+available, and hands the items on once their content is present.
+
+A group is fetched when its first item is requested. In the parallel
+processing modes of meta-conduct, the fetching overlaps with the
+processing of items that were handed on before. In sequential mode, all
+earlier items are processed before the next group is fetched, i.e. there
+is no overlap.
+
+Fetched content is accounted until its item is released, i.e. until its
+processing has finished. The prefetcher is saturated when the size of
+unreleased content reaches the budget, meta-conduct does not request
+further items from a saturated provider.
+"""
+import logging
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from datalad.distribution.dataset import Dataset
+from datalad.support.annexrepo import AnnexRepo
+
+from ..pipelinedata import (
+    PipelineData,
+    PipelineResult,
+    ResultState,
+)
+
+
+lgr = logging.getLogger('datalad.metadata.pipeline.provider.prefetch')
+
+
+class ContentPrefetcher:
+    def __init__(self,
+                 look_ahead: int,
+                 jobs: int = 1,
+                 budget: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        look_ahead: int
+          Number of provider items that are inspected before
+          content is fetched.
+        jobs: int
+          Number of parallel jobs that are used by "get".
+        budget: Optional[int]
+          Maximum number of bytes of fetched content whose items were not
+          yet released. Items of a look-ahead window are fetched in
+          consecutive groups whose content size does not exceed the
+          remaining budget. A group contains at least one item, i.e. the
+          budget is exceeded by at most the size of one file. If budget
+          is None, all items of a look-ahead window are fetched in a
+          single group, and the size of unreleased content is not
+          limited.
+        """
+        if look_ahead < 1:
+            raise ValueError(f"look_ahead must be positive, got {look_ahead}")
+        self.look_ahead = look_ahead
+        self.jobs = jobs
+        self.budget = budget
+
+        # Sizes of fetched content of items that were not yet released, by
+        # id of the pipeline data object.
+        self.unreleased: Dict[int, int] = dict()
+        self.unreleased_size = 0
+        self.lock = threading.Lock()
+
+    def is_saturated(self) -> bool:
+        with self.lock:
+            return (
+                self.budget is not None
+                and self.unreleased_size >= self.budget)
+
+    def release(self, pipeline_data: PipelineData):
+        """ Release the fetched content of a processed item """
+        with self.lock:
+            self.unreleased_size -= self.unreleased.pop(id(pipeline_data), 0)
+
+    def prefetch(self,
+                 pipeline_data_iterable: Iterable[PipelineData]
+                 ) -> Iterable[PipelineData]:
+
+        window = []
+        for pipeline_data in pipeline_data_iterable:
+            window.append(pipeline_data)
+            if len(window) >= self.look_ahead:
+                yield from self._process_window(window)
+                window = []
+        yield from self._process_window(window)
+
+    def _process_window(self,
+                        window: List[PipelineData]
+                        ) -> Iterable[PipelineData]:
+
+        if not window:
+            return
+
+        missing = self._get_missing_content(window)
+
+        # Groups are determined when they are fetched, because the
+        # remaining budget depends on the items that were released since
+        # the previous group was fetched.
+        while window:
+            with self.lock:
+                remaining_budget = (
+                    self.budget - self.unreleased_size
+                    if self.budget is not None
+                    else None)
+
+            group, group_size = [], 0
+            for pipeline_data in window:
+                size = missing.get(id(pipeline_data), (None, 0))[1]
+                if group and remaining_budget is not None \
+                        and group_size + size > remaining_budget:
+                    break
+                group.append(pipeline_data)
+                group_size += size
+
+            window = window[len(group):]
+            yield from self._fetch_group(group, missing)
+
+    def _get_missing_content(self,
+                             window: List[PipelineData]
+                             ) -> Dict[int, Tuple[Path, int]]:
+        """ Determine file items whose annexed content is not present
+
+        Returns a dictionary that maps the id of a pipeline data object to
+        the dataset path and the byte size of the missing content.
+        """
+        paths_by_dataset = defaultdict(list)
+        for pipeline_data in window:
+            traverse_result = _get_file_traverse_result(pipeline_data)
+            if traverse_result is None:
+                continue
+            dataset_path = (
+                traverse_result.fs_base_path
+                / traverse_result.dataset_path)
+            paths_by_dataset[dataset_path].append(
+                (pipeline_data, Path(traverse_result.path)))
+
+        missing = dict()
+        for dataset_path, entries in paths_by_dataset.items():
+            repo = Dataset(dataset_path).repo
+            if not isinstance(repo, AnnexRepo):
+                continue
+            annex_info = repo.get_content_annexinfo(
+                paths=[path for _, path in entries],
+                init=None,
+                eval_availability=True)
+            for pipeline_data, path in entries:
+                info = annex_info.get(path)
+                if info is None or info.get("has_content", True):
+                    continue
+                missing[id(pipeline_data)] = (
+                    dataset_path,
+                    int(info.get("bytesize", 0) or 0))
+        return missing
+
+    def _fetch_group(self,
+                     group: List[PipelineData],
+                     missing: Dict[int, Tuple[Path, int]]
+                     ) -> Iterable[PipelineData]:
+
+        paths_by_dataset = defaultdict(list)
+        for pipeline_data in group:
+            if id(pipeline_data) in missing:
+                dataset_path, size = missing[id(pipeline_data)]
+                traverse_result = _get_file_traverse_result(pipeline_data)
+                paths_by_dataset[dataset_path].append(
+                    (pipeline_data, str(traverse_result.path)))
+                with self.lock:
+                    self.unreleased[id(pipeline_data)] = size
+                    self.unreleased_size += size
+
+        for dataset_path, entries in paths_by_dataset.items():
+            lgr.debug(
+                f"prefetching {len(entries)} file(s) in dataset "
+                f"{dataset_path} with {self.jobs} job(s)")
+            failed = set()
+            for result in Dataset(dataset_path).get(
+                    path=[path for _, path in entries],
+                    get_data=True,
+                    jobs=self.jobs,
+                    on_failure="ignore",
+                    return_type="generator",
+                    result_renderer="disabled"):
+                if result.get("status", "") in ("error", "impossible"):
+                    lgr.error(
+                        f"cannot prefetch content of {result.get('path')} "
+                        f"in dataset {dataset_path}")
+                    failed.add(result.get("path"))
+
+            # Mark prefetched items, in order to allow the AutoDrop-processor
+            # to drop the content again.
+            for pipeline_data, path in entries:
+                if path not in failed:
+                    pipeline_data.set_result(
+                        "auto_get",
+                        [PipelineResult(ResultState.SUCCESS)])
+
+        yield from group
+
+
+def _get_file_traverse_result(pipeline_data: PipelineData):
+    traverse_results = pipeline_data.get_result("dataset-traversal-record")
+    if not traverse_results:
+        return None
+    traverse_result = traverse_results[0]
+    if traverse_result.type != "file" or traverse_result.path is None:
+        return None
+    return traverse_result
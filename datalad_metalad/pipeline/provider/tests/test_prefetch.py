@@ -0,0 +1,79 @@
+from pathlib import Path
+from typing import Optional
+
+from datalad.api import (
+    clone,
+    drop,
+)
+from datalad.tests.utils_pytest import (
+    assert_equal,
+    assert_false,
+    assert_true,
+    with_tempfile,
+)
+
+from ....tests.utils import create_dataset_proper
+from ..datasettraverse import DatasetTraverser
+
+
+@with_tempfile(mkdir=True)
+@with_tempfile(mkdir=True)
+def test_prefetch(origin_dir: Optional[str] = None,
+                  clone_dir: Optional[str] = None):
+
+    origin = create_dataset_proper(origin_dir)
+    file_names = [f"file_{i}.txt" for i in range(5)]
+    for file_name in file_names:
+        (Path(origin_dir) / file_name).write_text(f"content of {file_name}")
+    origin.save(result_renderer="disabled")
+
+    clone(source=origin_dir, path=clone_dir, result_renderer="disabled")
+    for file_name in file_names:
+        assert_false((Path(clone_dir) / file_name).exists())
+
+    traverser = DatasetTraverser(
+        top_level_dir=clone_dir,
+        item_type="file",
+        prefetch=2,
+        prefetch_jobs=2,
+        prefetch_budget=40)
+
+    seen = []
+    for pipeline_data in traverser.next_object():
+        traverse_result = pipeline_data.get_result("dataset-traversal-record")[0]
+        if traverse_result.path.name not in file_names:
+            continue
+        # Content must be present when the item is handed on
+        assert_true(traverse_result.path.exists())
+        assert_true(pipeline_data.get_result("auto_get") is not None)
+        seen.append(traverse_result.path.name)
+
+        # The size of unreleased prefetched content stays within the budget
+        assert_true(traverser.prefetcher.unreleased_size <= 40)
+        traverser.release(pipeline_data)
+
+    assert_equal(sorted(seen), file_names)
+
+    # Without releases, the prefetcher is saturated once the budget is
+    # reached, and exceeds the budget by at most the size of one file.
+    drop(
+        dataset=clone_dir,
+        path=[str(Path(clone_dir) / name) for name in file_names],
+        result_renderer="disabled")
+    traverser = DatasetTraverser(
+        top_level_dir=clone_dir,
+        item_type="file",
+        prefetch=5,
+        prefetch_budget=40)
+
+    fetched = []
+    for pipeline_data in traverser.next_object():
+        traverse_result = pipeline_data.get_result("dataset-traversal-record")[0]
+        if traverse_result.path.name in file_names:
+            fetched.append(traverse_result.path.name)
+        if traverser.is_saturated():
+            break
+
+    assert_equal(len(fetched), 2)
+    unreleased_size = traverser.prefetcher.unreleased_size
+    assert_true(40 <= unreleased_size <= 40 + len("content of file_0.txt"))
@@ -0,0 +1,185 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""
+Account for the resources that are used by metadata extraction.
+
+The resource usage of an extraction is reported in the key "resource_usage"
+of the datalad result dictionary, i.e.:
+
+    {
+        "wall_time": <seconds>,
+        "user_time": <CPU user time in seconds>,
+        "system_time": <CPU system time in seconds>,
+        "peak_rss_delta": <increase of the peak RSS of the process in bytes>,
+        "children_peak_rss_delta": <increase of the largest peak RSS of all
+                                    terminated child processes in bytes>,
+        "bytes_read": <number of bytes read>
+    }
+
+CPU time and bytes read are determined for the current process and for all
+terminated child processes, i.e. they cover in-process extractors as well
+as external extractor programs. The operating system only reports the peak
+RSS of the current process and the largest peak RSS of any terminated child
+process. Both values are therefore reported separately, and an increase is
+only visible if an extraction exceeds the previous maximum.
+
+All values are determined per process. If extractions run concurrently in
+threads of the same process, e.g. in meta-conduct's thread mode, the
+values of an extraction include the resources used by concurrent
+extractions, i.e. they are upper bounds.
+"""
+import logging
+import sys
+import time
+from collections import defaultdict
+from pathlib import (
+    Path,
+    PurePath,
+)
+from typing import (
+    Dict,
+    Iterable,
+    Optional,
+)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+lgr = logging.getLogger('datalad.metadata.resourceusage')
+
+resource_usage_key = "resource_usage"
+
+resource_usage_fields = (
+    "wall_time",
+    "user_time",
+    "system_time",
+    "peak_rss_delta",
+    "children_peak_rss_delta",
+    "bytes_read",
+)
+
+# Peak values are aggregated by maximum, all other values by sum
+_peak_fields = (
+    "peak_rss_delta",
+    "children_peak_rss_delta",
+)
+
+# ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else
+_maxrss_unit = 1 if sys.platform == "darwin" else 1024
+
+_proc_io_path = Path("/proc/self/io")
+
+
+def _get_bytes_read() -> Optional[int]:
+    # On Linux, the I/O counters of a process include the counters of all
+    # terminated children that have been waited for.
+    try:
+        with _proc_io_path.open() as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_resource_snapshot() -> Dict[str, float]:
+    snapshot = dict(wall_time=time.monotonic())
+    if resource is None:
+        return snapshot
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    snapshot.update(
+        user_time=own.ru_utime + children.ru_utime,
+        system_time=own.ru_stime + children.ru_stime,
+        own_maxrss=own.ru_maxrss * _maxrss_unit,
+        children_maxrss=children.ru_maxrss * _maxrss_unit)
+
+    bytes_read = _get_bytes_read()
+    snapshot["bytes_read"] = (
+        bytes_read
+        if bytes_read is not None
+        else (own.ru_inblock + children.ru_inblock) * 512)
+    return snapshot
+
+
+def get_resource_usage(start: Dict[str, float],
+                       end: Dict[str, float]
+                       ) -> Dict[str, float]:
+    """ Determine the resource usage between two snapshots """
+    usage = dict(wall_time=end["wall_time"] - start["wall_time"])
+    if "user_time" in start:
+        usage.update(
+            user_time=end["user_time"] - start["user_time"],
+            system_time=end["system_time"] - start["system_time"],
+            peak_rss_delta=end["own_maxrss"] - start["own_maxrss"],
+            children_peak_rss_delta=(
+                end["children_maxrss"] - start["children_maxrss"]),
+            bytes_read=end["bytes_read"] - start["bytes_read"])
+    return usage
+
+
+def account_resources(results: Iterable[dict]) -> Iterable[dict]:
+    """ Add resource usage to the results of an extraction generator
+
+    The resources that are used to create a result, i.e. the resources
+    used between the preceding and the current yield of `results`, are
+    added to the result dictionary. The metadata record in the result
+    is not modified.
+    """
+    start = get_resource_snapshot()
+    for result in results:
+        end = get_resource_snapshot()
+        result[resource_usage_key] = get_resource_usage(start, end)
+        yield result
+        start = get_resource_snapshot()
+
+
+class ResourceStatistics:
+    """ Aggregate resource usage per extractor and per file type """
+
+    def __init__(self):
+        self.by_extractor = defaultdict(self._new_entry)
+        self.by_file_type = defaultdict(self._new_entry)
+
+    @staticmethod
+    def _new_entry() -> Dict[str, float]:
+        return dict(count=0, **{key: 0 for key in resource_usage_fields})
+
+    @staticmethod
+    def _add(entry: Dict[str, float], usage: Dict[str, float]):
+        entry["count"] += 1
+        for key in resource_usage_fields:
+            if key in _peak_fields:
+                entry[key] = max(entry[key], usage.get(key, 0))
+            else:
+                entry[key] += usage.get(key, 0)
+
+    def add(self,
+            extractor_name: str,
+            path: Optional[str],
+            usage: Dict[str, float]):
+
+        self._add(self.by_extractor[extractor_name], usage)
+        if path is not None:
+            file_type = PurePath(path).suffix or "<none>"
+            self._add(self.by_file_type[file_type], usage)
+
+    def is_empty(self) -> bool:
+        return not self.by_extractor
+
+    def to_json(self) -> Dict:
+        return {
+            "by_extractor": dict(self.by_extractor),
+            "by_file_type": dict(self.by_file_type),
+        }
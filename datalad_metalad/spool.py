@@ -0,0 +1,225 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""
+Write-ahead spool for metadata records.
+
+Writers that would otherwise wait for the lock of a metadata store append
+their metadata records to a spool directory instead. Every writer owns a
+spool file, which does not require any locking. A spool file goes through
+the following states, which are indicated by its name suffix:
+
+    <writer-id>.jsonl.part      records are being written
+    <writer-id>.jsonl           complete, ready to be merged
+    <writer-id>.jsonl.merging   claimed by a merger
+    <writer-id>.jsonl.failed    records that a merger failed to add
+
+A spool file contains one metadata record per line. The records are checked
+and combined with additional values before they are spooled.
+
+A merger, i.e. "meta-merge-spool", claims complete spool files by renaming
+them, adds their records to the metadata store in large batches, and removes
+the spool files after the records were written. Records that could not be
+added are written to a new "*.jsonl.failed"-file, which is not merged again
+unless it is renamed to "*.jsonl". Spool files of writers that did not
+finish, i.e. "*.jsonl.part"-files, are never merged.
+
+Writers that spool small sets of records repeatedly, e.g. meta-conduct's
+MetadataAdder, use a shared spool writer, that collects the records of a
+process in one spool file.
+"""
+import atexit
+import json
+import logging
+import multiprocessing.util
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from uuid import uuid4
+
+from .metadatatypes import JSONType
+
+
+lgr = logging.getLogger("datalad.metadata.spool")
+
+spool_suffix = ".jsonl"
+partial_suffix = spool_suffix + ".part"
+merging_suffix = spool_suffix + ".merging"
+failed_suffix = spool_suffix + ".failed"
+
+# A shared spool file is completed after this number of records
+shared_spool_size = 10000
+
+
+class SpoolWriter:
+    """ Append metadata records to a spool file owned by this writer
+
+    The spool file gets the name suffix `suffix` when it is completed.
+    """
+
+    def __init__(self,
+                 spool_dir: Union[str, Path],
+                 suffix: str = spool_suffix):
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+
+        writer_id = f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex}"
+        self.path = self.spool_dir / (writer_id + suffix)
+        self.partial_path = self.spool_dir / (writer_id + partial_suffix)
+        self.spool_file = self.partial_path.open("wt")
+        self.record_count = 0
+
+    def __enter__(self) -> "SpoolWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, metadata: JSONType):
+        self.spool_file.write(json.dumps(metadata) + "\n")
+        self.record_count += 1
+
+    def close(self) -> Optional[Path]:
+        """ Complete the spool file and make it available for merging
+
+        :return: the path of the completed spool file, or None if no records
+                 were written
+        """
+        if self.spool_file.closed:
+            return self.path if self.path.exists() else None
+
+        self.spool_file.flush()
+        os.fsync(self.spool_file.fileno())
+        self.spool_file.close()
+
+        if self.record_count == 0:
+            self.partial_path.unlink()
+            return None
+
+        self.partial_path.rename(self.path)
+        lgr.debug(f"spooled {self.record_count} records to {self.path}")
+        return self.path
+
+    def discard(self):
+        """ Remove the spool file without making it available """
+        if not self.spool_file.closed:
+            self.spool_file.close()
+            self.partial_path.unlink()
+
+
+class SharedSpoolWriter:
+    """ Collect the records of all writers of a process in one spool file
+
+    The spool file is completed after `max_records` records, and when the
+    process exits, or `close_shared_spool_writers` is called.
+    """
+
+    def __init__(self,
+                 spool_dir: Union[str, Path],
+                 max_records: int = shared_spool_size):
+        self.spool_dir = Path(spool_dir)
+        self.max_records = max_records
+        self.lock = threading.Lock()
+        self.spool_writer = None
+
+    @contextmanager
+    def open(self) -> Iterator[SpoolWriter]:
+        """ Get exclusive access to the current spool writer """
+        with self.lock:
+            if self.spool_writer is None:
+                self.spool_writer = SpoolWriter(self.spool_dir)
+            try:
+                yield self.spool_writer
+            finally:
+                self.spool_writer.spool_file.flush()
+                if self.spool_writer.record_count >= self.max_records:
+                    self._close()
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self.spool_writer is not None:
+            self.spool_writer.close()
+            self.spool_writer = None
+
+
+# Shared spool writers, indexed by process id and spool directory
+_shared_writers: Dict[Tuple[int, Path], SharedSpoolWriter] = dict()
+_shared_writers_lock = threading.Lock()
+
+
+def get_shared_spool_writer(spool_dir: Union[str, Path]) -> SharedSpoolWriter:
+    """ Get the shared spool writer of this process for spool_dir """
+    process_id = os.getpid()
+    key = (process_id, Path(spool_dir).absolute())
+    with _shared_writers_lock:
+        if key not in _shared_writers:
+            if not any(pid == process_id for pid, _ in _shared_writers):
+                # Worker processes of multiprocessing do not run atexit
+                # handlers, but finalizers.
+                multiprocessing.util.Finalize(
+                    None,
+                    close_shared_spool_writers,
+                    exitpriority=10)
+            _shared_writers[key] = SharedSpoolWriter(spool_dir)
+        return _shared_writers[key]
+
+
+@atexit.register
+def close_shared_spool_writers():
+    """ Complete the spool files of all shared writers of this process """
+    process_id = os.getpid()
+    with _shared_writers_lock:
+        for key in [key for key in _shared_writers if key[0] == process_id]:
+            _shared_writers.pop(key).close()
+
+
+def claim_spool_files(spool_dir: Union[str, Path]) -> List[Path]:
+    """ Claim all complete spool files in a spool directory for merging
+
+    Spool files are claimed by renaming them. If another merger claimed a
+    spool file first, the file is skipped.
+    """
+    claimed = []
+    for path in sorted(Path(spool_dir).glob("*" + spool_suffix)):
+        claimed_path = path.with_name(
+            path.name[:-len(spool_suffix)] + merging_suffix)
+        try:
+            path.rename(claimed_path)
+        except FileNotFoundError:
+            continue
+        claimed.append(claimed_path)
+    return claimed
+
+
+def release_spool_files(claimed_paths: Iterable[Path]):
+    """ Return claimed spool files to the spool, e.g. after a merge error """
+    for path in claimed_paths:
+        path.rename(
+            path.with_name(path.name[:-len(merging_suffix)] + spool_suffix))
+
+
+def read_spool_files(claimed_paths: Iterable[Path]) -> Iterable[JSONType]:
+    for path in claimed_paths:
+        with path.open("rt") as spool_file:
+            for line in spool_file:
+                if line.strip():
+                    yield json.loads(line)
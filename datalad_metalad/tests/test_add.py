@@ -10,11 +10,14 @@
 """Test metadata adding"""
 import json
 import tempfile
+import threading
 import time
+from pathlib import Path
 from typing import (
     List,
     Union,
 )
+from unittest import SkipTest
 from unittest.mock import (
     call,
     patch,
@@ -33,6 +36,7 @@ from datalad.tests.utils_pytest import (
     assert_in,
     assert_is_not_none,
     assert_not_equal,
+    assert_not_in,
     assert_raises,
     assert_result_count,
     assert_true,
@@ -51,7 +55,12 @@ from .utils import (
     create_dataset,
     create_dataset_proper,
 )
+from ..add import MetadataStoreWriter
 from ..exceptions import MetadataKeyException
+from ..metadatatypes.metadata import (
+    AggregationInfo,
+    MetadataRecord,
+)
 
 
 default_id = UUID("00010203-1011-2021-3031-404142434445")
@@ -88,6 +97,19 @@ def _assert_raise_mke_with_keys(exception_keys: List[str],
         eq_(mke.keys, exception_keys)
 
 
+def _assert_record_error_with_keys(exception_keys: List[str],
+                                   *args,
+                                   **kwargs):
+
+    results = meta_add(*args, on_failure="ignore", **kwargs)
+    error_results = [
+        result
+        for result in results
+        if result["status"] == "error"]
+    eq_(len(error_results), 1)
+    eq_(error_results[0]["keys"], exception_keys)
+
+
 @with_tempfile
 def test_unknown_key_reporting(file_name=None):
 
@@ -100,9 +122,9 @@ def test_unknown_key_reporting(file_name=None):
 
     with \
             patch("datalad_metalad.add.check_dataset"), \
-            patch("datalad_metalad.add.locked_backend"):
+            patch("datalad_metalad.add.lock_backend"):
 
-        _assert_raise_mke_with_keys(
+        _assert_record_error_with_keys(
             ["strange_key_name"],
             metadata=file_name,
             result_renderer="disabled")
@@ -172,9 +194,9 @@ def test_incomplete_non_mandatory_key_handling(file_name=None):
 
     with \
             patch("datalad_metalad.add.check_dataset"), \
-            patch("datalad_metalad.add.locked_backend"):
+            patch("datalad_metalad.add.lock_backend"):
 
-        _assert_raise_mke_with_keys(
+        _assert_record_error_with_keys(
             ["root_dataset_version"],
             metadata=file_name,
             additionalvalues=json.dumps({"root_dataset_id": 1}),
@@ -191,8 +213,8 @@ def test_override_key_reporting(file_name=None):
 
     with \
             patch("datalad_metalad.add.check_dataset"), \
-            patch("datalad_metalad.add.locked_backend"):
-        _assert_raise_mke_with_keys(
+            patch("datalad_metalad.add.lock_backend"):
+        _assert_record_error_with_keys(
             ["dataset_id"],
             metadata=file_name,
             additionalvalues=json.dumps(
@@ -837,6 +859,573 @@ def test_add_multiple_metadata_records_end_to_end(file_name=None):
     _check_file_multiple_end_to_end_test(1, 1000, file_name)
 
 
+@with_tempfile(mkdir=True)
+def test_streaming_add_with_periodic_flush(temp_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    json_objects = _create_json_metadata_records(file_count=7, metadata_count=2)
+    for json_lines in (False, True):
+        with tempfile.NamedTemporaryFile(mode="tw") as json_input:
+            if json_lines:
+                json_input.write(
+                    "\n".join(map(json.dumps, json_objects)) + "\n\n")
+            else:
+                json.dump(json_objects, json_input, indent=2)
+            json_input.flush()
+
+            with patch("datalad_metalad.add.write_out_caches",
+                       wraps=datalad_metalad.add.write_out_caches) as wo, \
+                    patch("datalad_metalad.add.stage_caches",
+                          wraps=datalad_metalad.add.stage_caches) as sc:
+                res = meta_add(
+                    metadata=json_input.name,
+                    dataset=git_repo.path,
+                    json_lines=json_lines,
+                    max_cache_size=3,
+                    result_renderer="disabled")
+                assert_result_count(res, len(json_objects), status="ok")
+
+                # Four periodic flushes and one final commit
+                eq_(sc.call_count, 4)
+                eq_(wo.call_count, 1)
+
+        results = tuple(meta_dump(dataset=git_repo.pathobj,
+                                  path="*",
+                                  recursive=True,
+                                  result_renderer="disabled"))
+        eq_(len(results), len(json_objects))
+
+
+@with_tempfile(mkdir=True)
+def test_bounded_mrr_cache(temp_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    versions = [f"{index:040x}" for index in range(6)]
+    records = [
+        {
+            **metadata_template,
+            "type": "dataset",
+            "dataset_version": version,
+            "extracted_metadata": {"info": f"dataset {version}"}
+        }
+        for version in versions
+    ] + [
+        {
+            **metadata_template,
+            "type": "file",
+            "path": f"a/b/f_{index}",
+            "dataset_version": version,
+            "extracted_metadata": {"info": f"file {version}"}
+        }
+        for index, version in enumerate(versions)
+    ] + [
+        {
+            **metadata_template,
+            "type": "dataset",
+            "extractor_name": "second_extractor",
+            "dataset_version": version,
+            "extracted_metadata": {"info": f"second {version}"}
+        }
+        for version in versions
+    ]
+
+    # Store the metadata root records, then modify them again with a cache
+    # size that forces eviction of records that are accessed again later.
+    res = meta_add(
+        metadata=records[:len(versions)],
+        dataset=git_repo.path,
+        result_renderer="disabled")
+    assert_result_count(res, len(versions), status="ok")
+
+    with patch("datalad_metalad.add.max_mrr_cache_size", 2):
+        res = meta_add(
+            metadata=records[len(versions):],
+            dataset=git_repo.path,
+            result_renderer="disabled")
+        assert_result_count(res, 2 * len(versions), status="ok")
+
+    results = tuple(meta_dump(dataset=git_repo.pathobj,
+                              path="*",
+                              recursive=True,
+                              result_renderer="disabled"))
+    eq_(len(results), len(records))
+    eq_(
+        sorted(result["metadata"]["extracted_metadata"]["info"]
+               for result in results),
+        sorted(record["extracted_metadata"]["info"] for record in records))
+
+
+@with_tempfile(mkdir=True)
+def test_metadata_store_writer(temp_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    record = MetadataRecord(
+        type="file",
+        extractor_name="ex_extractor_name",
+        extractor_version="ex_extractor_version",
+        extraction_parameter={"parameter1": "pvalue1"},
+        extraction_time=1111666.3333,
+        agent_name="test_name",
+        agent_email="test email",
+        dataset_id=default_id,
+        dataset_version="000000111111111112012121212121",
+        extracted_metadata={"info": "record metadata"},
+        path=MetadataPath("a/b/c"),
+        aggregation_info=AggregationInfo(
+            root_dataset_id=default_id,
+            root_dataset_version="aaaaaaa0000000000000000222222222",
+            dataset_path=MetadataPath("sub_0")))
+
+    with MetadataStoreWriter(git_repo.path) as writer:
+        assert_result_count(writer.add(record), 1, status="ok")
+        assert_result_count(
+            writer.add(
+                {**metadata_template, "type": "dataset"},
+                {"dataset_path": "sub_1"}),
+            1,
+            status="ok")
+
+        # Nothing is written before the writer is closed
+        eq_(
+            list(git_repo.call_git_items_(
+                ["for-each-ref", "refs/datalad"])),
+            [])
+
+    results = tuple(meta_dump(dataset=git_repo.pathobj,
+                              path="*",
+                              recursive=True,
+                              result_renderer="disabled"))
+    eq_(
+        sorted(result["metadata"]["extracted_metadata"]["info"]
+               for result in results),
+        ["record metadata", "some metadata"])
+
+    # Unhandled exceptions discard the cached records
+    with assert_raises(ValueError):
+        with MetadataStoreWriter(git_repo.path) as writer:
+            writer.add({
+                **metadata_template,
+                "type": "dataset",
+                "dataset_version": "ffffff",
+                "extracted_metadata": {"info": "discarded"}})
+            raise ValueError
+
+    results = tuple(meta_dump(dataset=git_repo.pathobj,
+                              path="*",
+                              recursive=True,
+                              result_renderer="disabled"))
+    assert_not_in(
+        "discarded",
+        [result["metadata"]["extracted_metadata"]["info"] for result in results])
+
+
+@with_tempfile(mkdir=True)
+def test_add_policy(temp_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    def add(record: dict, add_policy: str) -> List:
+        return list(meta_add(
+            metadata=record,
+            dataset=git_repo.path,
+            add_policy=add_policy,
+            on_failure="ignore",
+            result_renderer="disabled"))
+
+    def get_dumped_metadata() -> List:
+        return [
+            result["metadata"]
+            for result in meta_dump(
+                dataset=git_repo.pathobj,
+                path="*",
+                recursive=True,
+                result_renderer="disabled")]
+
+    def get_refs() -> List:
+        return list(git_repo.call_git_items_(
+            ["for-each-ref", "refs/datalad"]))
+
+    record = {**metadata_template, "type": "file", "path": "a/b"}
+    assert_result_count(add(record, "skip-identical"), 1, status="ok")
+    refs = get_refs()
+
+    # An identical run with a different extraction time is skipped
+    later_record = {**record, "extraction_time": 2222777.4444}
+    assert_result_count(
+        add(later_record, "skip-identical"),
+        1,
+        status="notneeded")
+    eq_(get_refs(), refs)
+    dumped_metadata = get_dumped_metadata()
+    eq_(len(dumped_metadata), 1)
+    eq_(dumped_metadata[0]["extraction_time"], record["extraction_time"])
+
+    # A run with different extracted metadata is added
+    changed_record = {
+        **later_record,
+        "extracted_metadata": {"info": "changed metadata"}}
+    assert_result_count(add(changed_record, "skip-identical"), 1, status="ok")
+    dumped_metadata = get_dumped_metadata()
+    eq_(len(dumped_metadata), 1)
+    eq_(dumped_metadata[0]["extracted_metadata"], {"info": "changed metadata"})
+
+    # The replace-latest policy replaces identical runs
+    refs = get_refs()
+    latest_record = {**changed_record, "extraction_time": 3333888.5555}
+    assert_result_count(add(latest_record, "replace-latest"), 1, status="ok")
+    assert_not_equal(get_refs(), refs)
+    eq_(get_dumped_metadata()[0]["extraction_time"], 3333888.5555)
+
+
+@with_tempfile(mkdir=True)
+def test_transactional_add(temp_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    def get_refs() -> List:
+        return list(git_repo.call_git_items_(
+            ["for-each-ref", "refs/datalad"]))
+
+    def get_dumped_paths() -> List:
+        return [
+            result["metadata"]["path"]
+            for result in meta_dump(
+                dataset=git_repo.pathobj,
+                path="*",
+                recursive=True,
+                result_renderer="disabled")]
+
+    json_objects = [
+        {**metadata_template, "type": "file", "path": f"a/f_{index}"}
+        for index in range(7)
+    ]
+
+    # Invalid records are reported and the other records are added
+    invalid_object = {**json_objects[3], "strange_key_name": 1}
+    res = meta_add(
+        metadata=json_objects[:3] + [invalid_object] + json_objects[4:5],
+        dataset=git_repo.path,
+        on_failure="ignore",
+        result_renderer="disabled")
+    assert_result_count(res, 4, status="ok")
+    assert_result_count(
+        res,
+        1,
+        status="error",
+        record_index=3,
+        keys=["strange_key_name"])
+    eq_(
+        sorted(get_dumped_paths()),
+        ["a/f_0", "a/f_1", "a/f_2", "a/f_4"])
+
+    # An error while adding removes all records of the batch, even if they
+    # were already written in a periodic flush.
+    refs = get_refs()
+    add_file_metadata = datalad_metalad.add.add_file_metadata
+
+    def failing_add_file_metadata(*args, **kwargs):
+        if failing_add_file_metadata.call_count == 5:
+            raise RuntimeError("simulated failure")
+        failing_add_file_metadata.call_count += 1
+        return add_file_metadata(*args, **kwargs)
+
+    failing_add_file_metadata.call_count = 0
+    with patch("datalad_metalad.add.add_file_metadata",
+               failing_add_file_metadata):
+        assert_raises(
+            RuntimeError,
+            meta_add,
+            metadata=[
+                {**json_object, "path": "b/" + json_object["path"]}
+                for json_object in json_objects],
+            dataset=git_repo.path,
+            max_cache_size=3,
+            result_renderer="disabled")
+
+    eq_(get_refs(), refs)
+    eq_(
+        sorted(get_dumped_paths()),
+        ["a/f_0", "a/f_1", "a/f_2", "a/f_4"])
+
+    # Periodic flushes do not modify the top-level references
+    stage_caches = datalad_metalad.add.stage_caches
+    staged_refs = []
+
+    def recording_stage_caches(*args, **kwargs):
+        stage_caches(*args, **kwargs)
+        staged_refs.append(get_tvl_uuid_set_refs())
+
+    def get_tvl_uuid_set_refs() -> List:
+        return [ref for ref in get_refs() if "object-references" not in ref]
+
+    tvl_uuid_set_refs = get_tvl_uuid_set_refs()
+    with patch("datalad_metalad.add.stage_caches", recording_stage_caches):
+        meta_add(
+            metadata=[
+                {**json_object, "path": "c/" + json_object["path"]}
+                for json_object in json_objects],
+            dataset=git_repo.path,
+            max_cache_size=3,
+            result_renderer="disabled")
+    eq_(staged_refs, [tvl_uuid_set_refs] * 2)
+    assert_not_equal(get_tvl_uuid_set_refs(), tvl_uuid_set_refs)
+    eq_(len(get_dumped_paths()), 4 + 7)
+
+    # Records that were reported before the processing stopped are kept
+    assert_raises(
+        IncompleteResultsError,
+        meta_add,
+        metadata=[
+            {**json_object, "path": "d/" + json_object["path"]}
+            for json_object in json_objects[:2] + [invalid_object]
+            + json_objects[4:]],
+        dataset=git_repo.path,
+        on_failure="stop",
+        result_renderer="disabled")
+    eq_(
+        sorted(path for path in get_dumped_paths() if path.startswith("d/")),
+        ["d/a/f_0", "d/a/f_1"])
+
+
+@with_tempfile(mkdir=True)
+def test_columnar_input(temp_dir=None):
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise SkipTest("pyarrow is not installed")
+
+    git_repo = create_dataset(temp_dir, default_id)
+
+    record_count = 5
+    columns = {
+        **{
+            key: [value] * record_count
+            for key, value in metadata_template.items()
+            if key not in ("extracted_metadata", "extraction_parameter")
+        },
+        "type": ["dataset"] + ["file"] * (record_count - 1),
+        "path": [None] + [f"a/f_{index}" for index in range(1, record_count)],
+        "extraction_parameter": [
+            {"parameter1": "pvalue1"}] * record_count,
+        "extracted_metadata": [
+            json.dumps({"info": f"columnar {index}"})
+            for index in range(record_count)],
+    }
+    table = pyarrow.table(columns)
+
+    parquet_file = Path(temp_dir) / "metadata.parquet"
+    pyarrow.parquet.write_table(table, parquet_file)
+    res = meta_add(
+        metadata=str(parquet_file),
+        dataset=git_repo.path,
+        input_format="parquet",
+        result_renderer="disabled")
+    assert_result_count(res, record_count, status="ok")
+    assert_result_count(res, 1, status="ok", type="dataset")
+
+    results = tuple(meta_dump(dataset=git_repo.pathobj,
+                              path="*",
+                              recursive=True,
+                              result_renderer="disabled"))
+    eq_(
+        sorted(result["metadata"]["extracted_metadata"]["info"]
+               for result in results),
+        [f"columnar {index}" for index in range(record_count)])
+    eq_(
+        results[0]["metadata"]["extraction_parameter"],
+        {"parameter1": "pvalue1"})
+
+    # Map values, also nested ones, are added as dictionaries
+    map_type = pyarrow.map_(pyarrow.string(), pyarrow.string())
+    map_columns = {
+        **columns,
+        "type": ["dataset"] * record_count,
+        "path": [None] * record_count,
+        "dataset_version": [f"v{index}" for index in range(record_count)],
+        "extraction_parameter": pyarrow.array(
+            [[("a", "1")]] * record_count,
+            map_type),
+        "extracted_metadata": pyarrow.array(
+            [
+                {"info": [("b", "2")], "list": [[("c", "3")]]}
+            ] * record_count,
+            pyarrow.struct([
+                ("info", map_type),
+                ("list", pyarrow.list_(map_type))])),
+    }
+    pyarrow.parquet.write_table(pyarrow.table(map_columns), parquet_file)
+    res = meta_add(
+        metadata=str(parquet_file),
+        dataset=git_repo.path,
+        input_format="parquet",
+        result_renderer="disabled")
+    assert_result_count(res, record_count, status="ok")
+
+    results = tuple(meta_dump(dataset=git_repo.pathobj,
+                              path="@v0",
+                              result_renderer="disabled"))
+    eq_(len(results), 1)
+    eq_(results[0]["metadata"]["extraction_parameter"], {"a": "1"})
+    eq_(
+        results[0]["metadata"]["extracted_metadata"],
+        {"info": {"b": "2"}, "list": [{"c": "3"}]})
+
+    # Records are checked column-wise
+    arrow_file = Path(temp_dir) / "metadata.arrow"
+    for invalid_columns, exception_keys in (
+            ({"path": [None] * record_count}, []),
+            ({"root_dataset_id": [str(default_id)] * record_count},
+             ["root_dataset_version"]),
+            ({"strange_key_name": [1] * record_count}, ["strange_key_name"])):
+
+        invalid_table = pyarrow.table({**columns, **invalid_columns})
+        with pyarrow.ipc.new_file(arrow_file, invalid_table.schema) as writer:
+            writer.write_table(invalid_table)
+
+        _assert_record_error_with_keys(
+            exception_keys,
+            metadata=str(arrow_file),
+            dataset=git_repo.path,
+            input_format="arrow",
+            result_renderer="disabled")
+
+    # A batch that fails the check is reported with its row offset, the
+    # other batches are added
+    batch_repo = create_dataset(
+        str(Path(temp_dir) / "batches"),
+        default_id)
+    pyarrow.parquet.write_table(
+        pyarrow.table({
+            **columns,
+            "path": [None, "a/f_1", "a/f_2", None, "a/f_4"]}),
+        parquet_file)
+    with patch("datalad_metalad.columnar.default_batch_size", 2):
+        res = meta_add(
+            metadata=str(parquet_file),
+            dataset=batch_repo.path,
+            input_format="parquet",
+            on_failure="ignore",
+            result_renderer="disabled")
+    assert_result_count(res, 3, status="ok")
+    assert_result_count(
+        res, 1, status="error", record_index=2, record_count=2)
+    eq_(
+        sorted(
+            result["metadata"].get("path", "")
+            for result in meta_dump(
+                dataset=batch_repo.pathobj,
+                path="*",
+                recursive=True,
+                result_renderer="disabled")),
+        ["", "a/f_1", "a/f_4"])
+
+
+@with_tempfile(mkdir=True)
+def test_parallel_parsing(temp_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    json_objects = [
+        {
+            **metadata_template,
+            "type": "file",
+            "path": f"a/f_{index}",
+            "extracted_metadata": {"info": f"file {index}"}
+        }
+        for index in range(11)
+    ]
+
+    json_lines_file = Path(temp_dir) / "metadata.jsonl"
+    json_lines_file.write_text(
+        "\n".join(map(json.dumps, json_objects)) + "\n\n")
+
+    with patch("datalad_metalad.add.parse_chunk_size", 3):
+        res = meta_add(
+            metadata=str(json_lines_file),
+            dataset=git_repo.path,
+            json_lines=True,
+            parse_workers=2,
+            result_renderer="disabled")
+
+    # Records are added in input order
+    eq_(
+        [result["path"] for result in res],
+        [
+            str(git_repo.pathobj / json_object["path"])
+            for json_object in json_objects
+        ])
+
+    results = tuple(meta_dump(dataset=git_repo.pathobj,
+                              path="*",
+                              recursive=True,
+                              result_renderer="disabled"))
+    eq_(len(results), len(json_objects))
+
+    # Errors in worker processes are reported
+    json_lines_file.write_text(
+        json.dumps({**json_objects[0], "strange_key_name": 1}) + "\n")
+    _assert_record_error_with_keys(
+        ["strange_key_name"],
+        metadata=str(json_lines_file),
+        dataset=git_repo.path,
+        json_lines=True,
+        parse_workers=2,
+        result_renderer="disabled")
+
+    # Parallel parsing is rejected where it is not supported
+    for mode_args in ({"batch_mode": True}, {"spool_dir": temp_dir}):
+        assert_raises(
+            ValueError,
+            meta_add,
+            metadata=str(json_lines_file),
+            dataset=git_repo.path,
+            json_lines=True,
+            parse_workers=2,
+            result_renderer="disabled",
+            **mode_args)
+
+
+@with_tempfile(mkdir=True)
+def test_invalid_json_line(temp_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    json_lines_file = Path(temp_dir) / "metadata.jsonl"
+    json_lines_file.write_text(
+        "\n".join([
+            json.dumps({**metadata_template, "type": "file", "path": "a"}),
+            "{not json",
+            json.dumps({**metadata_template, "type": "file", "path": "b"}),
+        ]) + "\n")
+
+    # An invalid line is reported as invalid record, independent of the
+    # parsing mode, and the other records are added
+    for mode_args in ({}, {"parse_workers": 2}):
+        res = meta_add(
+            metadata=str(json_lines_file),
+            dataset=git_repo.path,
+            json_lines=True,
+            on_failure="ignore",
+            result_renderer="disabled",
+            **mode_args)
+        assert_result_count(res, 2, status="ok")
+        error_results = [
+            result
+            for result in res
+            if result["status"] == "error"]
+        eq_(len(error_results), 1)
+        eq_(error_results[0]["record_index"], 1)
+        eq_(error_results[0]["metadata"], None)
+
+        eq_(
+            sorted(
+                result["metadata"]["path"]
+                for result in meta_dump(
+                    dataset=git_repo.pathobj,
+                    path="*",
+                    recursive=True,
+                    result_renderer="disabled")),
+            ["a", "b"])
+
+
 @with_tempfile(mkdir=True)
 def test_cache_age(temp_dir=None):
     create_dataset_proper(temp_dir)
@@ -889,6 +1478,82 @@ def test_batch_mode(temp_dir=None):
             sys_mock.mock_calls)
 
 
+@with_tempfile(mkdir=True)
+def test_batch_mode_write_behind(temp_dir=None):
+    create_dataset_proper(temp_dir)
+
+    json_objects = _create_json_metadata_records(file_count=3, metadata_count=3)
+    flush_calls = []
+
+    def slow_flush(metadata_objects, **kwargs):
+        flush_calls.append((threading.get_ident(), len(metadata_objects)))
+        time.sleep(.2)
+        return len(metadata_objects), 0
+
+    with \
+            patch("datalad_metalad.add.flush_metadata_cache") as fc, \
+            patch("datalad_metalad.add._stdin_reader") as stdin_mock, \
+            patch("datalad_metalad.add.sys") as sys_mock:
+
+        stdin_mock.return_value = iter(json_objects)
+        fc.side_effect = slow_flush
+        meta_add(
+            metadata="-",
+            dataset=temp_dir,
+            allow_id_mismatch=True,
+            batch_mode=True,
+            max_cache_size=2,
+            max_cache_age=60,
+            result_renderer="disabled")
+
+        # All records were written by a background thread
+        assert_true(all(
+            thread_id != threading.get_ident()
+            for thread_id, _ in flush_calls))
+        eq_(sum(count for _, count in flush_calls), len(json_objects))
+        assert_in(
+            call.stdout.write(
+                f'{{"status": "ok", "succeeded": {len(json_objects)}, '
+                f'"failed": 0}}\n'),
+            sys_mock.mock_calls)
+
+
+@with_tempfile(mkdir=True)
+def test_batch_mode_durable_ack(temp_dir=None):
+    create_dataset_proper(temp_dir)
+
+    json_objects = _create_json_metadata_records(file_count=3, metadata_count=3)
+
+    with patch("datalad_metalad.add._stdin_reader") as stdin_mock, \
+         patch("datalad_metalad.add.sys") as sys_mock:
+
+        stdin_mock.return_value = iter(json_objects)
+        meta_add(
+            metadata="-",
+            dataset=temp_dir,
+            allow_id_mismatch=True,
+            batch_mode=True,
+            max_cache_size=4,
+            durable_ack=True,
+            result_renderer="disabled")
+
+        output = [
+            json.loads(mock_call.args[0])
+            for mock_call in sys_mock.mock_calls
+            if mock_call[0] == "stdout.write"]
+
+    acknowledgements = output[:-1]
+    eq_(len(acknowledgements), len(json_objects))
+    for acknowledgement in acknowledgements:
+        eq_(acknowledgement["status"], "ok")
+        eq_(acknowledgement["durable"], True)
+        assert_not_in("cached", acknowledgement)
+    eq_(output[-1], {
+        "status": "ok",
+        "succeeded": len(json_objects),
+        "failed": 0})
+
+
 @with_tempfile(mkdir=True)
 def test_batch_mode_end_to_end(temp_dir=None):
     create_dataset_proper(temp_dir)
@@ -27,8 +27,10 @@ from datalad_metalad.pipeline.pipelinedata import (
     PipelineResult,
     ResultState,
 )
+from ..pipeline.consumer.base import Consumer
 from ..pipeline.processor.base import Processor
 from ..pipeline.provider.base import Provider
+from ..resourceusage import ResourceStatistics
 
 
 test_tree = {
@@ -110,6 +112,40 @@ class ConductTestTraverser(Provider):
             ),)
 
 
+class ReleaseTestProvider(Provider):
+    """ A provider that is saturated by a single unreleased object """
+    def __init__(self, count: str):
+        super().__init__()
+        self.count = int(count)
+        self.unreleased = set()
+
+    def next_object(self):
+        for index in range(self.count):
+            if self.unreleased:
+                raise RuntimeError("saturated provider was asked for objects")
+            pipeline_data = PipelineData((("path", Path(str(index))),))
+            self.unreleased.add(id(pipeline_data))
+            yield pipeline_data
+
+    def is_saturated(self) -> bool:
+        return bool(self.unreleased)
+
+    def release(self, pipeline_data: PipelineData):
+        self.unreleased.remove(id(pipeline_data))
+
+
+class FinishTestConsumer(Consumer):
+    """ A consumer that records consumption events in a class attribute """
+    events = []
+
+    def consume(self, pipeline_data: PipelineData) -> PipelineData:
+        self.events.append("consume")
+        return pipeline_data
+
+    def finish(self):
+        self.events.append("finish")
+
+
 class PathEater(Processor):
     def __init__(self):
         super().__init__()
@@ -192,6 +228,58 @@ def test_extract():
         assert_true(all(map(lambda e: len(e["pipeline_data"]["result"]["metadata"]) == 2, pipeline_results)))
 
 
+def test_extract_statistics():
+    with tempfile.TemporaryDirectory() as root_dataset_dir_str:
+        create_dataset_proper(root_dataset_dir_str, ["subdataset_0"])
+
+        pipeline_results = list(
+            meta_conduct(
+                arguments=[
+                    f"provider.top_level_dir={root_dataset_dir_str}",
+                    f"provider.item_type=dataset",
+                    f"provider.traverse_sub_datasets=True",
+                    f"testproc1.extractor_type=dataset",
+                    f"testproc1.extractor_name=metalad_example_dataset",
+                    f"testproc2.extractor_type=dataset",
+                    f"testproc2.extractor_name=metalad_core"],
+                configuration=extract_pipeline,
+                processing_mode="sequential",
+                statistics=True))
+
+        eq_(len(pipeline_results), 3)
+        for result in pipeline_results[:2]:
+            for metadata_result in result["pipeline_data"]["result"]["metadata"]:
+                assert_true("resource_usage" in metadata_result)
+
+        statistics = pipeline_results[-1]
+        eq_(statistics["type"], "statistics")
+        by_extractor = statistics["statistics"]["by_extractor"]
+        eq_(set(by_extractor), {"metalad_example_dataset", "metalad_core"})
+        for extractor_statistics in by_extractor.values():
+            eq_(extractor_statistics["count"], 2)
+            assert_true(extractor_statistics["wall_time"] > 0)
+
+
+def test_peak_statistics():
+    resource_statistics = ResourceStatistics()
+    for peak_rss_delta in (3, 5, 2):
+        resource_statistics.add(
+            "extractor",
+            "a.txt",
+            dict(
+                wall_time=1,
+                peak_rss_delta=peak_rss_delta,
+                children_peak_rss_delta=peak_rss_delta * 10))
+
+    # Peak values are aggregated by maximum, other values by sum
+    for entry in (resource_statistics.by_extractor["extractor"],
+                  resource_statistics.by_file_type[".txt"]):
+        eq_(entry["count"], 3)
+        eq_(entry["wall_time"], 3)
+        eq_(entry["peak_rss_delta"], 5)
+        eq_(entry["children_peak_rss_delta"], 50)
+
+
 def test_multiple_adder():
     adder_pipeline = {
         "provider": test_provider,
@@ -232,3 +320,72 @@ def test_multiple_adder():
     assert_equal(len(adder_results), adder_count)
     for i in range(adder_count):
         assert_equal(adder_results[i]["content"], f"content from adder {i}")
+
+
+def test_provider_release():
+    release_pipeline = {
+        "provider": {
+            "name": "testprovider",
+            "module": "datalad_metalad.tests.test_conduct",
+            "class": "ReleaseTestProvider",
+            "arguments": {}
+        },
+        "processors": [
+            {
+                "name": f"adder{index}",
+                "module": "datalad_metalad.tests.test_conduct",
+                "class": "DataAdder",
+                "arguments": {
+                    "source_name": "adder-data",
+                    "content": f"content from adder {index}"
+                }
+            }
+            for index in range(3)
+        ]
+    }
+
+    # A saturated provider is not asked for objects, until its objects are
+    # released, i.e. processed by all processors of the pipeline.
+    for processing_mode in ("sequential", "thread", "process"):
+        pipeline_results = list(
+            meta_conduct(
+                arguments=["testprovider.count=4"],
+                configuration=release_pipeline,
+                processing_mode=processing_mode))
+        eq_(
+            sorted(result["path"] for result in pipeline_results),
+            ["0", "1", "2", "3"])
+        assert_true(all(
+            result["status"] == "ok"
+            for result in pipeline_results))
+
+
+def test_consumer_finish():
+    consumer_pipeline = {
+        "provider": test_provider,
+        "processors": [
+            {
+                "name": "eater",
+                "module": "datalad_metalad.tests.test_conduct",
+                "class": "PathEater",
+                "arguments": {}
+            }
+        ],
+        "consumer": {
+            "name": "testconsumer",
+            "module": "datalad_metalad.tests.test_conduct",
+            "class": "FinishTestConsumer",
+            "arguments": {}
+        }
+    }
+
+    # The consumer is finished once, after all pipeline data was consumed
+    for processing_mode in ("sequential", "thread"):
+        FinishTestConsumer.events.clear()
+        pipeline_results = list(
+            meta_conduct(
+                arguments=["testprovider.path_spec=a:b:c"],
+                configuration=consumer_pipeline,
+                processing_mode=processing_mode))
+        eq_(len(pipeline_results), 3)
+        eq_(FinishTestConsumer.events, ["consume"] * 3 + ["finish"])
@@ -0,0 +1,517 @@
+import json
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+from uuid import UUID
+
+from datalad.api import (
+    meta_add,
+    meta_dump,
+)
+from datalad.tests.utils_pytest import (
+    assert_raises,
+    assert_true,
+    eq_,
+    with_tempfile,
+)
+from datalad.utils import swallow_outputs
+from dataladmetadatamodel.metadata import Metadata
+
+from .utils import create_dataset
+from ..dump import (
+    create_record_filter,
+    run_dump_jobs,
+)
+
+
+root_id = "00010203-1011-2021-3031-404142434445"
+sub_id = "aa010203-1011-2021-3031-404142434445"
+
+metadata_template = {
+    "extractor_version": "1",
+    "extraction_parameter": {},
+    "agent_name": "test_name",
+    "agent_email": "test email",
+    "extracted_metadata": {"info": "some metadata"}
+}
+
+
+def _create_records() -> List[dict]:
+    records = []
+    for extractor_name, extraction_time in (("ex_a", 1000.0),
+                                            ("ex_b", 2000.0)):
+        root_template = {
+            **metadata_template,
+            "extractor_name": extractor_name,
+            "extraction_time": extraction_time,
+            "dataset_id": root_id,
+            "dataset_version": "r1"}
+        sub_template = {
+            **root_template,
+            "root_dataset_id": root_id,
+            "root_dataset_version": "r1",
+            "dataset_path": "sub",
+            "dataset_id": sub_id,
+            "dataset_version": "s1"}
+        records.extend([
+            {**root_template, "type": "dataset"},
+            {**root_template, "type": "file", "path": "a.json"},
+            {**root_template, "type": "file", "path": "d/b.json"},
+            {**sub_template, "type": "dataset"},
+            {**sub_template, "type": "file", "path": "x/y.json"}])
+    return records
+
+
+def _dump(dataset: str, **kwargs) -> List[dict]:
+    return [
+        result["metadata"]
+        for result in meta_dump(
+            dataset=dataset,
+            on_failure="ignore",
+            result_renderer="disabled",
+            **kwargs)]
+
+
+def test_record_filter_creation():
+    record_filter = create_record_filter(
+        "ex_a",
+        "dataset_version, extractor_name",
+        "1000",
+        "1970-01-01T01:00:00+00:00")
+    eq_(record_filter.extractor_names, frozenset(["ex_a"]))
+    eq_(record_filter.fields, ("dataset_version", "extractor_name"))
+    eq_(record_filter.since, 1000.0)
+    eq_(record_filter.until, 3600.0)
+
+    eq_(create_record_filter(["ex_a", "ex_b"]).extractor_names,
+        frozenset(["ex_a", "ex_b"]))
+    eq_(create_record_filter().fields, None)
+    assert_raises(ValueError, create_record_filter, since="yesterday")
+
+
+@with_tempfile(mkdir=True)
+def test_dump_filter(temp_dir=None):
+    create_dataset(temp_dir, UUID(root_id))
+    meta_add(
+        metadata=_create_records(),
+        dataset=temp_dir,
+        result_renderer="disabled")
+
+    for use_index in (False, True):
+        results = _dump(
+            temp_dir,
+            path=":a.json",
+            use_index=use_index,
+            extractor="ex_b")
+        eq_([r["extractor_name"] for r in results], ["ex_b", "ex_b"])
+        eq_([r["type"] for r in results], ["dataset", "file"])
+
+        results = _dump(
+            temp_dir,
+            recursive=True,
+            use_index=use_index,
+            fields="type,path,extractor_name,unknown")
+        eq_(len(results), 10)
+        assert_true(all(
+            set(r) <= {"type", "path", "extractor_name"}
+            for r in results))
+        eq_(
+            sorted(
+                r.get("path", "")
+                for r in results
+                if r["extractor_name"] == "ex_a"),
+            ["", "", "a.json", "d/b.json", "x/y.json"])
+
+        # The extraction time range is inclusive
+        results = _dump(
+            temp_dir,
+            path="sub",
+            recursive=True,
+            use_index=use_index,
+            since="1500",
+            until="2000")
+        eq_(len(results), 5)
+        assert_true(all(r["extraction_time"] == 2000.0 for r in results))
+
+        eq_(_dump(temp_dir, recursive=True, extractor="unknown"), [])
+
+
+@with_tempfile(mkdir=True)
+def test_dump_version_selection(temp_dir=None):
+    git_repo = create_dataset(temp_dir, UUID(root_id))
+    for index in range(3):
+        git_repo.commit(f"commit {index}", options=["--allow-empty"])
+    versions = list(git_repo.call_git_items_(["rev-list", "--reverse", "HEAD"]))
+
+    # Add the versions one after the other to get increasing time stamps
+    for version in versions:
+        meta_add(
+            metadata={
+                **metadata_template,
+                "extractor_name": "ex_a",
+                "extraction_time": 1000.0,
+                "dataset_id": root_id,
+                "dataset_version": version,
+                "type": "dataset"},
+            dataset=temp_dir,
+            result_renderer="disabled")
+
+    def dumped_versions(**kwargs):
+        return sorted(
+            result["dataset_version"]
+            for result in _dump(temp_dir, **kwargs))
+
+    eq_(dumped_versions(), sorted(versions))
+    for path in ("", f"uuid:{root_id}"):
+        for use_index in (False, True):
+            eq_(
+                dumped_versions(path=path, latest=True, use_index=use_index),
+                [versions[-1]])
+            eq_(
+                dumped_versions(
+                    path=path,
+                    versions=f"{versions[0]}..{versions[-1]}",
+                    use_index=use_index),
+                sorted(versions[1:]))
+            eq_(
+                dumped_versions(
+                    path=path,
+                    latest=True,
+                    versions=f"{versions[-2]}",
+                    use_index=use_index),
+                [versions[-2]])
+
+    # Dumps with multiple jobs report the results of a sequential dump
+    for path in ("", f"uuid:{root_id}"):
+        sequential_results = _dump(temp_dir, path=path, recursive=True)
+        eq_(len(sequential_results), 3)
+        eq_(
+            _dump(temp_dir, path=path, recursive=True, jobs=3),
+            sequential_results)
+        eq_(
+            sorted(
+                map(
+                    str,
+                    _dump(
+                        temp_dir,
+                        path=path,
+                        recursive=True,
+                        jobs=3,
+                        unordered=True))),
+            sorted(map(str, sequential_results)))
+
+    assert_raises(
+        ValueError,
+        meta_dump,
+        dataset=temp_dir,
+        versions="no-such-version..HEAD",
+        result_renderer="disabled")
+
+
+def _create_job(name: str, count: int, fail: bool = False):
+    def job():
+        for index in range(count):
+            yield name, index
+        if fail:
+            raise ValueError(name)
+    return job
+
+
+def test_run_dump_jobs():
+    jobs = [_create_job(name, 50) for name in "abcde"]
+    sequential_results = list(run_dump_jobs(jobs))
+    eq_(len(sequential_results), 250)
+
+    for buffer_size in (1, 7, 1000):
+        eq_(
+            list(run_dump_jobs(jobs, 3, True, buffer_size)),
+            sequential_results)
+        eq_(
+            sorted(run_dump_jobs(jobs, 3, False, buffer_size)),
+            sequential_results)
+
+    # Failures are reported, after the results of previous jobs
+    failing_jobs = [
+        _create_job("a", 10),
+        _create_job("b", 10, True),
+        _create_job("c", 10)]
+    results = []
+    with assert_raises(ValueError):
+        for result in run_dump_jobs(failing_jobs, 3, True, 2):
+            results.append(result)
+    eq_(results, list(run_dump_jobs(failing_jobs[:1])) + [
+        ("b", index) for index in range(10)])
+
+    # Stopping the consumer stops the workers
+    results = run_dump_jobs(jobs, 2, True, 1)
+    eq_(next(results), ("a", 0))
+    results.close()
+
+
+@with_tempfile(mkdir=True)
+def test_dump_output_file(temp_dir=None):
+    create_dataset(temp_dir, UUID(root_id))
+    meta_add(
+        metadata=_create_records(),
+        dataset=temp_dir,
+        result_renderer="disabled")
+
+    expected_records = _dump(temp_dir, recursive=True)
+    eq_(len(expected_records), 10)
+
+    output_file = Path(temp_dir) / "output.jsonl"
+    results = meta_dump(
+        dataset=temp_dir,
+        recursive=True,
+        output_file=str(output_file),
+        result_renderer="disabled")
+    eq_(len(results), 1)
+    eq_(results[0]["record_count"], 10)
+    eq_(results[0]["path"], output_file.absolute())
+    eq_(
+        [json.loads(line) for line in output_file.read_text().splitlines()],
+        expected_records)
+
+    with swallow_outputs() as outputs:
+        results = meta_dump(
+            dataset=temp_dir,
+            path="sub",
+            recursive=True,
+            extractor="ex_a",
+            raw_jsonl=True,
+            result_renderer="disabled")
+        records = [json.loads(line) for line in outputs.out.splitlines()]
+    eq_(results[0]["record_count"], len(records))
+    eq_(
+        records,
+        _dump(temp_dir, path="sub", recursive=True, extractor="ex_a"))
+
+
+def _create_version_records(version: str, file_records: List[dict]):
+    root_template = {
+        **metadata_template,
+        "extractor_name": "ex_a",
+        "extraction_time": 1000.0,
+        "dataset_id": root_id,
+        "dataset_version": version}
+    sub_template = {
+        **root_template,
+        "root_dataset_id": root_id,
+        "root_dataset_version": version,
+        "dataset_path": "sub",
+        "dataset_id": sub_id,
+        "dataset_version": "s1"}
+    return [
+        {**root_template, "type": "dataset"},
+        {**sub_template, "type": "dataset"},
+        {**sub_template, "type": "file", "path": "x/y.json"},
+        *[
+            {**root_template, "type": "file", "path": f"d/e/f{index}.txt"}
+            for index in range(5)],
+        *[
+            {**root_template, **file_record}
+            for file_record in file_records]]
+
+
+@with_tempfile(mkdir=True)
+def test_dump_diff(temp_dir=None):
+    git_repo = create_dataset(temp_dir, UUID(root_id))
+    for index in range(2):
+        git_repo.commit(f"commit {index}", options=["--allow-empty"])
+    version_a, version_b = git_repo.call_git_items_(
+        ["rev-list", "--reverse", "HEAD"])
+
+    meta_add(
+        metadata=_create_version_records(
+            version_a,
+            [
+                {"type": "file", "path": "a.json"},
+                {"type": "file", "path": "d/b.json"}]),
+        dataset=temp_dir,
+        result_renderer="disabled")
+    meta_add(
+        metadata=_create_version_records(
+            version_b,
+            [
+                {"type": "dataset", "extractor_name": "ex_b"},
+                {
+                    "type": "file",
+                    "path": "a.json",
+                    "extracted_metadata": {"info": "changed"}},
+                {"type": "file", "path": "n.txt"}]),
+        dataset=temp_dir,
+        result_renderer="disabled")
+
+    read_in = Metadata.read_in
+    with patch.object(
+            Metadata,
+            "read_in",
+            autospec=True,
+            side_effect=read_in) as read_in_mock:
+        results = meta_dump(
+            dataset=temp_dir,
+            diff="HEAD~1..HEAD",
+            result_renderer="disabled")
+
+    eq_(
+        [
+            (
+                result["state"],
+                result["metadata"].get("path"),
+                result["metadata"]["dataset_version"],
+                result["metadata"]["extractor_name"])
+            for result in results],
+        [
+            ("added", None, version_b, "ex_b"),
+            ("modified", "a.json", version_b, "ex_a"),
+            ("deleted", "d/b.json", version_a, "ex_a"),
+            ("added", "n.txt", version_b, "ex_a")])
+
+    # Only metadata-nodes in modified subtrees are read, i.e. the metadata
+    # of the sub-dataset, and of the files in "d/e", is not read.
+    eq_(read_in_mock.call_count, 6)
+
+    # Diffs are filtered by the record filter
+    results = meta_dump(
+        dataset=temp_dir,
+        diff=f"{version_a}..{version_b}",
+        extractor="ex_b",
+        fields="type",
+        result_renderer="disabled")
+    eq_(
+        [(result["state"], result["metadata"]) for result in results],
+        [("added", {"type": "dataset"})])
+
+    eq_(
+        meta_dump(
+            dataset=temp_dir,
+            diff=f"{version_b}..{version_b}",
+            result_renderer="disabled"),
+        [])
+    assert_raises(
+        ValueError,
+        meta_dump,
+        dataset=temp_dir,
+        diff="HEAD",
+        result_renderer="disabled")
+
+    # Commits without metadata are not reported as empty, or as deleted
+    git_repo.commit("commit without metadata", options=["--allow-empty"])
+    for diff in ("HEAD~1..HEAD", "HEAD..HEAD~1"):
+        assert_raises(
+            ValueError,
+            meta_dump,
+            dataset=temp_dir,
+            diff=diff,
+            result_renderer="disabled")
+
+
+@with_tempfile(mkdir=True)
+def test_dump_statistics(temp_dir=None):
+    create_dataset(temp_dir, UUID(root_id))
+    meta_add(
+        metadata=_create_records(),
+        dataset=temp_dir,
+        result_renderer="disabled")
+
+    def statistics(**kwargs):
+        return [
+            (
+                result["statistics"],
+                result["metadata"].get("dataset_path", ""),
+                {
+                    key: value
+                    for key, value in result["metadata"].items()
+                    if key in (
+                        "datasets", "datasets_with_metadata",
+                        "files_with_metadata", "records",
+                        "metadata_bytes", "extractor_runs")})
+            for result in meta_dump(
+                dataset=temp_dir,
+                recursive=True,
+                result_renderer="disabled",
+                **kwargs)]
+
+    read_in = Metadata.read_in
+    with patch.object(
+            Metadata,
+            "read_in",
+            autospec=True,
+            side_effect=read_in) as read_in_mock:
+        eq_(
+            statistics(count=True),
+            [
+                ("dataset", "", {
+                    "datasets_with_metadata": 1,
+                    "files_with_metadata": 2}),
+                ("dataset", "sub", {
+                    "datasets_with_metadata": 1,
+                    "files_with_metadata": 1}),
+                ("total", "", {
+                    "datasets": 2,
+                    "datasets_with_metadata": 2,
+                    "files_with_metadata": 3})])
+        eq_(
+            statistics(path=f"uuid:{sub_id}", count=True),
+            [
+                ("dataset", "", {
+                    "datasets_with_metadata": 1,
+                    "files_with_metadata": 1}),
+                ("total", "", {
+                    "datasets": 1,
+                    "datasets_with_metadata": 1,
+                    "files_with_metadata": 1})])
+
+        results = statistics(stats=True, extractor="ex_a")
+        eq_(
+            [
+                (result_type, dataset_path, result["extractor_runs"])
+                for result_type, dataset_path, result in results],
+            [
+                ("dataset", "", {"ex_a": 3}),
+                ("dataset", "sub", {"ex_a": 2}),
+                ("total", "", {"ex_a": 5})])
+        eq_(
+            results[-1][2]["metadata_bytes"],
+            results[0][2]["metadata_bytes"] + results[1][2]["metadata_bytes"])
+        eq_(results[-1][2]["records"], 5)
+
+        eq_(
+            statistics(path=":d", stats=True, since="1500")[0],
+            (
+                "dataset",
+                "",
+                {
+                    "datasets_with_metadata": 1,
+                    "files_with_metadata": 1,
+                    "records": 2,
+                    "metadata_bytes": 2 * results[0][2]["metadata_bytes"] // 3,
+                    "extractor_runs": {"ex_b": 2}}))
+
+    # Statistics are determined without reading metadata-nodes
+    eq_(read_in_mock.call_count, 0)
+
+    # "records" is the number of dumped records
+    eq_(
+        statistics(stats=True)[-1][2]["records"],
+        len(meta_dump(
+            dataset=temp_dir,
+            recursive=True,
+            result_renderer="disabled")))
+
+    for statistics_option in ("count", "stats"):
+        assert_raises(
+            ValueError,
+            meta_dump,
+            dataset=temp_dir,
+            use_index=True,
+            result_renderer="disabled",
+            **{statistics_option: True})
+
+    assert_raises(
+        ValueError,
+        meta_dump,
+        dataset=temp_dir,
+        count=True,
+        extractor="ex_a",
+        result_renderer="disabled")
@@ -0,0 +1,156 @@
+from typing import List
+from unittest.mock import patch
+from uuid import UUID
+
+from datalad.api import (
+    meta_add,
+    meta_dump,
+)
+from datalad.tests.utils_pytest import (
+    assert_true,
+    eq_,
+    with_tempfile,
+)
+
+from .utils import create_dataset
+from ..dumpindex import (
+    DumpIndex,
+    get_index_path,
+)
+
+
+root_id = "00010203-1011-2021-3031-404142434445"
+sub_id = "aa010203-1011-2021-3031-404142434445"
+
+metadata_template = {
+    "extractor_version": "1",
+    "extraction_parameter": {},
+    "extraction_time": 1111666.3333,
+    "agent_name": "test_name",
+    "agent_email": "test email",
+    "extracted_metadata": {"info": "some metadata"}
+}
+
+sub_dataset_template = {
+    "root_dataset_id": root_id,
+    "root_dataset_version": "r1",
+    "dataset_path": "sub"
+}
+
+
+def _create_records() -> List[dict]:
+    records = []
+    for extractor_name in ("ex_a", "ex_b"):
+        root_template = {
+            **metadata_template,
+            "extractor_name": extractor_name,
+            "dataset_id": root_id,
+            "dataset_version": "r1"}
+        sub_template = {
+            **metadata_template,
+            **sub_dataset_template,
+            "extractor_name": extractor_name,
+            "dataset_id": sub_id,
+            "dataset_version": "s1"}
+        records.extend([
+            {**root_template, "type": "dataset"},
+            {**root_template, "type": "file", "path": "a.json"},
+            {**root_template, "type": "file", "path": "d/b.json"},
+            {**root_template, "type": "file", "path": "d/e/c.txt"},
+            {**root_template, "type": "file", "path": "d0.txt"},
+            {**sub_template, "type": "dataset"},
+            {**sub_template, "type": "file", "path": "a.json"},
+            {**sub_template, "type": "file", "path": "x/y.json"}])
+    return records
+
+
+def _dump(dataset: str, path: str, recursive: bool, use_index: bool):
+    return sorted(
+        (
+            result["metadata"].get("dataset_path", ""),
+            result["metadata"]["dataset_version"],
+            result["metadata"]["type"],
+            result["metadata"].get("path", ""),
+            result["metadata"]["extractor_name"],
+            str(result["path"])
+        )
+        for result in meta_dump(
+            dataset=dataset,
+            path=path,
+            recursive=recursive,
+            use_index=use_index,
+            on_failure="ignore",
+            result_renderer="disabled"))
+
+
+@with_tempfile(mkdir=True)
+def test_index_query_results(temp_dir=None):
+    create_dataset(temp_dir, UUID(root_id))
+    meta_add(
+        metadata=_create_records(),
+        dataset=temp_dir,
+        result_renderer="disabled")
+
+    queries = (
+        "", ":a.json", ":d", ":d/b.json", "sub", "sub:a.json", "sub:x",
+        "sub/x", "@r1", "@r1:d", "nothing:a.json")
+
+    for query in queries:
+        for recursive in (False, True):
+            eq_(
+                _dump(temp_dir, query, recursive, True),
+                _dump(temp_dir, query, recursive, False))
+
+    # Index is created in the git directory
+    assert_true(get_index_path(temp_dir).exists())
+
+
+@with_tempfile(mkdir=True)
+def test_index_update(temp_dir=None):
+    create_dataset(temp_dir, UUID(root_id))
+    meta_add(
+        metadata=_create_records(),
+        dataset=temp_dir,
+        result_renderer="disabled")
+
+    eq_(len(_dump(temp_dir, ":a.json", False, True)), 4)
+
+    # Add a new version and a new record to an existing version, only the
+    # modified datasets are indexed. The unmodified sub dataset is neither
+    # indexed again in the existing version, nor in the new version.
+    new_records = [
+        {
+            **metadata_template,
+            "extractor_name": "ex_c",
+            "dataset_id": root_id,
+            "dataset_version": version,
+            "type": "file",
+            "path": "a.json"
+        }
+        for version in ("r1", "r2")]
+    meta_add(
+        metadata=new_records,
+        dataset=temp_dir,
+        result_renderer="disabled")
+
+    with patch.object(
+            DumpIndex,
+            "_add_tree",
+            autospec=True,
+            side_effect=DumpIndex._add_tree) as add_tree, \
+            patch.object(
+                DumpIndex,
+                "_add_dataset",
+                autospec=True,
+                side_effect=DumpIndex._add_dataset) as add_dataset:
+        eq_(
+            _dump(temp_dir, ":a.json", False, True),
+            _dump(temp_dir, ":a.json", False, False))
+        eq_(len(_dump(temp_dir, ":a.json", False, True)), 6)
+        eq_(add_tree.call_count, 1)
+        eq_(add_dataset.call_count, 2)
+
+    for query in ("", "sub", "@r1"):
+        eq_(
+            _dump(temp_dir, query, True, True),
+            _dump(temp_dir, query, True, False))
@@ -25,13 +25,17 @@ from uuid import UUID
 
 from datalad.api import (
     create,
+    meta_add,
+    meta_dump,
     meta_extract,
 )
 from datalad.distribution.dataset import Dataset
 from datalad.support.exceptions import NoDatasetFound
 from datalad.tests.utils_pytest import (
     assert_cwd_unchanged,
+    assert_false,
     assert_in,
+    assert_not_in,
     assert_repo_status,
     assert_raises,
     assert_result_count,
@@ -148,6 +152,37 @@ def test_dataset_extraction_result(ds_path=None):
         "example dataset extractor executed at "))
 
 
+@with_tree(meta_tree)
+def test_extraction_resource_usage(ds_path=None):
+
+    ds = _create_dataset_at_path(ds_path)
+
+    for extractor_name, path, extractor_args in (
+            ("metalad_example_dataset", None, None),
+            ("metalad_core", "sub/one", None),
+            ("metalad_external_file", "sub/one", [
+                "data-output-category", "IMMEDIATE",
+                "command", ["python", "-c", "print('True')"]])):
+
+        res = meta_extract(
+            extractorname=extractor_name,
+            dataset=ds,
+            path=path,
+            extractorargs=extractor_args,
+            **common_kwargs)
+
+        assert_result_count(res, 1)
+        resource_usage = res[0]["resource_usage"]
+        for key in ("wall_time", "user_time", "system_time",
+                    "peak_rss_delta", "children_peak_rss_delta",
+                    "bytes_read"):
+            assert_true(resource_usage[key] >= 0)
+        assert_not_in("resource_usage", res[0]["metadata_record"])
+
+    # The CPU time of the external extractor process is accounted for
+    assert_true(resource_usage["user_time"] + resource_usage["system_time"] > 0)
+
+
 @with_tree(meta_tree)
 def test_file_extraction_result(ds_path=None):
 
@@ -495,6 +530,30 @@ def test_external_extractor(ds_path=None):
         eq_(result[0]["metadata_record"]["extracted_metadata"], "True")
 
 
+directory_output_script = """
+import sys
+from pathlib import Path
+if "--extract" in sys.argv:
+    output_dir = Path(sys.argv[-1])
+    (output_dir / "a.txt").write_text("content a")
+    (output_dir / "sub").mkdir()
+    (output_dir / "sub" / "b.txt").write_text("content b")
+elif "--is-content-required" in sys.argv:
+    print("False")
+"""
+
+
+def _add_record(metadata_record: dict) -> dict:
+    return {
+        **metadata_record,
+        "dataset_id": str(metadata_record["dataset_id"]),
+        **(
+            {"path": str(metadata_record["path"])}
+            if "path" in metadata_record
+            else {})
+    }
+
+
 @with_tree(meta_tree)
 def test_external_extractor_categories(ds_path=None):
 
@@ -502,18 +561,183 @@ def test_external_extractor_categories(ds_path=None):
 
     for path, extractor_name in ((None, "metalad_external_dataset"),
                                  ("sub/one", "metalad_external_file")):
-        for output_category in ("DIRECTORY", "FILE"):
-            assert_raises(
-                NotImplementedError,
-                meta_extract,
-                extractorname=extractor_name,
-                dataset=ds,
-                path=path,
-                extractorargs=[
-                    "data-output-category", output_category,
-                    "command", ["python", "-c", "print('True')"]
-                ],
-                **common_kwargs)
+
+        result = meta_extract(
+            extractorname=extractor_name,
+            dataset=ds,
+            path=path,
+            extractorargs=[
+                "data-output-category", "FILE",
+                "command", ["python", "-c", "print('True')"]
+            ],
+            **common_kwargs)
+        eq_(len(result), 1)
+        output_reference = result[0]["metadata_record"]["extracted_metadata"]
+        eq_(output_reference["output_category"], "FILE")
+        eq_(Path(output_reference["location"]).read_text(), "True\n")
+        meta_add(metadata=_add_record(result[0]["metadata_record"]),
+                 dataset=ds, **common_kwargs)
+        assert_false(Path(output_reference["location"]).exists())
+
+        result = meta_extract(
+            extractorname=extractor_name,
+            dataset=ds,
+            path=path,
+            extractorargs=[
+                "data-output-category", "DIRECTORY",
+                "command", ["python", "-c", directory_output_script]
+            ],
+            **common_kwargs)
+        eq_(len(result), 1)
+        output_reference = result[0]["metadata_record"]["extracted_metadata"]
+        eq_(output_reference["output_category"], "DIRECTORY")
+        output_dir = Path(output_reference["location"])
+        eq_((output_dir / "sub" / "b.txt").read_text(), "content b")
+        meta_add(metadata=_add_record(result[0]["metadata_record"]),
+                 dataset=ds, **common_kwargs)
+        assert_false(output_dir.exists())
+
+        # Check that the output was stored by reference in the git object
+        # store of the metadata store.
+        dump_results = [
+            dump_result["metadata"]["extracted_metadata"]
+            for dump_result in meta_dump(dataset=ds.path, path=path or "",
+                                         **common_kwargs)
+        ]
+        eq_(len(dump_results), 2)
+        for stored_reference in dump_results:
+            assert_not_in("location", stored_reference)
+            if stored_reference["output_category"] == "FILE":
+                eq_(ds.repo.call_git(
+                    ["cat-file", "-p", stored_reference["git_object"]]),
+                    "True\n")
+            else:
+                eq_(ds.repo.call_git(
+                    ["cat-file", "-p",
+                     stored_reference["git_object"] + ":sub/b.txt"]),
+                    "content b")
+
+
+serve_script = """
+import json
+import os
+import sys
+from pathlib import Path
+assert "--serve" in sys.argv
+for line in sys.stdin:
+    request = json.loads(line)
+    if request["request"] == "get-uuid":
+        result = "00000000-0000-0000-0000-000000000000"
+    elif request["request"] == "get-version":
+        result = "0.1"
+    elif request["request"] == "is-content-required":
+        result = "False"
+    elif request["request"] == "extract":
+        result = os.getpid()
+        if "output" in request:
+            Path(request["output"]).write_text(str(result))
+    else:
+        result = None
+    print(json.dumps({"status": "ok", "result": result}), flush=True)
+"""
+
+
+@with_tree(meta_tree)
+def test_external_extractor_serve(ds_path=None):
+
+    ds = _create_dataset_at_path(ds_path)
+
+    pids = set()
+    for path in ("sub/one", "sub/nothing", "sub/one"):
+        result = meta_extract(
+            extractorname="metalad_external_file",
+            dataset=ds,
+            path=path,
+            extractorargs=[
+                "data-output-category", "IMMEDIATE",
+                "command", ["python", "-c", serve_script],
+                "serve", "True"
+            ],
+            **common_kwargs)
+        eq_(len(result), 1)
+        eq_(result[0]["status"], "ok")
+        pids.add(result[0]["metadata_record"]["extracted_metadata"])
+
+    # All extractions were processed by the same co-process
+    eq_(len(pids), 1)
+
+    result = meta_extract(
+        extractorname="metalad_external_file",
+        dataset=ds,
+        path="sub/one",
+        extractorargs=[
+            "data-output-category", "FILE",
+            "command", ["python", "-c", serve_script],
+            "serve", "True"
+        ],
+        **common_kwargs)
+    output_reference = result[0]["metadata_record"]["extracted_metadata"]
+    eq_(Path(output_reference["location"]).read_text(), str(pids.pop()))
+
+    # Commands that do not support serving are executed in one-shot mode
+    result = meta_extract(
+        extractorname="metalad_external_file",
+        dataset=ds,
+        path="sub/one",
+        extractorargs=[
+            "data-output-category", "IMMEDIATE",
+            "command", ["python", "-c", "print('True')"],
+            "serve", "True"
+        ],
+        **common_kwargs)
+    eq_(len(result), 1)
+    eq_(result[0]["metadata_record"]["extracted_metadata"], "True")
+
+
+hanging_script = """
+import sys
+import time
+if "--serve" in sys.argv:
+    time.sleep(60)
+print("True")
+"""
+
+
+@with_tree(meta_tree)
+def test_external_extractor_serve_timeout(ds_path=None):
+
+    ds = _create_dataset_at_path(ds_path)
+
+    processes = []
+    popen = subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        process = popen(*args, **kwargs)
+        processes.append(process)
+        return process
+
+    # Commands that do not answer the handshake are executed in one-shot
+    # mode, and the co-process is reaped.
+    with patch("datalad_metalad.extractors.external.subprocess.Popen",
+               recording_popen), \
+            patch("datalad_metalad.extractors.external."
+                  "ExternalExtractorServer.startup_timeout", 1):
+        result = meta_extract(
+            extractorname="metalad_external_file",
+            dataset=ds,
+            path="sub/one",
+            extractorargs=[
+                "data-output-category", "IMMEDIATE",
+                "command", ["python", "-c", hanging_script],
+                "serve", "True"
+            ],
+            **common_kwargs)
+    eq_(len(result), 1)
+    eq_(result[0]["metadata_record"]["extracted_metadata"], "True")
+
+    serve_processes = [p for p in processes if "--serve" in p.args]
+    eq_(len(serve_processes), 1)
+    assert_true(serve_processes[0].returncode is not None)
 
 
 @with_tree(meta_tree)
@@ -675,3 +899,72 @@ def test_submodule_status_suppression(tmp_dir_path_str=None):
 
     # Ensure that only JSON is written out
     json_object = json.loads(output)
+
+
+@with_tempfile(mkdir=True)
+def test_legacy_all_files_extraction(temp_dir=None):
+
+    ds = Dataset(Path(temp_dir) / "dataset").create()
+    (ds.pathobj / "sub").mkdir()
+    for file_name in ("a.txt", "sub/b.txt", "c.txt"):
+        (ds.pathobj / file_name).write_text(f"content of {file_name}")
+    ds.save(**common_kwargs)
+    ds.repo.set_metadata(["a.txt", "sub/b.txt"], add={"tag": "test"})
+
+    # The legacy "annex" extractor reports the annex key of every file
+    for extractor_name, expected_paths in (
+            ("metalad_annex", ["a.txt", "sub/b.txt"]),
+            ("annex", ["a.txt", "c.txt", "sub/b.txt"])):
+        extractor_class = get_extractor_class(extractor_name)
+        instances = []
+
+        class CountingExtractor(extractor_class):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                instances.append(self)
+
+        with patch("datalad_metalad.extract.get_extractor_class") as gec_mock:
+            gec_mock.return_value = CountingExtractor
+            result = meta_extract(
+                extractorname=extractor_name,
+                dataset=ds,
+                all_files=True,
+                **common_kwargs)
+
+        # The extractor should be instantiated once for all files
+        eq_(len(instances), 1)
+        paths = sorted(
+            str(r["metadata_record"]["path"])
+            for r in result
+            if r["status"] == "ok")
+        eq_(paths, expected_paths)
+        for r in result:
+            eq_(r["metadata_record"]["type"], "file")
+            eq_(r["metadata_record"]["extractor_name"], extractor_name)
+
+    # Extractor arguments can be given on the command line
+    output = subprocess.run(
+        [
+            "datalad",
+            "meta-extract",
+            "-d",
+            ds.path,
+            "--all-files",
+            "metalad_annex",
+            "key1",
+            "value1",
+            "key2",
+            "value2",
+        ],
+        stdout=subprocess.PIPE,
+        check=True
+    ).stdout.decode().strip()
+
+    records = [json.loads(line) for line in output.splitlines()]
+    eq_(
+        sorted(record["path"] for record in records),
+        ["a.txt", "sub/b.txt"])
+    for record in records:
+        eq_(
+            record["extraction_parameter"],
+            {"key1": "value1", "key2": "value2"})
@@ -0,0 +1,99 @@
+import json
+import math
+from unittest.mock import patch
+
+from datalad.tests.utils_pytest import (
+    assert_raises,
+    assert_true,
+    eq_,
+)
+
+import datalad_metalad.jsoncodec
+from ..jsoncodec import (
+    JSONDecodeError,
+    codec_names,
+    get_codec,
+)
+
+
+test_record = {
+    "type": "file",
+    "path": "a/b/c",
+    "extraction_time": 1111666.3333,
+    "extraction_parameter": {},
+    "extracted_metadata": {
+        "info": "Ünïcödé",
+        "size": 2 ** 40,
+        "keys": [None, True, 1.5]
+    }
+}
+
+
+def _get_available_codecs():
+    for name in codec_names:
+        try:
+            yield get_codec(name)
+        except ImportError:
+            pass
+
+
+def test_codec_round_trip():
+    for codec in _get_available_codecs():
+        encoded = codec.dumps(test_record)
+        eq_(json.loads(encoded), test_record)
+        eq_(codec.loads(encoded), test_record)
+        eq_(codec.loads(encoded.encode()), test_record)
+
+
+def test_codec_fallback():
+    # Values that fast codecs cannot encode are encoded by json
+    large_value = {"value": 2 ** 70}
+    for codec in _get_available_codecs():
+        eq_(json.loads(codec.dumps(large_value)), large_value)
+        assert_raises(JSONDecodeError, codec.loads, "{no json")
+
+
+def test_codec_decoding():
+    # All codecs decode to the same values as the standard library
+    for codec in _get_available_codecs():
+        for json_string in ('{"value": 18446744073709551616}',
+                            '{"value": -9223372036854775809}',
+                            '{"value": 123456789012345678901234567890}',
+                            '{"value": 1.5e300, "name": "1234567890123456789"}',
+                            '[1, 2, 3]'):
+            decoded = codec.loads(json_string)
+            eq_(decoded, json.loads(json_string))
+            eq_(type(decoded), type(json.loads(json_string)))
+            eq_(codec.loads(json_string.encode()), json.loads(json_string))
+
+        for json_string in ('{"value": NaN}', '[Infinity, -Infinity]'):
+            eq_(
+                json.dumps(codec.loads(json_string)),
+                json.dumps(json.loads(json_string)))
+
+        value = codec.loads('{"value": 18446744073709551616}')["value"]
+        eq_(type(value), int)
+        assert_true(math.isnan(codec.loads('{"value": NaN}')["value"]))
+
+
+def test_codec_non_finite_encoding():
+    for codec in _get_available_codecs():
+        for value in ({"value": float("nan"), "other": None},
+                      [float("inf"), [float("-inf")]]):
+            eq_(json.dumps(json.loads(codec.dumps(value))), json.dumps(value))
+
+
+def test_codec_selection():
+    assert_raises(ValueError, get_codec, "no-such-codec")
+    with \
+            patch.object(datalad_metalad.jsoncodec, "_codec", None), \
+            patch("datalad_metalad.jsoncodec.cfg") as cfg_mock:
+        cfg_mock.get.return_value = "json"
+        eq_(get_codec().name, "json")
+
+    # The standard library codec is used by default
+    with \
+            patch.object(datalad_metalad.jsoncodec, "_codec", None), \
+            patch("datalad_metalad.jsoncodec.cfg") as cfg_mock:
+        cfg_mock.get.side_effect = lambda name, default: default
+        eq_(get_codec().name, "json")
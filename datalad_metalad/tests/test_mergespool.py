@@ -0,0 +1,250 @@
+# emacs: -*- mode: python-mode; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# -*- coding: utf-8 -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Test spooled metadata adding and merging"""
+import concurrent.futures
+from pathlib import Path
+from typing import List
+from uuid import UUID
+
+from datalad.api import (
+    meta_add,
+    meta_dump,
+    meta_merge_spool,
+)
+from datalad.support.exceptions import IncompleteResultsError
+from datalad.tests.utils_pytest import (
+    assert_raises,
+    assert_result_count,
+    assert_true,
+    eq_,
+    with_tempfile,
+)
+
+from .utils import create_dataset
+from ..pipeline.processor.add import MetadataAdder
+from ..spool import (
+    SpoolWriter,
+    close_shared_spool_writers,
+    failed_suffix,
+    get_shared_spool_writer,
+    partial_suffix,
+    read_spool_files,
+    spool_suffix,
+)
+
+
+default_id = UUID("00010203-1011-2021-3031-404142434445")
+
+metadata_template = {
+    "type": "file",
+    "extractor_name": "ex_extractor_name",
+    "extractor_version": "ex_extractor_version",
+    "extraction_parameter": {"parameter1": "pvalue1"},
+    "extraction_time": 1111666.3333,
+    "agent_name": "test_name",
+    "agent_email": "test email",
+    "dataset_id": str(default_id),
+    "dataset_version": "000000111111111112012121212121",
+    "extracted_metadata": {"info": "some metadata"}
+}
+
+
+def spool_records(dataset_path: str,
+                  spool_dir: str,
+                  writer_index: int,
+                  count: int) -> List:
+    return list(meta_add(
+        metadata=[
+            {**metadata_template, "path": f"w_{writer_index}/f_{index}"}
+            for index in range(count)],
+        dataset=dataset_path,
+        spool_dir=spool_dir,
+        result_renderer="disabled"))
+
+
+def spool_shared(spool_dir: str, writer_index: int):
+    with get_shared_spool_writer(spool_dir).open() as spool_writer:
+        spool_writer.write({**metadata_template, "path": f"w_{writer_index}"})
+
+
+@with_tempfile(mkdir=True)
+@with_tempfile(mkdir=True)
+def test_spool_and_merge(temp_dir=None, spool_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    writer_count = 3
+    record_count = 4
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        results = list(executor.map(
+            spool_records,
+            [git_repo.path] * writer_count,
+            [spool_dir] * writer_count,
+            range(writer_count),
+            [record_count] * writer_count))
+
+    for result in results:
+        assert_result_count(result, record_count, status="ok", spooled=True)
+
+    # Spooling does not touch the metadata store
+    eq_(list(git_repo.call_git_items_(["for-each-ref", "refs/datalad"])), [])
+    eq_(len(list(Path(spool_dir).glob("*" + spool_suffix))), writer_count)
+
+    # Incomplete spool files are not merged
+    incomplete_writer = SpoolWriter(spool_dir)
+    incomplete_writer.write({**metadata_template, "path": "incomplete"})
+    incomplete_writer.spool_file.flush()
+
+    res = meta_merge_spool(
+        spool_dir=spool_dir,
+        dataset=git_repo.path,
+        result_renderer="disabled")
+    assert_result_count(res, writer_count * record_count, status="ok")
+
+    eq_(list(Path(spool_dir).glob("*" + spool_suffix)), [])
+    assert_true(incomplete_writer.partial_path.exists())
+    eq_(list(Path(spool_dir).glob("*" + partial_suffix)),
+        [incomplete_writer.partial_path])
+
+    dumped_paths = sorted(
+        result["metadata"]["path"]
+        for result in meta_dump(
+            dataset=git_repo.pathobj,
+            path="*",
+            recursive=True,
+            result_renderer="disabled"))
+    eq_(dumped_paths,
+        sorted(
+            f"w_{writer_index}/f_{index}"
+            for writer_index in range(writer_count)
+            for index in range(record_count)))
+
+    # The remaining file is merged after its writer completed it
+    incomplete_writer.close()
+    res = meta_merge_spool(
+        spool_dir=spool_dir,
+        dataset=git_repo.path,
+        result_renderer="disabled")
+    assert_result_count(res, 1, status="ok")
+    eq_(list(Path(spool_dir).iterdir()), [])
+
+
+@with_tempfile(mkdir=True)
+@with_tempfile(mkdir=True)
+def test_merge_failures(temp_dir=None, spool_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    spool_records(git_repo.path, spool_dir, 0, 2)
+    with SpoolWriter(spool_dir) as spool_writer:
+        spool_writer.write({
+            **metadata_template,
+            "path": "foreign",
+            "dataset_id": "00000000-0000-0000-0000-000000000000"})
+
+    # Records that could not be added are kept in a failed-spool file
+    res = meta_merge_spool(
+        spool_dir=spool_dir,
+        dataset=git_repo.path,
+        on_failure="ignore",
+        result_renderer="disabled")
+    assert_result_count(res, 2, status="ok")
+    assert_result_count(res, 1, status="error")
+    eq_(list(Path(spool_dir).glob("*" + spool_suffix)), [])
+
+    failed_paths = list(Path(spool_dir).glob("*" + failed_suffix))
+    eq_(len(failed_paths), 1)
+    eq_([record["path"] for record in read_spool_files(failed_paths)],
+        ["foreign"])
+
+    # Failed records are merged again after renaming the failed-spool file
+    failed_paths[0].rename(
+        failed_paths[0].with_name(
+            failed_paths[0].name[:-len(failed_suffix)] + spool_suffix))
+    res = meta_merge_spool(
+        spool_dir=spool_dir,
+        dataset=git_repo.path,
+        allow_id_mismatch=True,
+        result_renderer="disabled")
+    assert_result_count(res, 1, status="ok")
+    eq_(list(Path(spool_dir).iterdir()), [])
+
+
+@with_tempfile(mkdir=True)
+@with_tempfile(mkdir=True)
+def test_merge_stop(temp_dir=None, spool_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    with SpoolWriter(spool_dir) as spool_writer:
+        spool_writer.write({**metadata_template, "path": "first"})
+        spool_writer.write({
+            **metadata_template,
+            "path": "foreign",
+            "dataset_id": "00000000-0000-0000-0000-000000000000"})
+        spool_writer.write({**metadata_template, "path": "last"})
+
+    # Records that were merged before the merge stopped are kept, records
+    # that were not merged are returned to the spool
+    assert_raises(
+        IncompleteResultsError,
+        meta_merge_spool,
+        spool_dir=spool_dir,
+        dataset=git_repo.path,
+        on_failure="stop",
+        result_renderer="disabled")
+
+    eq_([
+        result["metadata"]["path"]
+        for result in meta_dump(
+            dataset=git_repo.pathobj,
+            path="*",
+            recursive=True,
+            result_renderer="disabled")],
+        ["first"])
+    eq_([
+        record["path"]
+        for record in read_spool_files(
+            Path(spool_dir).glob("*" + failed_suffix))],
+        ["foreign"])
+    eq_([
+        record["path"]
+        for record in read_spool_files(
+            Path(spool_dir).glob("*" + spool_suffix))],
+        ["last"])
+
+
+@with_tempfile(mkdir=True)
+@with_tempfile(mkdir=True)
+def test_shared_spooling(temp_dir=None, spool_dir=None):
+    git_repo = create_dataset(temp_dir, default_id)
+
+    # The records of all pipeline items are spooled into one spool file,
+    # which is completed when the shared writers are closed.
+    adder = MetadataAdder(spool_dir=spool_dir)
+    for index in range(3):
+        results = list(adder.add_records(
+            [{**metadata_template, "path": f"f_{index}"}],
+            git_repo.pathobj,
+            None))
+        eq_(results[0][0]["status"], "ok")
+    eq_(list(Path(spool_dir).glob("*" + spool_suffix)), [])
+    close_shared_spool_writers()
+
+    spool_paths = list(Path(spool_dir).glob("*" + spool_suffix))
+    eq_(len(spool_paths), 1)
+    eq_([record["path"] for record in read_spool_files(spool_paths)],
+        ["f_0", "f_1", "f_2"])
+    spool_paths[0].unlink()
+
+    # Worker processes complete their shared spool files when they exit
+    with concurrent.futures.ProcessPoolExecutor(1) as executor:
+        list(executor.map(spool_shared, [spool_dir] * 2, range(2)))
+    spool_paths = list(Path(spool_dir).glob("*" + spool_suffix))
+    eq_(len(spool_paths), 1)
+    eq_([record["path"] for record in read_spool_files(spool_paths)],
+        ["w_0", "w_1"])
@@ -0,0 +1,186 @@
+# emacs: -*- mode: python-mode; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# -*- coding: utf-8 -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Test the handling of extractor output references"""
+import os
+import subprocess
+import time
+from pathlib import Path
+from typing import (
+    List,
+    Tuple,
+)
+from unittest.mock import patch
+from uuid import UUID
+
+from datalad.api import meta_add
+from datalad.tests.utils_pytest import (
+    assert_false,
+    assert_raises,
+    assert_result_count,
+    assert_true,
+    eq_,
+    with_tempfile,
+)
+
+from .utils import create_dataset
+from ..extractors.base import DataOutputCategory
+from ..outputreference import (
+    create_output_location,
+    create_output_reference,
+    get_output_directory,
+    get_output_location,
+    hash_output_reference,
+    max_output_age,
+    remove_expired_outputs,
+    store_output_reference,
+)
+
+
+default_id = UUID("00010203-1011-2021-3031-404142434445")
+
+metadata_template = {
+    "type": "dataset",
+    "extractor_name": "ex_extractor_name",
+    "extractor_version": "ex_extractor_version",
+    "extraction_parameter": {},
+    "extraction_time": 1111666.3333,
+    "agent_name": "test_name",
+    "agent_email": "test email",
+    "dataset_id": str(default_id),
+    "dataset_version": "000000111111111112012121212121",
+}
+
+
+@with_tempfile(mkdir=True)
+def test_foreign_locations(temp_dir=None):
+    create_dataset(temp_dir, default_id)
+
+    # Files outside the output directory are neither read nor removed
+    foreign_file = Path(temp_dir) / "secret.txt"
+    foreign_file.write_text("secret")
+    output_file, output_reference = create_output_location(
+        DataOutputCategory.FILE)
+    output_file.close()
+    symlink = Path(output_file.name).parent / (
+        Path(output_file.name).name + "-link")
+    symlink.symlink_to(foreign_file)
+
+    for location in (foreign_file, symlink, Path(output_file.name) / ".."):
+        assert_raises(
+            ValueError,
+            get_output_location,
+            {"location": str(location)})
+
+        results = meta_add(
+            metadata={
+                **metadata_template,
+                "extracted_metadata": create_output_reference(
+                    DataOutputCategory.FILE,
+                    location,
+                    True)},
+            dataset=temp_dir,
+            on_failure="ignore",
+            result_renderer="disabled")
+        assert_result_count(results, 1, status="error")
+        assert_true("is not an output location" in results[0]["message"])
+        eq_(foreign_file.read_text(), "secret")
+
+    symlink.unlink()
+
+    # Outputs that were created by metalad are stored and removed
+    results = meta_add(
+        metadata={
+            **metadata_template,
+            "extracted_metadata": output_reference},
+        dataset=temp_dir,
+        result_renderer="disabled")
+    assert_result_count(results, 1, status="ok")
+    assert_false(Path(output_file.name).exists())
+
+
+@with_tempfile(mkdir=True)
+def test_skip_identical_output(temp_dir=None):
+    create_dataset(temp_dir, default_id)
+
+    def add_output(content: str) -> Tuple[Path, List]:
+        output_file, output_reference = create_output_location(
+            DataOutputCategory.FILE)
+        output_file.write(content.encode())
+        output_file.close()
+        return Path(output_file.name), meta_add(
+            metadata={
+                **metadata_template,
+                "extracted_metadata": output_reference},
+            dataset=temp_dir,
+            add_policy="skip-identical",
+            result_renderer="disabled")
+
+    location, results = add_output("output")
+    assert_result_count(results, 1, status="ok")
+
+    # Identical output is not stored, but its location is removed
+    with patch("datalad_metalad.add.store_output_reference") as store_mock:
+        location, results = add_output("output")
+    assert_result_count(results, 1, status="notneeded")
+    eq_(store_mock.call_count, 0)
+    assert_false(location.exists())
+
+    location, results = add_output("changed output")
+    assert_result_count(results, 1, status="ok")
+    assert_false(location.exists())
+
+
+@with_tempfile(mkdir=True)
+def test_hash_output(temp_dir=None):
+    create_dataset(temp_dir, default_id)
+
+    output_directory, output_reference = create_output_location(
+        DataOutputCategory.DIRECTORY)
+    (Path(output_directory) / "sub").mkdir()
+    (Path(output_directory) / "sub" / "b.txt").write_text("content b")
+    (Path(output_directory) / "a.txt").write_text("content a")
+
+    # Hashing neither stores file content nor removes the output
+    hashed_reference = hash_output_reference(Path(temp_dir), output_reference)
+    assert_true(Path(output_directory).exists())
+    blob_hash = subprocess.run(
+        ["git", "-C", temp_dir, "rev-parse",
+         hashed_reference["git_object"] + ":a.txt"],
+        stdout=subprocess.PIPE,
+        check=True).stdout.decode().strip()
+    assert_true(
+        subprocess.run(
+            ["git", "-C", temp_dir, "cat-file", "-e", blob_hash],
+            stderr=subprocess.DEVNULL).returncode != 0)
+
+    eq_(
+        store_output_reference(Path(temp_dir), output_reference),
+        hashed_reference)
+    assert_false(Path(output_directory).exists())
+
+
+def test_output_expiry():
+    output_directory = get_output_directory()
+    eq_(output_directory.stat().st_mode & 0o777, 0o700)
+
+    old_output, _ = create_output_location(DataOutputCategory.DIRECTORY)
+    new_output, _ = create_output_location(DataOutputCategory.DIRECTORY)
+    expired = time.time() - max_output_age - 1
+    os.utime(old_output, (expired, expired))
+
+    # The output directory is searched at most once per check interval
+    remove_expired_outputs(output_directory)
+    assert_true(Path(old_output).exists())
+
+    with patch("datalad_metalad.outputreference.expiry_check_interval", 0):
+        remove_expired_outputs(output_directory)
+    assert_false(Path(old_output).exists())
+    assert_true(Path(new_output).exists())
+    Path(new_output).rmdir()
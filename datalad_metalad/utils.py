@@ -2,7 +2,14 @@ import json
 import sys
 from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    TextIO,
+    Union,
+)
 
 if sys.version_info < (3, 9):
     from importlib_resources import files
@@ -15,6 +22,7 @@ from datalad.distribution.dataset import (
 )
 from datalad.support.exceptions import NoDatasetFound
 
+from . import jsoncodec
 from .metadatatypes import JSONType
 
 
@@ -97,22 +105,112 @@ def read_json_object(path_or_object: Union[str, JSONType]) -> JSONType:
 
 def read_json_objects(path_or_object: Union[str, JSONType],
                       json_lines: bool
-                      ) -> List[JSONType]:
-
+                      ) -> Iterable[JSONType]:
+    """ Read JSON objects from a file, from stdin, or from a given object
+
+    JSON objects are read incrementally, i.e. only a single object is kept
+    in memory. If `json_lines` is True, every non-empty line of the input has
+    to contain a JSON object. Otherwise, the input must contain either a
+    JSON object or a JSON array. In the latter case every array element is
+    returned as individual JSON object.
+    """
     if isinstance(path_or_object, str):
         if path_or_object == "-":
-            metadata_file = sys.stdin
+            yield from _read_json_stream(sys.stdin, json_lines)
         else:
-            metadata_file = open(path_or_object, "tr")
-        if json_lines is True:
-            path_or_object = [
-                json.loads(line)
-                for line in metadata_file.readlines()
-            ]
-        else:
-            path_or_object = json.load(metadata_file)
+            with open(path_or_object, "tr") as metadata_file:
+                yield from _read_json_stream(metadata_file, json_lines)
+        return
+
+    if isinstance(path_or_object, list):
+        yield from path_or_object
+    else:
+        yield path_or_object
 
-    return (
-        path_or_object
-        if isinstance(path_or_object, list)
-        else [path_or_object])
+
+def _read_json_stream(text_file: TextIO,
+                      json_lines: bool
+                      ) -> Iterable[JSONType]:
+    if json_lines is True:
+        for line in text_file:
+            if line.strip():
+                yield jsoncodec.loads(line)
+    else:
+        yield from JSONStreamReader(text_file).read_objects()
+
+
+class JSONStreamReader:
+    """ Incrementally decode a JSON value or the elements of a JSON array """
+
+    def __init__(self,
+                 text_file: TextIO,
+                 chunk_size: int = 64 * 1024):
+        self.text_file = text_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def read_objects(self) -> Iterable[JSONType]:
+        if self._peek() == "[":
+            self.position += 1
+            if self._peek() == "]":
+                self.position += 1
+            else:
+                while True:
+                    yield self._decode()
+                    next_char = self._peek()
+                    if next_char not in (",", "]"):
+                        self._raise("Expecting ',' delimiter")
+                    self.position += 1
+                    if next_char == "]":
+                        break
+        elif self._peek() is not None:
+            yield self._decode()
+
+        if self._peek() is not None:
+            self._raise("Extra data")
+
+    def _raise(self, message: str):
+        raise json.JSONDecodeError(message, self.buffer, self.position)
+
+    def _fill(self, minimum_size: int = 0) -> bool:
+        chunk = self.text_file.read(max(self.chunk_size, minimum_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def _peek(self) -> Optional[str]:
+        """ Skip whitespace and return the next character, or None at EOF """
+        while True:
+            while self.position < len(self.buffer) \
+                    and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return None
+
+    def _decode(self) -> JSONType:
+        if self._peek() is None:
+            self._raise("Expecting value")
+        while True:
+            try:
+                json_object, end = self.decoder.raw_decode(
+                    self.buffer,
+                    self.position)
+                # A value that ends at the end of the buffer might be a
+                # truncated number, read on to be sure.
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return json_object
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Double the available data, in order to keep the number of
+            # decoding attempts for large values logarithmic.
+            self._fill(len(self.buffer) - self.position)
@@ -0,0 +1,85 @@
+"""
+Compare the JSON codecs that metalad can use for metadata records.
+
+For every available codec, i.e. "orjson", "ujson", and "json", the script
+measures the time to encode and to decode a set of synthetic metadata
+records that resemble the output of meta-dump.
+
+Usage:
+
+    python tools/benchmark_json_codec.py [--records N] [--repeat R]
+"""
+import time
+from argparse import ArgumentParser
+from typing import (
+    Dict,
+    List,
+)
+
+from datalad_metalad.jsoncodec import (
+    codec_names,
+    get_codec,
+)
+
+
+def create_records(count: int) -> List[Dict]:
+    return [
+        {
+            "type": "file",
+            "dataset_id": "00010203-1011-2021-3031-404142434445",
+            "dataset_version": f"{index:040x}",
+            "path": f"sub_{index % 10}/dir_{index % 100}/file_{index}.dat",
+            "extractor_name": "metalad_core",
+            "extractor_version": "1",
+            "extraction_parameter": {},
+            "extraction_time": 1660000000.123 + index,
+            "agent_name": "Test Agent",
+            "agent_email": "test@example.com",
+            "extracted_metadata": {
+                "@id": f"datalad:SHA1-s{index}--{index:040x}",
+                "contentbytesize": index * 17,
+                "keywords": ["a", "b", "c"],
+                "description": "Ünïcödé description " * 4,
+                "distribution": {"url": f"https://example.com/{index}"},
+            }
+        }
+        for index in range(count)
+    ]
+
+
+def measure(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+
+    records = create_records(arguments.records)
+    print(f"{'codec':<8} {'encode [s]':>12} {'decode [s]':>12}")
+    for name in codec_names:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            print(f"{name:<8} {'not installed':>25}")
+            continue
+
+        encoded = [codec.dumps(record) for record in records]
+        encode_time = measure(
+            lambda: [codec.dumps(record) for record in records],
+            arguments.repeat)
+        decode_time = measure(
+            lambda: [codec.loads(line) for line in encoded],
+            arguments.repeat)
+        print(f"{name:<8} {encode_time:>12.3f} {decode_time:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()